@@ -3,6 +3,11 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_cors import CORS
 from .config import config
+from .compression import init_compression
+from .database import configure_engine, engine_options
+from .json_provider import init_json
+from .services.cache_service import analytics_cache
+from .services.metrics_service import metrics
 
 db = SQLAlchemy()
 migrate = Migrate()
@@ -10,14 +15,27 @@ migrate = Migrate()
 def create_app(config_name='default'):
     app = Flask(__name__)
     app.config.from_object(config[config_name])
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config))
 
     db.init_app(app)
     migrate.init_app(app, db)
     CORS(app)
+    init_json(app)
+    init_compression(app)
+    analytics_cache.init_app(app)
+    metrics.init_app(app)
 
     with app.app_context():
-        from .routes import dataset_routes, upload_routes
+        configure_engine(app, db.engine)
+
+        from .routes import dataset_routes, upload_routes, analytics_routes, metrics_routes
         app.register_blueprint(dataset_routes.bp)
         app.register_blueprint(upload_routes.bp)
+        app.register_blueprint(analytics_routes.bp)
+        app.register_blueprint(metrics_routes.bp)
+
+        from .cli import datasets_cli, rollups_cli
+        app.cli.add_command(rollups_cli)
+        app.cli.add_command(datasets_cli)
 
     return app
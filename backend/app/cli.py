@@ -0,0 +1,67 @@
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from .models.dataset import Dataset
+from .services.dataset_service import DatasetService
+from .services.partition_service import PartitionService
+from .services.duckdb_engine import duckdb_enabled, rebuild_replica
+from .services.job_service import JobService
+from .services.rollup_service import RollupService
+from .services.sketch_service import SketchService
+
+rollups_cli = AppGroup('rollups', help='Maintain precomputed per-dataset aggregates.')
+datasets_cli = AppGroup('datasets', help='Maintain datasets.')
+
+
+@rollups_cli.command('verify')
+@click.argument('dataset_id', type=int)
+def verify_rollups(dataset_id):
+    """Compares a dataset's rollups against a full scan of its records."""
+    mismatches = RollupService.verify(dataset_id)
+    for mismatch in mismatches:
+        click.echo(mismatch)
+    if mismatches:
+        raise SystemExit(1)
+    click.echo(f"Rollups for dataset {dataset_id} are consistent.")
+
+
+@rollups_cli.command('rebuild')
+@click.argument('dataset_id', type=int)
+def rebuild_rollups(dataset_id):
+    """Recomputes a dataset's rollups and sketches (and DuckDB replica) from its records."""
+    RollupService.rebuild(dataset_id)
+    SketchService.rebuild(dataset_id)
+    if duckdb_enabled():
+        rebuild_replica(dataset_id)
+    click.echo(f"Rollups and sketches for dataset {dataset_id} rebuilt.")
+
+
+@datasets_cli.command('purge')
+def purge_datasets():
+    """Finishes deleting datasets whose background purge was interrupted."""
+    dataset_ids = [row.id for row in Dataset.query.filter_by(status=Dataset.STATUS_DELETING)]
+    for dataset_id in dataset_ids:
+        DatasetService.purge_dataset(dataset_id)
+    click.echo(f"Purged {len(dataset_ids)} deleted datasets.")
+
+
+@datasets_cli.command('sweep')
+@click.option('--older-than', type=int, default=None,
+              help="Seconds since upload after which a pending upload counts as interrupted "
+                   "(default: INGEST_STALE_AFTER).")
+def sweep_uploads(older_than):
+    """Discards uploads whose ingestion was interrupted, e.g. by a worker restart."""
+    if older_than is None:
+        older_than = current_app.config['INGEST_STALE_AFTER']
+    swept = JobService.sweep_interrupted(older_than)
+    click.echo(f"Discarded {swept} interrupted uploads.")
+
+
+@datasets_cli.command('partition')
+def partition_records():
+    """Converts the records table into one PostgreSQL partition per dataset."""
+    try:
+        created = PartitionService.partition_records()
+    except ValueError as ve:
+        raise click.ClickException(str(ve))
+    click.echo(f"Records partitioned by dataset ({created} partitions created).")
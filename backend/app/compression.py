@@ -0,0 +1,54 @@
+import gzip
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+COMPRESSIBLE_TYPES = ('application/json', 'text/csv', 'text/plain')
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5  # close to gzip's speed at a better ratio; 11 is far slower
+
+
+def init_compression(app):
+    if app.config.get('COMPRESS_RESPONSES', True):
+        app.after_request(_compress)
+
+
+def _choose_encoding():
+    encodings = request.accept_encodings
+    if brotli is not None and encodings['br']:
+        return 'br'
+    if encodings['gzip']:
+        return 'gzip'
+    return None
+
+
+def _compress(response):
+    """Compresses buffered JSON and text responses of at least ``COMPRESS_MIN_SIZE`` bytes.
+
+    Streamed responses (exports) pass through untouched. A strong ETag is
+    weakened, since the compressed bytes are a different representation of
+    the same resource; conditional requests still match it.
+    """
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_TYPES):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = _choose_encoding()
+    body = response.get_data()
+    if encoding is None or len(body) < current_app.config.get('COMPRESS_MIN_SIZE', 1024):
+        return response
+
+    if encoding == 'br':
+        body = brotli.compress(body, quality=BROTLI_QUALITY)
+    else:
+        body = gzip.compress(body, compresslevel=GZIP_LEVEL)
+    response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag is not None and not weak:
+        response.set_etag(etag, weak=True)
+    return response
@@ -7,8 +7,81 @@ class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY', 'dev-key-12345')
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///dashboard.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Connection pool for server databases; SQLite keeps SQLAlchemy's defaults
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+    DB_POOL_TIMEOUT = 30  # seconds to wait for a pooled connection
+    # Seconds, below common idle timeouts
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+    DB_POOL_PRE_PING = True
+    # Applied to every SQLite connection. WAL lets dashboard reads proceed while an upload
+    # writes, and a second writer waits up to SQLITE_BUSY_TIMEOUT for the lock instead of
+    # failing with "database is locked"
+    SQLITE_BUSY_TIMEOUT = int(os.environ.get('SQLITE_BUSY_TIMEOUT', 60000))  # ms
+    SQLITE_PRAGMAS = {
+        'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE', 'WAL'),
+        # WAL stays consistent; fsync at checkpoints
+        'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        'foreign_keys': 'ON',  # SQLite ignores ON DELETE CASCADE otherwise
+        'cache_size': -16000,  # ~16MB page cache per connection
+        'mmap_size': 256 * 1024 * 1024,
+        'temp_store': 'MEMORY',
+    }
     UPLOAD_FOLDER = os.path.join(os.getcwd(), 'uploads')
-    MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB
+    # Uploads are streamed in chunks, so the limit no longer bounds memory use
+    MAX_CONTENT_LENGTH = int(os.environ.get('MAX_CONTENT_LENGTH', 1024 * 1024 * 1024))  # 1GB
+    INGEST_CHUNK_SIZE = int(os.environ.get('INGEST_CHUNK_SIZE', 50000))  # rows per chunk
+    # 'auto' picks COPY on PostgreSQL and tuned executemany on SQLite; or 'core', 'sqlite', 'copy'
+    BULK_LOAD_STRATEGY = os.environ.get('BULK_LOAD_STRATEGY', 'auto')
+    # Uploads are profiled from a sample first: repetitive text columns parse as
+    # categoricals, integers are downcast and 'value' is validated before any insert
+    INGEST_SAMPLE_ROWS = 10000
+    INGEST_CATEGORY_RATIO = 0.5  # at most this many distinct values per sampled value
+    # 'c' is the pandas parser; 'pyarrow' parses blocks on several threads (requires pyarrow)
+    INGEST_CSV_ENGINE = os.environ.get('INGEST_CSV_ENGINE', 'c')
+    # 'sync' ingests inside the request; 'async' returns 202 and ingests on a worker thread
+    UPLOAD_MODE = os.environ.get('UPLOAD_MODE', 'sync')
+    INGEST_WORKERS = int(os.environ.get('INGEST_WORKERS', 2))
+    INGEST_JOB_HISTORY = 1000  # finished jobs kept for polling
+    # `flask datasets sweep` fails uploads still pending after this many seconds (their worker died)
+    INGEST_STALE_AFTER = int(os.environ.get('INGEST_STALE_AFTER', 6 * 3600))
+    # 'sync' purges a deleted dataset inside the request; 'async' hides it at once,
+    # returns 202 and purges its records on a worker thread
+    DELETE_MODE = os.environ.get('DELETE_MODE', 'sync')
+    # Records per DELETE statement
+    DELETE_BATCH_SIZE = int(os.environ.get('DELETE_BATCH_SIZE', 50000))
+    # Per-process LRU cache for summary/chart results; size 0 disables it
+    ANALYTICS_CACHE_SIZE = int(os.environ.get('ANALYTICS_CACHE_SIZE', 1024))
+    ANALYTICS_CACHE_TTL = int(os.environ.get('ANALYTICS_CACHE_TTL', 300))  # seconds
+    # 'json' keeps extra CSV columns in records.metadata_json; 'columnar' writes typed
+    # Parquet files per dataset under UPLOAD_FOLDER (requires pyarrow)
+    METADATA_STORAGE = os.environ.get('METADATA_STORAGE', 'json')
+    # 'sql' answers summary, chart-data and dashboard from rollups or SQL scans; 'duckdb'
+    # also writes each dataset's date/category/value to Parquet at ingest and scans that
+    # with embedded DuckDB (requires duckdb and pyarrow)
+    ANALYTICS_ENGINE = os.environ.get('ANALYTICS_ENGINE', 'sql')
+    # /aggregate rejects groupings estimated above this many groups unless a limit is set
+    AGGREGATE_MAX_GROUPS = int(os.environ.get('AGGREGATE_MAX_GROUPS', 10000))
+    AGGREGATE_SAMPLE_ROWS = 10000  # rows sampled to estimate distinct metadata values
+    # Sketches built at ingest for ?mode=approx summaries and /sample previews
+    SKETCH_HLL_PRECISION = 14  # 2**14 registers, ~0.8% relative error on distinct counts
+    SKETCH_KLL_K = 200  # ~1.3% normalized rank error on quantiles
+    SKETCH_SAMPLE_SIZE = 1000  # reservoir sample rows kept per dataset
+    COMPARE_MAX_DATASETS = 20  # datasets per /api/analytics/compare request
+    RECORDS_PAGE_MAX = 5000  # largest page served by /records
+    # Rows fetched per cursor batch
+    EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', 5000))
+    # Request, SQL and ingest metrics served at /metrics (per worker process)
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+    # Adds a Server-Timing header (app, db and ingest phases) to every response
+    SERVER_TIMING = os.environ.get('SERVER_TIMING', 'false').lower() == 'true'
+    # Traces Python allocations for per-ingest peak memory; slows ingestion noticeably
+    INGEST_TRACE_MEMORY = os.environ.get('INGEST_TRACE_MEMORY', 'false').lower() == 'true'
+    # 'orjson' serializes responses with orjson when it is installed; 'default' keeps Flask's json
+    JSON_PROVIDER = os.environ.get('JSON_PROVIDER', 'orjson')
+    # gzip (or brotli, when installed and accepted) for JSON and text responses above the size
+    COMPRESS_RESPONSES = os.environ.get('COMPRESS_RESPONSES', 'true').lower() == 'true'
+    COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))  # bytes
     CORS_HEADERS = 'Content-Type'
 
 class DevelopmentConfig(Config):
@@ -16,9 +89,17 @@ class DevelopmentConfig(Config):
 
 class ProductionConfig(Config):
     DEBUG = False
+    # Sized for a few gunicorn workers with ingest threads each
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 20))
+
+class TestingConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
 
 config = {
     'development': DevelopmentConfig,
     'production': ProductionConfig,
+    'testing': TestingConfig,
     'default': DevelopmentConfig
 }
@@ -0,0 +1,34 @@
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+
+def engine_options(config):
+    """SQLAlchemy engine options for the configured database.
+
+    Server databases get a bounded, pre-pinged pool whose connections are
+    recycled before typical idle timeouts; SQLite keeps SQLAlchemy's defaults
+    and is tuned per connection by ``configure_engine`` instead.
+    """
+    if make_url(config['SQLALCHEMY_DATABASE_URI']).get_backend_name() == 'sqlite':
+        return {}
+    return {
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': config['DB_POOL_PRE_PING'],
+    }
+
+
+def configure_engine(app, engine):
+    """Applies ``SQLITE_PRAGMAS`` and ``SQLITE_BUSY_TIMEOUT`` to every new SQLite connection."""
+    if engine.dialect.name != 'sqlite':
+        return
+    pragmas = dict(app.config['SQLITE_PRAGMAS'], busy_timeout=app.config['SQLITE_BUSY_TIMEOUT'])
+
+    @event.listens_for(engine, 'connect')
+    def _apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+        cursor.close()
@@ -0,0 +1,68 @@
+import dataclasses
+import logging
+from decimal import Decimal
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional: the standard library provider is used instead
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+
+def _default(obj):
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return dataclasses.asdict(obj)
+    if hasattr(obj, '__html__'):
+        return str(obj.__html__())
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """JSON provider serializing with orjson straight to bytes.
+
+    Keys stay sorted, like Flask's default, so bodies and their ETags are
+    stable. Dates and datetimes become ISO 8601 strings, not RFC 822 ones;
+    Decimals become numbers, numpy scalars and arrays are native, and NaN is
+    written as null instead of the invalid ``NaN`` token.
+    """
+
+    def _options(self, indent=False):
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumps(self, obj, **kwargs):
+        option = self._options(kwargs.get('indent'))
+        return orjson.dumps(obj, default=_default, option=option).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        option = self._options(indent) | orjson.OPT_APPEND_NEWLINE
+        body = orjson.dumps(obj, default=_default, option=option)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+def init_json(app):
+    """Installs the provider named by ``JSON_PROVIDER``.
+
+    'orjson' falls back to the standard provider when orjson is missing.
+    """
+    if app.config.get('JSON_PROVIDER', 'orjson') != 'orjson':
+        return
+    if orjson is None:
+        logger.warning("orjson is not installed; using the standard library JSON provider.")
+        return
+    app.json = OrjsonProvider(app)
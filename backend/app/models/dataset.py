@@ -4,6 +4,10 @@ from .. import db
 class Dataset(db.Model):
     __tablename__ = 'datasets'
 
+    STATUS_PROCESSING = 'processing'
+    STATUS_READY = 'ready'
+    STATUS_DELETING = 'deleting'  # soft-deleted, records still being purged
+
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(255), nullable=False)
     description = db.Column(db.Text)
@@ -11,10 +15,18 @@ class Dataset(db.Model):
     upload_time = db.Column(db.DateTime, default=datetime.utcnow)
     row_count = db.Column(db.Integer, default=0)
     column_names = db.Column(db.JSON)
+    status = db.Column(db.String(20), nullable=False, default=STATUS_READY, index=True)
+    metadata_storage = db.Column(db.String(10), nullable=False, default='json')
+    dedupe_key = db.Column(db.JSON)  # Columns identifying a row; appends skip rows already present
+    # Metadata column -> Arrow type name, widened across chunks and appends
+    column_types = db.Column(db.JSON)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
-    records = db.relationship('Record', backref='dataset', lazy=True, cascade="all, delete-orphan")
+    # passive_deletes: deleting a dataset never loads its records; they are removed
+    # set-based by DatasetService.purge_dataset or by the foreign key's ON DELETE CASCADE
+    records = db.relationship('Record', backref='dataset', lazy=True, cascade="all, delete-orphan",
+                              passive_deletes=True)
 
     def __repr__(self):
         return f'<Dataset {self.name}>'
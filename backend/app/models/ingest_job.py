@@ -0,0 +1,47 @@
+import uuid
+from datetime import datetime
+from .. import db
+
+
+class IngestJob(db.Model):
+    """Progress of one background CSV ingestion, shared by every worker process.
+
+    ``dataset_id`` is a plain reference rather than a foreign key: the job
+    outlives the pending dataset of a failed ingestion, which is discarded.
+    """
+    __tablename__ = 'ingest_jobs'
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+
+    id = db.Column(db.String(32), primary_key=True, default=lambda: uuid.uuid4().hex)
+    dataset_id = db.Column(db.Integer, index=True)
+    filename = db.Column(db.String(255), nullable=False)
+    state = db.Column(db.String(20), nullable=False, default=QUEUED, index=True)
+    rows_processed = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    def to_dict(self, rows_processed=None):
+        """Job status; ``rows_processed`` overrides the stored count with live progress."""
+        rows = self.rows_processed if rows_processed is None else rows_processed
+        elapsed = None
+        if self.started_at is not None:
+            elapsed = ((self.finished_at or datetime.utcnow()) - self.started_at).total_seconds()
+        return {
+            "job_id": self.id,
+            "dataset_id": self.dataset_id,
+            "filename": self.filename,
+            "state": self.state,
+            "rows_processed": rows,
+            "elapsed_seconds": round(elapsed, 3) if elapsed is not None else None,
+            "rows_per_second": round(rows / elapsed, 1) if elapsed else None,
+            "error": self.error
+        }
+
+    def __repr__(self):
+        return f'<IngestJob {self.id}>'
@@ -3,6 +3,18 @@ from .. import db
 
 class Record(db.Model):
     __tablename__ = 'records'
+    # Every analytics query filters by dataset and groups by category or date;
+    # on PostgreSQL the indexes also carry value so aggregations stay index-only.
+    __table_args__ = (
+        db.Index('ix_records_dataset_id', 'dataset_id', 'id'),  # keyset pagination
+        db.Index('ix_records_dataset_category', 'dataset_id', 'category',
+                 postgresql_include=['value']),
+        db.Index('ix_records_dataset_date', 'dataset_id', 'date', postgresql_include=['value']),
+        # Only datasets with a dedupe key hash their rows, so the index skips everything else
+        db.Index('ix_records_dataset_row_hash', 'dataset_id', 'row_hash',
+                 postgresql_where=db.text('row_hash IS NOT NULL'),
+                 sqlite_where=db.text('row_hash IS NOT NULL')),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     dataset_id = db.Column(db.Integer, db.ForeignKey('datasets.id', ondelete='CASCADE'), nullable=False)
@@ -10,6 +22,8 @@ class Record(db.Model):
     category = db.Column(db.String(255))
     value = db.Column(db.Numeric(15, 2))
     metadata_json = db.Column(db.JSON)  # Renamed from metadata to avoid conflict with SQLAlchemy metadata
+    row_number = db.Column(db.Integer)  # Position in the dataset's columnar metadata files, if any
+    row_hash = db.Column(db.BigInteger)  # Hash of the dataset's dedupe key columns, if it has one
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     def __repr__(self):
@@ -0,0 +1,44 @@
+from .. import db
+
+
+class RollupMixin:
+    """Shared aggregate columns: one row summarizes every record in its group."""
+    record_count = db.Column(db.Integer, nullable=False, default=0)
+    value_count = db.Column(db.Integer, nullable=False, default=0)  # non-null values, for averages
+    total_value = db.Column(db.Numeric(20, 2))
+    min_value = db.Column(db.Numeric(15, 2))
+    max_value = db.Column(db.Numeric(15, 2))
+
+
+class CategoryRollup(RollupMixin, db.Model):
+    __tablename__ = 'category_rollups'
+
+    dataset_id = db.Column(db.Integer, db.ForeignKey('datasets.id', ondelete='CASCADE'),
+                           primary_key=True)
+    category = db.Column(db.String(255), primary_key=True)
+
+    def __repr__(self):
+        return f'<CategoryRollup {self.dataset_id}/{self.category}>'
+
+
+class DailyRollup(RollupMixin, db.Model):
+    __tablename__ = 'daily_rollups'
+
+    dataset_id = db.Column(db.Integer, db.ForeignKey('datasets.id', ondelete='CASCADE'),
+                           primary_key=True)
+    date = db.Column(db.Date, primary_key=True)
+
+    def __repr__(self):
+        return f'<DailyRollup {self.dataset_id}/{self.date}>'
+
+
+class CategoryMonthRollup(RollupMixin, db.Model):
+    __tablename__ = 'category_month_rollups'
+
+    dataset_id = db.Column(db.Integer, db.ForeignKey('datasets.id', ondelete='CASCADE'),
+                           primary_key=True)
+    category = db.Column(db.String(255), primary_key=True)
+    month = db.Column(db.Date, primary_key=True)  # first day of the month
+
+    def __repr__(self):
+        return f'<CategoryMonthRollup {self.dataset_id}/{self.category}/{self.month}>'
@@ -0,0 +1,27 @@
+from datetime import datetime
+from .. import db
+
+
+class DatasetSketch(db.Model):
+    """Approximate-analytics state of one dataset, built during ingestion.
+
+    ``category_hll``, ``value_kll`` and ``sample`` hold serialized mergeable
+    sketches; the exact totals alongside make the approximate summary a
+    single-row read.
+    """
+    __tablename__ = 'dataset_sketches'
+
+    dataset_id = db.Column(db.Integer, db.ForeignKey('datasets.id', ondelete='CASCADE'),
+                           primary_key=True)
+    record_count = db.Column(db.Integer, nullable=False, default=0)
+    value_count = db.Column(db.Integer, nullable=False, default=0)
+    total_value = db.Column(db.Numeric(20, 2))
+    min_date = db.Column(db.Date)
+    max_date = db.Column(db.Date)
+    category_hll = db.Column(db.JSON, nullable=False)
+    value_kll = db.Column(db.JSON, nullable=False)
+    sample = db.Column(db.JSON, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<DatasetSketch {self.dataset_id}>'
@@ -0,0 +1,49 @@
+from flask import Blueprint, current_app, jsonify, request
+from ..services.cache_service import analytics_cache
+from ..services.sketch_service import SketchService
+from ..services.analytics_service import AnalyticsService
+from ..schemas.dataset_schema import dump_summary
+
+bp = Blueprint('analytics', __name__, url_prefix='/api/analytics')
+
+def _dataset_ids():
+    """Parses the comma-separated ``ids`` query parameter."""
+    raw = request.args.get('ids', '')
+    try:
+        ids = [int(value) for value in raw.split(',') if value.strip()]
+    except ValueError:
+        raise ValueError("ids must be a comma-separated list of dataset ids")
+    if not ids:
+        raise ValueError("ids is required")
+    return list(dict.fromkeys(ids))
+
+@bp.route('/cache', methods=['GET'])
+def get_cache_stats():
+    return jsonify(analytics_cache.stats())
+
+@bp.route('/summary', methods=['GET'])
+def get_merged_summary():
+    """Approximate summary of several datasets combined, from their merged sketches."""
+    try:
+        dataset_ids = _dataset_ids()
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    summary = SketchService.get_approximate_summary(dataset_ids)
+    if summary is None:
+        return jsonify({"error": "Sketches are missing for at least one dataset"}), 404
+    return jsonify({**dump_summary(summary), "dataset_ids": dataset_ids})
+
+@bp.route('/compare', methods=['GET'])
+def compare_datasets():
+    """Aligned series and category totals for several datasets in one response."""
+    try:
+        dataset_ids = _dataset_ids()
+        if len(dataset_ids) > current_app.config['COMPARE_MAX_DATASETS']:
+            raise ValueError(
+                f"At most {current_app.config['COMPARE_MAX_DATASETS']} datasets can be compared"
+            )
+        comparison = AnalyticsService.compare_datasets(dataset_ids,
+                                                       request.args.get('granularity', 'month'))
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    return jsonify(comparison)
@@ -1,37 +1,176 @@
-from flask import Blueprint, jsonify, request
+import os
+from datetime import date
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
 from ..services.dataset_service import DatasetService
 from ..services.analytics_service import AnalyticsService
-from ..schemas.dataset_schema import DatasetSchema, DatasetSummarySchema
+from ..services.record_service import RecordService
+from ..services.export_service import ExportService
+from ..services.aggregate_service import AggregateService
+from ..services.sketch_service import SketchService
+from ..services.job_service import JobService
+from ..services.downsampling import DEFAULT_METHOD, downsample_series, validate_method
+from ..schemas.dataset_schema import dump_dataset, dump_summary
 
 bp = Blueprint('datasets', __name__, url_prefix='/api/datasets')
-dataset_schema = DatasetSchema()
-datasets_schema = DatasetSchema(many=True)
-summary_schema = DatasetSummarySchema()
+
+def _conditional_json(payload):
+    """JSON response with an ETag; answers 304 with no body when If-None-Match matches."""
+    response = jsonify(payload)
+    response.add_etag()
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
 
 @bp.route('', methods=['GET'])
 def get_datasets():
     datasets = DatasetService.get_all_datasets()
     return jsonify({
-        "datasets": datasets_schema.dump(datasets),
+        "datasets": [dump_dataset(dataset) for dataset in datasets],
         "total": len(datasets)
     })
 
 @bp.route('/<int:id>', methods=['GET'])
 def get_dataset(id):
     dataset = DatasetService.get_dataset_by_id(id)
-    return jsonify(dataset_schema.dump(dataset))
+    return jsonify(dump_dataset(dataset))
 
 @bp.route('/<int:id>', methods=['DELETE'])
 def delete_dataset(id):
-    DatasetService.delete_dataset(id)
+    mode = request.args.get('mode') or current_app.config['DELETE_MODE']
+    try:
+        if mode == 'async':
+            DatasetService.mark_deleting(id)
+            JobService.submit_delete(current_app._get_current_object(), id)
+            return jsonify({"message": "Dataset scheduled for deletion", "dataset_id": id}), 202
+        DatasetService.delete_dataset(id)
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
     return jsonify({"message": "Dataset deleted successfully"}), 200
 
+@bp.route('/<int:id>/append', methods=['POST'])
+def append_to_dataset(id):
+    DatasetService.get_dataset_by_id(id)
+    if 'file' not in request.files:
+        return jsonify({"error": "No file part"}), 400
+
+    file = request.files['file']
+    if file.filename == '':
+        return jsonify({"error": "No selected file"}), 400
+
+    if not file.filename.endswith('.csv'):
+        return jsonify({"error": "Invalid file format. Only .csv files are supported."}), 400
+
+    try:
+        dataset, counts = DatasetService.append_csv(id, file)
+        return jsonify({**dump_dataset(dataset), **counts}), 200
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    except Exception as e:
+        return jsonify({"error": "Internal server error during processing"}), 500
+
 @bp.route('/<int:id>/summary', methods=['GET'])
 def get_summary(id):
-    summary = AnalyticsService.get_summary_statistics(id)
-    return jsonify(summary_schema.dump(summary))
+    mode = request.args.get('mode', 'exact')
+    if mode == 'approx':
+        summary = AnalyticsService.get_approximate_summary(id)
+    elif mode == 'exact':
+        summary = AnalyticsService.get_summary_statistics(id)
+    else:
+        return jsonify({"error": f"Invalid mode '{mode}'. Expected 'exact' or 'approx'."}), 400
+    return _conditional_json(dump_summary(summary))
 
 @bp.route('/<int:id>/chart-data', methods=['GET'])
 def get_chart_data(id):
-    chart_data = AnalyticsService.get_chart_data(id)
-    return jsonify(chart_data)
+    granularity = request.args.get('granularity', 'month')
+    max_points = request.args.get('max_points')
+    method = request.args.get('downsample', DEFAULT_METHOD)
+    try:
+        validate_method(method)
+        if max_points is not None:
+            try:
+                max_points = int(max_points)
+            except ValueError:
+                raise ValueError("max_points must be an integer")
+        chart_data = AnalyticsService.get_chart_data(id, granularity)
+        if max_points is not None:
+            # Applied to the cached series, so every max_points shares one cache entry
+            line_chart, downsampling = downsample_series(chart_data['line_chart'], max_points,
+                                                         method)
+            chart_data = {**chart_data, "line_chart": line_chart, "downsampling": downsampling}
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    return _conditional_json(chart_data)
+
+@bp.route('/<int:id>/dashboard', methods=['GET'])
+def get_dashboard(id):
+    granularity = request.args.get('granularity', 'month')
+    try:
+        dashboard = AnalyticsService.get_dashboard(id, granularity)
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    return _conditional_json({**dashboard, "summary": dump_summary(dashboard['summary'])})
+
+@bp.route('/<int:id>/aggregate', methods=['POST'])
+def aggregate_dataset(id):
+    dataset = DatasetService.get_dataset_by_id(id)
+    try:
+        result = AggregateService.aggregate(dataset, request.get_json(silent=True) or {})
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    return jsonify(result)
+
+@bp.route('/<int:id>/sample', methods=['GET'])
+def get_sample(id):
+    DatasetService.get_dataset_by_id(id)
+    try:
+        limit = int(request.args.get('limit', 100))
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    sample = SketchService.get_sample(id, limit=max(limit, 0))
+    if sample is None:
+        return jsonify({"error": "No sample available for this dataset"}), 404
+    return jsonify(sample)
+
+@bp.route('/<int:id>/records', methods=['GET'])
+def get_records(id):
+    dataset = DatasetService.get_dataset_by_id(id)
+    try:
+        limit = int(request.args.get('limit', 100))
+        if not 1 <= limit <= current_app.config['RECORDS_PAGE_MAX']:
+            raise ValueError(
+                f"limit must be between 1 and {current_app.config['RECORDS_PAGE_MAX']}"
+            )
+        columns = request.args.get('columns')
+        date_from = request.args.get('date_from')
+        date_to = request.args.get('date_to')
+        page = RecordService.get_page(
+            dataset,
+            limit=limit,
+            cursor=request.args.get('cursor'),
+            sort=request.args.get('sort', 'id'),
+            order=request.args.get('order', 'asc'),
+            columns=[col for col in columns.split(',') if col] if columns is not None else None,
+            category=request.args.get('category'),
+            date_from=date.fromisoformat(date_from) if date_from else None,
+            date_to=date.fromisoformat(date_to) if date_to else None
+        )
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    return jsonify(page)
+
+@bp.route('/<int:id>/export', methods=['GET'])
+def export_dataset(id):
+    dataset = DatasetService.get_dataset_by_id(id)
+    try:
+        generator, mimetype, extension = ExportService.stream(
+            dataset,
+            request.args.get('format', 'csv'),
+            batch_size=current_app.config['EXPORT_BATCH_SIZE']
+        )
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    filename = f"{os.path.splitext(dataset.filename)[0]}.{extension}"
+    return Response(
+        stream_with_context(generator),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
@@ -0,0 +1,22 @@
+from flask import Blueprint, Response
+from ..services.cache_service import analytics_cache
+from ..services.metrics_service import Counter, Gauge, metrics
+
+bp = Blueprint('metrics', __name__)
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+def _cache_metrics():
+    stats = analytics_cache.stats()
+    entries = Gauge('analytics_cache_entries', 'Results held by the analytics cache.')
+    entries.set(stats['entries'])
+    yield entries
+    for name in ('hits', 'misses', 'evictions', 'invalidations'):
+        counter = Counter(f'analytics_cache_{name}_total', f'Analytics cache {name}.')
+        counter.inc(stats[name])
+        yield counter
+
+@bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Request, SQL and ingest metrics of this worker process in the Prometheus text format."""
+    return Response(metrics.render(extra=_cache_metrics()), mimetype=PROMETHEUS_CONTENT_TYPE)
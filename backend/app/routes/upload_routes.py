@@ -1,9 +1,9 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, current_app, jsonify, request, url_for
 from ..services.dataset_service import DatasetService
-from ..schemas.dataset_schema import DatasetSchema
+from ..services.job_service import JobService
+from ..schemas.dataset_schema import dump_dataset
 
 bp = Blueprint('upload', __name__, url_prefix='/api/upload')
-dataset_schema = DatasetSchema()
 
 @bp.route('', methods=['POST'])
 def upload_file():
@@ -13,6 +13,9 @@ def upload_file():
     file = request.files['file']
     name = request.form.get('name', file.filename)
     description = request.form.get('description', '')
+    # Comma separated columns identifying a row; later appends skip rows already present
+    dedupe_key = [col.strip() for col in request.form.get('dedupe_key', '').split(',')
+                  if col.strip()]
 
     if file.filename == '':
         return jsonify({"error": "No selected file"}), 400
@@ -20,12 +23,32 @@ def upload_file():
     if not file.filename.endswith('.csv'):
         return jsonify({"error": "Invalid file format. Only .csv files are supported."}), 400
 
+    mode = request.args.get('mode') or request.form.get('mode') or current_app.config['UPLOAD_MODE']
+    if mode == 'async':
+        try:
+            job = JobService.submit_upload(current_app._get_current_object(), file, name,
+                                           description, dedupe_key)
+        except Exception as e:
+            # Spooling failed; the pending dataset has already been discarded
+            return jsonify({"error": "Internal server error during processing"}), 500
+        status_url = url_for('upload.get_upload_job', job_id=job.id)
+        response = jsonify({**job.to_dict(), "status_url": status_url})
+        response.headers['Location'] = status_url
+        return response, 202
+
     try:
-        dataset = DatasetService.process_csv_upload(file, name, description)
-        return jsonify(dataset_schema.dump(dataset)), 201
+        dataset = DatasetService.process_csv_upload(file, name, description, dedupe_key=dedupe_key)
+        return jsonify(dump_dataset(dataset)), 201
     except ValueError as ve:
         # Business logic errors (e.g. malformed CSV)
         return jsonify({"error": str(ve)}), 400
     except Exception as e:
         # System errors
         return jsonify({"error": "Internal server error during processing"}), 500
+
+@bp.route('/jobs/<job_id>', methods=['GET'])
+def get_upload_job(job_id):
+    job = JobService.get_job(job_id)
+    if job is None:
+        return jsonify({"error": "Upload job not found"}), 404
+    return jsonify(job)
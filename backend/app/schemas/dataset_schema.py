@@ -8,6 +8,9 @@ class DatasetSchema(Schema):
     upload_time = fields.DateTime(dump_only=True)
     row_count = fields.Int(dump_only=True)
     column_names = fields.List(fields.Str(), dump_only=True)
+    status = fields.Str(dump_only=True)
+    metadata_storage = fields.Str(dump_only=True)
+    dedupe_key = fields.List(fields.Str(), dump_only=True, allow_none=True)
     created_at = fields.DateTime(dump_only=True)
     updated_at = fields.DateTime(dump_only=True)
 
@@ -20,3 +23,61 @@ class DatasetSummarySchema(Schema):
     avg_value = fields.Float()
     min_value = fields.Float()
     max_value = fields.Float()
+    # Only present in approximate summaries (?mode=approx)
+    mode = fields.Str()
+    quantiles = fields.Dict(keys=fields.Str(), values=fields.Float(allow_none=True))
+    error_bounds = fields.Dict()
+
+
+# Hot endpoints serialize with these instead of the schemas above: same output,
+# without marshmallow's per-field dispatch
+SUMMARY_INTS = ('dataset_id', 'total_records', 'category_count')
+SUMMARY_FLOATS = ('total_value', 'avg_value', 'min_value', 'max_value')
+
+
+def dump_dataset(dataset):
+    """``DatasetSchema().dump(dataset)`` for one dataset."""
+    return {
+        "id": dataset.id,
+        "name": dataset.name,
+        "description": dataset.description,
+        "filename": dataset.filename,
+        "upload_time": _isoformat(dataset.upload_time),
+        "row_count": dataset.row_count,
+        "column_names": dataset.column_names,
+        "status": dataset.status,
+        "metadata_storage": dataset.metadata_storage,
+        "dedupe_key": dataset.dedupe_key,
+        "created_at": _isoformat(dataset.created_at),
+        "updated_at": _isoformat(dataset.updated_at)
+    }
+
+
+def dump_summary(summary):
+    """``DatasetSummarySchema().dump(summary)`` for a summary dict."""
+    output = {}
+    for key in SUMMARY_INTS:
+        if key in summary:
+            output[key] = int(summary[key]) if summary[key] is not None else None
+    for key in SUMMARY_FLOATS:
+        if key in summary:
+            output[key] = float(summary[key]) if summary[key] is not None else None
+    if 'date_range' in summary:
+        output['date_range'] = {
+            key: str(value) if value is not None else None
+            for key, value in summary['date_range'].items()
+        }
+    if 'mode' in summary:
+        output['mode'] = summary['mode']
+    if 'quantiles' in summary:
+        output['quantiles'] = {
+            key: float(value) if value is not None else None
+            for key, value in summary['quantiles'].items()
+        }
+    if 'error_bounds' in summary:
+        output['error_bounds'] = summary['error_bounds']
+    return output
+
+
+def _isoformat(value):
+    return value.isoformat() if value is not None else None
@@ -0,0 +1,487 @@
+import json
+import logging
+import math
+import time
+from datetime import date
+from decimal import Decimal
+from flask import current_app
+from sqlalchemy import func, select
+from ..models.record import Record
+from ..models.rollup import CategoryRollup, DailyRollup
+from .cache_service import analytics_cache
+from .columnar_store import STORAGE_COLUMNAR, ColumnarReader
+from .duckdb_engine import DuckDBAnalytics, duckdb_enabled, replica_files
+from .time_buckets import bucket_expression, bucket_label, to_date, validate_granularity
+from .. import db
+
+logger = logging.getLogger(__name__)
+
+STANDARD_COLUMNS = ('date', 'category', 'value')
+MEASURE_OPS = ('sum', 'avg', 'min', 'max', 'count', 'distinct')
+NUMERIC_OPS = ('sum', 'avg', 'min', 'max')
+FILTER_OPS = ('eq', 'ne', 'gt', 'gte', 'lt', 'lte', 'in')
+
+
+class AggregateService:
+    @staticmethod
+    def aggregate(dataset, spec):
+        """Runs a group-by aggregation described by a request body.
+
+        ``spec`` holds ``group_by`` (column names; ``date`` is bucketed by
+        ``granularity``), ``measures`` (``{"op": ..., "column": ...}``),
+        ``filters`` (``{"column": ..., "op": ..., "value": ...}``) and optional
+        ``order_by``/``order``/``limit``. Work is pushed down to SQL (JSON path
+        extraction for metadata fields), or to Arrow for columnar datasets, and
+        results are cached per dataset like the other analytics. Under
+        ``ANALYTICS_ENGINE=duckdb``, requests that only touch date, category
+        and value scan the dataset's Parquet replica instead.
+        """
+        key = ('aggregate', json.dumps(spec, sort_keys=True, default=str))
+        return analytics_cache.get_or_compute(
+            dataset.id, key,
+            lambda: AggregateService._execute(dataset, AggregateService.plan(dataset, spec))
+        )
+
+    @staticmethod
+    def plan(dataset, spec):
+        """Validates a request and estimates how many groups it produces.
+
+        Groupings estimated above ``AGGREGATE_MAX_GROUPS`` are rejected unless
+        the request bounds its output with a ``limit``.
+        """
+        if not isinstance(spec, dict):
+            raise ValueError("Request body must be a JSON object.")
+        columns = dataset.column_names or list(STANDARD_COLUMNS)
+        max_groups = current_app.config['AGGREGATE_MAX_GROUPS']
+
+        group_by = spec.get('group_by') or []
+        if not isinstance(group_by, list) or len(set(group_by)) != len(group_by):
+            raise ValueError("group_by must be a list of distinct column names.")
+        for column in group_by:
+            _check_column(column, columns)
+        granularity = validate_granularity(spec.get('granularity', 'day'))
+
+        measures = []
+        for measure in spec.get('measures') or [{'op': 'count'}]:
+            if not isinstance(measure, dict) or measure.get('op') not in MEASURE_OPS:
+                raise ValueError(f"Each measure needs an op, one of: {', '.join(MEASURE_OPS)}")
+            op, column = measure['op'], measure.get('column')
+            if column is None and op != 'count':
+                raise ValueError(f"Measure '{op}' requires a column.")
+            if column is not None:
+                _check_column(column, columns)
+                if op in NUMERIC_OPS and column in ('date', 'category'):
+                    raise ValueError(f"Measure '{op}' needs a numeric column, not '{column}'.")
+            name = f"{op}_{column}" if column else op
+            measures.append({'op': op, 'column': column, 'name': name})
+        names = [measure['name'] for measure in measures]
+        if len(set(names)) != len(names):
+            raise ValueError("Duplicate measures.")
+
+        filters = []
+        for condition in spec.get('filters') or []:
+            if not isinstance(condition, dict) or condition.get('op', 'eq') not in FILTER_OPS:
+                raise ValueError(
+                    f"Each filter needs a column and an op, one of: {', '.join(FILTER_OPS)}"
+                )
+            column, op = condition.get('column'), condition.get('op', 'eq')
+            value = condition.get('value')
+            _check_column(column, columns)
+            if op == 'in' and not isinstance(value, list):
+                raise ValueError("Filter op 'in' requires a list value.")
+            values = [_filter_value(column, item) for item in (value if op == 'in' else [value])]
+            filters.append(
+                {'column': column, 'op': op, 'value': values if op == 'in' else values[0]}
+            )
+
+        order_by = spec.get('order_by')
+        if order_by is not None and order_by not in group_by and order_by not in names:
+            raise ValueError(
+                f"order_by must be a group_by column or measure name: {', '.join(group_by + names)}"
+            )
+        order = spec.get('order', 'asc' if order_by is None or order_by in group_by else 'desc')
+        if order not in ('asc', 'desc'):
+            raise ValueError("Invalid order. Expected 'asc' or 'desc'.")
+
+        limit = spec.get('limit')
+        if limit is not None and (not isinstance(limit, int) or not 1 <= limit <= max_groups):
+            raise ValueError(f"limit must be an integer between 1 and {max_groups}")
+
+        referenced = (set(group_by) | {m['column'] for m in measures if m['column']}
+                      | {f['column'] for f in filters})
+        columnar = dataset.metadata_storage == STORAGE_COLUMNAR and any(
+            column not in STANDARD_COLUMNS for column in referenced
+        )
+        engine = 'arrow' if columnar else 'sql'
+        if (engine == 'sql' and referenced <= set(STANDARD_COLUMNS) and duckdb_enabled()
+                and replica_files(dataset.id)):
+            engine = 'duckdb'
+        plan = {
+            'group_by': group_by,
+            'granularity': granularity,
+            'measures': measures,
+            'filters': filters,
+            'order_by': order_by,
+            'order': order,
+            'limit': limit,
+            'engine': engine,
+        }
+        plan['estimated_groups'] = AggregateService._estimate_groups(dataset, plan)
+        if limit is None and plan['estimated_groups'] > max_groups:
+            raise ValueError(
+                f"Grouping by {', '.join(group_by)} would produce about "
+                f"{plan['estimated_groups']} groups (at most {max_groups} allowed). "
+                "Add filters, group by fewer columns or set a limit."
+            )
+        return plan
+
+    @staticmethod
+    def _estimate_groups(dataset, plan):
+        """Product of per-key distinct estimates, capped at the row count."""
+        estimate = 1
+        for column in plan['group_by']:
+            estimate *= AggregateService._estimate_distinct(dataset, column, plan['granularity'])
+        return min(estimate, max(dataset.row_count or 0, 1))
+
+    @staticmethod
+    def _estimate_distinct(dataset, column, granularity):
+        if column == 'category':
+            rollup_count = db.session.query(func.count(CategoryRollup.category)).filter(
+                CategoryRollup.dataset_id == dataset.id
+            ).scalar()
+            if rollup_count:
+                return rollup_count
+        if column == 'date':
+            first, last = db.session.query(
+                func.min(DailyRollup.date), func.max(DailyRollup.date)
+            ).filter(DailyRollup.dataset_id == dataset.id).first()
+            if first is None:
+                first, last = db.session.query(func.min(Record.date), func.max(Record.date)).filter(
+                    Record.dataset_id == dataset.id
+                ).first()
+            if first is None:
+                return 1
+            days = (to_date(last) - to_date(first)).days + 1
+            if granularity == 'day':
+                return days
+            if granularity == 'week':
+                return days // 7 + 2
+            return days // {'month': 28, 'quarter': 90, 'year': 365}[granularity] + 2
+
+        sample_rows = current_app.config['AGGREGATE_SAMPLE_ROWS']
+        if dataset.metadata_storage == STORAGE_COLUMNAR and column not in STANDARD_COLUMNS:
+            table = next(ColumnarReader(dataset.id).iter_tables([column]))
+            counts = table.column(column).slice(0, sample_rows).value_counts()
+            frequencies = counts.field('counts').to_pylist()
+        else:
+            sample = select(_column_expression(column).label('key')).where(
+                Record.dataset_id == dataset.id
+            ).limit(sample_rows).subquery()
+            frequencies = db.session.execute(
+                select(func.count()).select_from(sample).group_by(sample.c.key)
+            ).scalars().all()
+        return _estimate_from_sample(frequencies, dataset.row_count or 0)
+
+    @staticmethod
+    def _execute(dataset, plan):
+        start_time = time.time()
+        if plan['engine'] == 'arrow':
+            rows, truncated = _ArrowAggregation(dataset, plan).run()
+        elif plan['engine'] == 'duckdb':
+            rows, truncated = AggregateService._run_duckdb(dataset, plan)
+        else:
+            rows, truncated = AggregateService._run_sql(dataset, plan)
+
+        elapsed = time.time() - start_time
+        logger.info(f"Aggregated dataset {dataset.id} into {len(rows)} groups "
+                    f"with {plan['engine']} in {elapsed:.4f}s")
+        return {
+            "dataset_id": dataset.id,
+            "group_by": plan['group_by'],
+            "measures": [measure['name'] for measure in plan['measures']],
+            "engine": plan['engine'],
+            "estimated_groups": plan['estimated_groups'],
+            "truncated": truncated,
+            "rows": rows
+        }
+
+    @staticmethod
+    def _run_duckdb(dataset, plan):
+        cap = plan['limit'] or current_app.config['AGGREGATE_MAX_GROUPS']
+        result = DuckDBAnalytics.aggregate(plan, replica_files(dataset.id), cap)
+        rows = [_output_row(plan, row) for row in result[:cap]]
+        return rows, plan['limit'] is None and len(result) > cap
+
+    @staticmethod
+    def _run_sql(dataset, plan):
+        dialect = db.engine.dialect.name
+        keys = []
+        for column in plan['group_by']:
+            if column == 'date':
+                bucket = bucket_expression(Record.date, plan['granularity'], dialect)
+                keys.append(bucket.label('date'))
+            else:
+                keys.append(_column_expression(column).label(column))
+
+        aggregates = []
+        for measure in plan['measures']:
+            op, column = measure['op'], measure['column']
+            expr = _column_expression(column, numeric=op in NUMERIC_OPS) if column else None
+            if op == 'count':
+                aggregate = func.count(expr) if expr is not None else func.count()
+            elif op == 'distinct':
+                aggregate = func.count(func.distinct(expr))
+            else:
+                aggregate = getattr(func, op)(expr)
+            aggregates.append(aggregate.label(measure['name']))
+
+        query = select(*keys, *aggregates).where(Record.dataset_id == dataset.id)
+        for condition in plan['filters']:
+            query = query.where(_sql_condition(condition))
+        if keys:
+            query = query.group_by(*keys)
+
+        if plan['order_by'] is not None:
+            ordered = next(col for col in keys + aggregates if col.name == plan['order_by'])
+            query = query.order_by(ordered.desc() if plan['order'] == 'desc' else ordered.asc())
+        else:
+            query = query.order_by(*keys)
+
+        cap = plan['limit'] or current_app.config['AGGREGATE_MAX_GROUPS']
+        result = db.session.execute(query.limit(cap + 1)).all()
+        rows = [_output_row(plan, row._mapping) for row in result[:cap]]
+        return rows, plan['limit'] is None and len(result) > cap
+
+
+class _ArrowAggregation:
+    """Group-by over columnar datasets, one Parquet part at a time.
+
+    Only the referenced metadata columns are read; standard columns are
+    streamed from SQL in the same row order only when the request uses them.
+    Each part is reduced to partial aggregates that are re-aggregated at the
+    end, so memory is bounded by the number of groups, not rows.
+    """
+
+    COMBINE = {'sum': 'sum', 'count': 'sum', 'count_all': 'sum', 'min': 'min', 'max': 'max'}
+
+    def __init__(self, dataset, plan):
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        self.pa, self.pc = pa, pc
+        self.dataset = dataset
+        self.plan = plan
+        referenced = (set(plan['group_by'])
+                      | {m['column'] for m in plan['measures'] if m['column']}
+                      | {f['column'] for f in plan['filters']})
+        self.standard = [col for col in STANDARD_COLUMNS if col in referenced]
+        self.metadata = sorted(col for col in referenced if col not in STANDARD_COLUMNS)
+        self.keys = plan['group_by']
+
+        # (column, pyarrow aggregation) pairs computed per part and re-combined at the end
+        self.partial_specs = []
+        for measure in plan['measures']:
+            op, column = measure['op'], measure['column']
+            if op == 'count' and column is None:
+                self._partial(None, 'count_all')
+            elif op == 'avg':
+                self._partial(column, 'sum')
+                self._partial(column, 'count')
+            elif op != 'distinct':
+                self._partial(column, op)
+        self.distinct_columns = sorted(
+            {m['column'] for m in plan['measures'] if m['op'] == 'distinct'}
+        )
+
+    def _partial(self, column, aggregation):
+        if (column, aggregation) not in self.partial_specs:
+            self.partial_specs.append((column, aggregation))
+
+    def run(self):
+        partials = []
+        distinct = {column: [] for column in self.distinct_columns}
+        for table in self._tables():
+            table = self._prepare(table)
+            if self.partial_specs:
+                partials.append(self._reduce(table, [
+                    ([] if column is None else column, aggregation)
+                    for column, aggregation in self.partial_specs
+                ], [f'p{i}' for i in range(len(self.partial_specs))]))
+            for column in self.distinct_columns:
+                columns = list(dict.fromkeys(self.keys + [column]))
+                distinct[column].append(table.select(columns).group_by(columns).aggregate([]))
+
+        groups = {}
+        if partials:
+            combined = self._reduce(self.pa.concat_tables(partials), [
+                (f'p{i}', self.COMBINE[aggregation])
+                for i, (_, aggregation) in enumerate(self.partial_specs)
+            ], [f'p{i}' for i in range(len(self.partial_specs))])
+            for row in combined.to_pylist():
+                groups.setdefault(tuple(row[key] for key in self.keys), {}).update(row)
+        for column, tables in distinct.items():
+            if not tables:
+                continue
+            group_keys = list(dict.fromkeys(self.keys + [column]))
+            unique = self.pa.concat_tables(tables).group_by(group_keys).aggregate([])
+            counts = self._reduce(unique, [(column, 'count')], [f'distinct_{column}'])
+            for row in counts.to_pylist():
+                groups.setdefault(tuple(row[key] for key in self.keys), {}).update(row)
+
+        rows = [self._finish(key, values) for key, values in groups.items()]
+        rows = self._order(rows)
+        cap = self.plan['limit'] or current_app.config['AGGREGATE_MAX_GROUPS']
+        return rows[:cap], self.plan['limit'] is None and len(rows) > cap
+
+    def _reduce(self, table, aggregations, names):
+        result = table.group_by(self.keys).aggregate(aggregations)
+        renamed = {
+            (f"{column}_{aggregation}" if column else aggregation): name
+            for (column, aggregation), name in zip(aggregations, names)
+        }
+        return result.rename_columns([renamed.get(col, col) for col in result.column_names])
+
+    def _tables(self):
+        pa = self.pa
+        reader = ColumnarReader(self.dataset.id)
+        result = None
+        if self.standard:
+            query = select(*[getattr(Record, col) for col in self.standard]).where(
+                Record.dataset_id == self.dataset.id
+            ).order_by(Record.id).execution_options(
+                stream_results=True, yield_per=current_app.config['EXPORT_BATCH_SIZE']
+            )
+            result = db.session.execute(query)
+        types = {'date': pa.date32(), 'category': pa.string(), 'value': pa.float64()}
+
+        for part, table in zip(reader.manifest['parts'], reader.iter_tables(self.metadata)):
+            if result is not None:
+                rows = result.fetchmany(part['rows'])
+                for index, column in enumerate(self.standard):
+                    values = [row[index] for row in rows]
+                    if column == 'value':
+                        values = [float(v) if v is not None else None for v in values]
+                    table = table.append_column(column, pa.array(values, type=types[column]))
+            yield table
+
+    def _prepare(self, table):
+        pc = self.pc
+        for condition in self.plan['filters']:
+            column = table.column(condition['column'])
+            try:
+                if condition['op'] == 'in':
+                    value_set = self.pa.array(condition['value']).cast(column.type)
+                    mask = pc.is_in(column, value_set=value_set)
+                else:
+                    function = {'eq': 'equal', 'ne': 'not_equal', 'gt': 'greater',
+                                'gte': 'greater_equal', 'lt': 'less',
+                                'lte': 'less_equal'}[condition['op']]
+                    value = self.pa.scalar(condition['value']).cast(column.type)
+                    mask = pc.call_function(function, [column, value])
+            except (self.pa.ArrowInvalid, self.pa.ArrowNotImplementedError, self.pa.ArrowTypeError):
+                raise ValueError(f"Filter value {condition['value']!r} does not match "
+                                 f"column '{condition['column']}'.")
+            table = table.filter(mask)
+        if 'date' in self.keys and self.plan['granularity'] != 'day':
+            index = table.schema.get_field_index('date')
+            bucketed = pc.floor_temporal(table.column('date'), unit=self.plan['granularity'],
+                                         week_starts_monday=True)
+            table = table.set_column(index, 'date', bucketed)
+        return table
+
+    def _finish(self, key, values):
+        row = dict(zip(self.keys, key))
+        for measure in self.plan['measures']:
+            op, column = measure['op'], measure['column']
+            if op == 'count' and column is None:
+                value = values.get(f'p{self.partial_specs.index((None, "count_all"))}', 0)
+            elif op == 'avg':
+                total = values.get(f'p{self.partial_specs.index((column, "sum"))}')
+                count = values.get(f'p{self.partial_specs.index((column, "count"))}')
+                value = total / count if count else None
+            elif op == 'distinct':
+                value = values.get(f'distinct_{column}', 0)
+            else:
+                value = values.get(f'p{self.partial_specs.index((column, op))}')
+            row[measure['name']] = value
+        return _output_row(self.plan, row)
+
+    def _order(self, rows):
+        plan = self.plan
+        if plan['order_by'] is not None:
+            fields, reverse = [plan['order_by']], plan['order'] == 'desc'
+        else:
+            fields, reverse = self.keys, False
+        return sorted(rows, key=lambda row: tuple((row[f] is not None, row[f]) for f in fields),
+                      reverse=reverse)
+
+
+def _check_column(column, columns):
+    if not isinstance(column, str) or column not in columns:
+        raise ValueError(f"Unknown column '{column}'. Expected one of: {', '.join(columns)}")
+
+
+def _filter_value(column, value):
+    if column == 'date':
+        try:
+            return date.fromisoformat(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid date filter value: {value!r}")
+    if column == 'value' and not isinstance(value, (int, float)):
+        raise ValueError(f"Invalid value filter: {value!r}")
+    if not isinstance(value, (str, int, float, bool)):
+        raise ValueError(f"Invalid filter value for '{column}': {value!r}")
+    return value
+
+
+def _column_expression(column, numeric=False):
+    """SQL expression for a standard column or a metadata field extracted by JSON path."""
+    if column in STANDARD_COLUMNS:
+        return getattr(Record, column)
+    field = Record.metadata_json[column]
+    return field.as_float() if numeric else field.as_string()
+
+
+def _sql_condition(condition):
+    column, op, value = condition['column'], condition['op'], condition['value']
+    sample = value[0] if op == 'in' and value else value
+    numeric = (column not in STANDARD_COLUMNS and isinstance(sample, (int, float))
+               and not isinstance(sample, bool))
+    expr = _column_expression(column, numeric=numeric)
+    if op == 'in':
+        return expr.in_(value)
+    return {
+        'eq': expr == value, 'ne': expr != value, 'gt': expr > value,
+        'gte': expr >= value, 'lt': expr < value, 'lte': expr <= value,
+    }[op]
+
+
+def _output_row(plan, row):
+    output = {}
+    for key in plan['group_by']:
+        value = row[key]
+        if key == 'date':
+            value = to_date(value)
+            value = bucket_label(value, plan['granularity']) if value is not None else None
+        output[key] = float(value) if isinstance(value, Decimal) else value
+    for measure in plan['measures']:
+        value = row[measure['name']]
+        if isinstance(value, Decimal) or (measure['op'] in NUMERIC_OPS and value is not None):
+            value = float(value)
+        output[measure['name']] = value
+    return output
+
+
+def _estimate_from_sample(frequencies, row_count):
+    """Distinct-value estimate from sampled value frequencies.
+
+    Uses the GEE estimator (Charikar et al.): values seen once in the sample are
+    scaled by sqrt(N/n), values seen more often are counted as-is. When the
+    sample is the whole dataset the count is exact.
+    """
+    sampled = sum(frequencies)
+    if sampled == 0:
+        return 1
+    if sampled >= row_count:
+        return len(frequencies)
+    singletons = sum(1 for count in frequencies if count == 1)
+    return int(math.sqrt(row_count / sampled) * singletons + (len(frequencies) - singletons))
@@ -1,7 +1,13 @@
 from ..models.record import Record
 from ..models.dataset import Dataset
+from ..models.rollup import CategoryRollup, DailyRollup
 from .. import db
-import pandas as pd
+from .cache_service import cached_analytics
+from .sketch_service import SketchService
+from .duckdb_engine import DuckDBAnalytics, duckdb_enabled, replica_files
+from .time_buckets import (DEFAULT_GRANULARITY, bucket_expression, bucket_label, fill_series,
+                           next_bucket, to_date, validate_granularity)
+from flask import abort
 from sqlalchemy import func
 import logging
 import time
@@ -10,9 +16,77 @@ logger = logging.getLogger(__name__)
 
 class AnalyticsService:
     @staticmethod
+    @cached_analytics('summary')
     def get_summary_statistics(dataset_id):
         logger.info(f"Calculating summary statistics for dataset: {dataset_id}")
         start_time = time.time()
+
+        files = AnalyticsService._replica(dataset_id)
+        if files:
+            summary = DuckDBAnalytics.summary(dataset_id, files)
+            logger.info(f"Summary scanned in DuckDB in {time.time() - start_time:.4f}s.")
+            return summary
+
+        # Rollups hold one row per category, so this never touches the records table
+        stats = db.session.query(
+            func.count(CategoryRollup.category).label('category_count'),
+            func.sum(CategoryRollup.record_count).label('total_records'),
+            func.sum(CategoryRollup.value_count).label('value_count'),
+            func.sum(CategoryRollup.total_value).label('total_value'),
+            func.min(CategoryRollup.min_value).label('min_value'),
+            func.max(CategoryRollup.max_value).label('max_value')
+        ).filter(CategoryRollup.dataset_id == dataset_id).first()
+
+        if not stats.category_count:
+            return AnalyticsService._scan_summary_statistics(dataset_id)
+
+        date_range = db.session.query(
+            func.min(DailyRollup.date).label('min_date'),
+            func.max(DailyRollup.date).label('max_date')
+        ).filter(DailyRollup.dataset_id == dataset_id).first()
+
+        elapsed = time.time() - start_time
+        logger.info(f"Summary read from rollups in {elapsed:.4f}s "
+                    f"for {stats.total_records} records.")
+
+        total_value = float(stats.total_value or 0)
+        return {
+            "dataset_id": dataset_id,
+            "total_records": int(stats.total_records),
+            "date_range": {
+                "min": str(date_range.min_date) if date_range.min_date else None,
+                "max": str(date_range.max_date) if date_range.max_date else None
+            },
+            "category_count": stats.category_count,
+            "total_value": total_value,
+            "avg_value": total_value / stats.value_count if stats.value_count else 0.0,
+            "min_value": float(stats.min_value or 0),
+            "max_value": float(stats.max_value or 0)
+        }
+
+    @staticmethod
+    @cached_analytics('summary_approx')
+    def get_approximate_summary(dataset_id):
+        """Summary from the dataset's sketches, adding p50/p90/p99 and error bounds.
+
+        Reads one row regardless of dataset size; datasets without sketches get
+        the exact summary instead (``mode`` tells which one was returned).
+        """
+        summary = SketchService.get_approximate_summary([dataset_id])
+        if summary is None:
+            logger.info(f"No sketches for dataset {dataset_id}; serving the exact summary.")
+            return {**AnalyticsService.get_summary_statistics(dataset_id), "mode": "exact"}
+        return summary
+
+    @staticmethod
+    def _replica(dataset_id):
+        """Parquet parts to query under ``ANALYTICS_ENGINE=duckdb``; empty means use SQL."""
+        return replica_files(dataset_id) if duckdb_enabled() else []
+
+    @staticmethod
+    def _scan_summary_statistics(dataset_id):
+        """Full-scan fallback for datasets ingested before rollups existed."""
+        start_time = time.time()
         # Using SQLAlchemy for basic stats
         stats = db.session.query(
             func.count(Record.id).label('total_records'),
@@ -44,10 +118,69 @@ class AnalyticsService:
         }
 
     @staticmethod
-    def get_chart_data(dataset_id):
+    @cached_analytics('chart_data')
+    def get_chart_data(dataset_id, granularity=DEFAULT_GRANULARITY):
+        validate_granularity(granularity)
         logger.info(f"Generating visualization vectors for dataset: {dataset_id}")
         start_time = time.time()
-        
+
+        files = AnalyticsService._replica(dataset_id)
+        if files:
+            category_chart = [
+                {"category": category, "value": float(value or 0)}
+                for category, value in DuckDBAnalytics.category_totals(files)
+            ]
+            line_chart = fill_series(DuckDBAnalytics.bucket_totals(files, granularity), granularity)
+            elapsed = time.time() - start_time
+            logger.info(f"Visualization vectors scanned in DuckDB in {elapsed:.4f}s.")
+            return {
+                "bar_chart": category_chart,
+                "line_chart": line_chart,
+                "pie_chart": category_chart
+            }
+
+        bar_data = db.session.query(
+            CategoryRollup.category,
+            CategoryRollup.total_value.label('value')
+        ).filter(CategoryRollup.dataset_id == dataset_id).all()
+
+        if not bar_data:
+            return AnalyticsService._scan_chart_data(dataset_id, granularity)
+
+        line_chart = AnalyticsService._time_series(
+            DailyRollup.date, DailyRollup.total_value, DailyRollup.dataset_id == dataset_id,
+            granularity
+        )
+
+        elapsed = time.time() - start_time
+        logger.info(f"Visualization vectors read from rollups in {elapsed:.4f}s.")
+
+        category_chart = [{"category": row.category, "value": float(row.value or 0)}
+                          for row in bar_data]
+        return {
+            "bar_chart": category_chart,
+            "line_chart": line_chart,
+            "pie_chart": category_chart
+        }
+
+    @staticmethod
+    def _time_series(date_column, value_column, dataset_filter, granularity):
+        """Sums values per time bucket in the database and returns a gap-filled series."""
+        bucket = bucket_expression(date_column, granularity, db.engine.dialect.name).label('bucket')
+        rows = db.session.query(
+            bucket,
+            func.sum(value_column).label('value')
+        ).filter(dataset_filter, date_column != None).group_by(bucket).order_by(bucket).all()
+
+        series = fill_series(rows, granularity)
+        logger.info(f"Time-series aggregated to {len(series)} {granularity} buckets.")
+        return series
+
+    @staticmethod
+    def _scan_chart_data(dataset_id, granularity=DEFAULT_GRANULARITY):
+        """Full-scan fallback for datasets ingested before rollups existed."""
+        start_time = time.time()
+
         # Bar Chart: Value by Category
         bar_data = db.session.query(
             Record.category,
@@ -56,35 +189,209 @@ class AnalyticsService:
         
         logger.debug(f"Categorical distribution fetch complete: {len(bar_data)} classes found.")
 
-        # Line Chart: Value over Time (Monthly aggregation)
-        # Note: This syntax might vary slightly between SQLite and PostgreSQL
-        # For simplicity in this demo, we'll fetch all and aggregate with Pandas or just simple group by if date exists
-        line_data_raw = db.session.query(
-            Record.date,
-            func.sum(Record.value).label('value')
-        ).filter(Record.dataset_id == dataset_id, Record.date != None).group_by(Record.date).order_by(Record.date).all()
-
-        # Format line data
-        line_chart = []
-        if line_data_raw:
-            df = pd.DataFrame(line_data_raw, columns=['date', 'value'])
-            df['date'] = pd.to_datetime(df['date'])
-            
-            try:
-                # Pandas 2.2.0+ uses 'ME' for month-end
-                df_monthly = df.resample('ME', on='date').sum().reset_index()
-            except ValueError:
-                # Older pandas use 'M'
-                df_monthly = df.resample('M', on='date').sum().reset_index()
-                
-            line_chart = [{"date": row['date'].strftime('%Y-%m'), "value": float(row['value'])} for _, row in df_monthly.iterrows()]
-            logger.info(f"Time-series resampled to {len(line_chart)} monthly buckets.")
+        # Line Chart: Value over Time, bucketed in the database
+        line_chart = AnalyticsService._time_series(
+            Record.date, Record.value, Record.dataset_id == dataset_id, granularity
+        )
 
         elapsed = time.time() - start_time
         logger.info(f"Visualization pipeline complete in {elapsed:.4f}s.")
 
+        category_chart = [{"category": row.category, "value": float(row.value or 0)}
+                          for row in bar_data]
         return {
-            "bar_chart": [{"category": row.category, "value": float(row.value)} for row in bar_data],
+            "bar_chart": category_chart,
             "line_chart": line_chart,
-            "pie_chart": [{"category": row.category, "value": float(row.value)} for row in bar_data] # Reuse bar data for pie
+            "pie_chart": category_chart
+        }
+
+    @staticmethod
+    @cached_analytics('dashboard')
+    def get_dashboard(dataset_id, granularity=DEFAULT_GRANULARITY):
+        """Summary, category breakdown and time series for one dataset in one round trip.
+
+        With rollups this reads two small grouped queries; datasets without rollups
+        are answered by a single grouped scan of records keyed by (category, bucket),
+        and under ``ANALYTICS_ENGINE=duckdb`` by two grouped scans of the replica.
+        """
+        validate_granularity(granularity)
+        logger.info(f"Assembling dashboard for dataset: {dataset_id}")
+        start_time = time.time()
+
+        files = AnalyticsService._replica(dataset_id)
+        category_stats = [] if files else db.session.query(
+            CategoryRollup.category,
+            CategoryRollup.record_count,
+            CategoryRollup.value_count,
+            CategoryRollup.total_value,
+            CategoryRollup.min_value,
+            CategoryRollup.max_value
+        ).filter(CategoryRollup.dataset_id == dataset_id).all()
+
+        if files:
+            category_stats, bucket_stats = DuckDBAnalytics.dashboard_groups(files, granularity)
+        elif category_stats:
+            bucket = bucket_expression(
+                DailyRollup.date, granularity, db.engine.dialect.name
+            ).label('bucket')
+            bucket_stats = db.session.query(
+                bucket,
+                func.sum(DailyRollup.total_value),
+                func.min(DailyRollup.date),
+                func.max(DailyRollup.date)
+            ).filter(DailyRollup.dataset_id == dataset_id).group_by(bucket).all()
+        else:
+            category_stats, bucket_stats = AnalyticsService._scan_dashboard_groups(
+                dataset_id, granularity
+            )
+
+        total_records = sum(row[1] for row in category_stats)
+        value_count = sum(row[2] for row in category_stats)
+        total_value = sum(float(row[3] or 0) for row in category_stats)
+        min_values = [row[4] for row in category_stats if row[4] is not None]
+        max_values = [row[5] for row in category_stats if row[5] is not None]
+        min_dates = [row[2] for row in bucket_stats if row[2] is not None]
+        max_dates = [row[3] for row in bucket_stats if row[3] is not None]
+
+        summary = {
+            "dataset_id": dataset_id,
+            "total_records": int(total_records),
+            "date_range": {
+                "min": str(min(min_dates)) if min_dates else None,
+                "max": str(max(max_dates)) if max_dates else None
+            },
+            "category_count": len(category_stats),
+            "total_value": total_value,
+            "avg_value": total_value / value_count if value_count else 0.0,
+            "min_value": float(min(min_values)) if min_values else 0.0,
+            "max_value": float(max(max_values)) if max_values else 0.0
+        }
+
+        elapsed = time.time() - start_time
+        logger.info(f"Dashboard assembled in {elapsed:.4f}s.")
+
+        return {
+            "summary": summary,
+            "granularity": granularity,
+            "category_breakdown": [
+                {"category": row[0], "value": float(row[3] or 0)} for row in category_stats
+            ],
+            "time_series": fill_series([(row[0], row[1]) for row in bucket_stats], granularity)
         }
+
+    @staticmethod
+    def compare_datasets(dataset_ids, granularity=DEFAULT_GRANULARITY):
+        """Aligned time series and category totals for several datasets.
+
+        Datasets with rollups are answered by one ``GROUP BY dataset_id, bucket``
+        over daily rollups plus one read of their category rollups; any without
+        rollups share the same two grouped queries over records. Work therefore
+        grows with datasets x buckets, not rows.
+        """
+        validate_granularity(granularity)
+        start_time = time.time()
+        datasets = db.session.query(Dataset.id, Dataset.name).filter(
+            Dataset.id.in_(dataset_ids), Dataset.status == Dataset.STATUS_READY
+        ).all()
+        missing = set(dataset_ids) - {row.id for row in datasets}
+        if missing:
+            unknown = ', '.join(str(i) for i in sorted(missing))
+            abort(404, description=f"Unknown datasets: {unknown}")
+
+        rolled_up = {row[0] for row in db.session.query(CategoryRollup.dataset_id).filter(
+            CategoryRollup.dataset_id.in_(dataset_ids)
+        ).distinct()}
+        scanned = [dataset_id for dataset_id in dataset_ids if dataset_id not in rolled_up]
+
+        bucket_rows, category_rows = [], []
+        sources = [(DailyRollup, CategoryRollup, DailyRollup.total_value,
+                    CategoryRollup.total_value, list(rolled_up))]
+        if scanned:
+            sources.append((Record, Record, Record.value, Record.value, scanned))
+        for date_model, category_model, date_value, category_value, ids in sources:
+            if not ids:
+                continue
+            bucket = bucket_expression(
+                date_model.date, granularity, db.engine.dialect.name
+            ).label('bucket')
+            bucket_rows += db.session.query(
+                date_model.dataset_id, bucket, func.sum(date_value)
+            ).filter(date_model.dataset_id.in_(ids), date_model.date != None).group_by(
+                date_model.dataset_id, bucket
+            ).all()
+            category_rows += db.session.query(
+                category_model.dataset_id, category_model.category, func.sum(category_value)
+            ).filter(category_model.dataset_id.in_(ids)).group_by(
+                category_model.dataset_id, category_model.category
+            ).all()
+
+        # One shared bucket axis so every dataset's series lines up index by index
+        totals = {}
+        for dataset_id, key, value in bucket_rows:
+            totals[(dataset_id, to_date(key))] = float(value or 0)
+        axis = []
+        if totals:
+            bucket, last = min(key for _, key in totals), max(key for _, key in totals)
+            while bucket <= last:
+                axis.append(bucket)
+                bucket = next_bucket(bucket, granularity)
+
+        categories = {}
+        for dataset_id, category, value in category_rows:
+            categories.setdefault(dataset_id, []).append(
+                {"category": category, "value": float(value or 0)}
+            )
+
+        names = {row.id: row.name for row in datasets}
+        elapsed = time.time() - start_time
+        logger.info(f"Compared {len(dataset_ids)} datasets over {len(axis)} {granularity} buckets "
+                    f"in {elapsed:.4f}s.")
+        return {
+            "granularity": granularity,
+            "buckets": [bucket_label(bucket, granularity) for bucket in axis],
+            "datasets": [
+                {
+                    "dataset_id": dataset_id,
+                    "name": names[dataset_id],
+                    "series": [totals.get((dataset_id, bucket), 0.0) for bucket in axis],
+                    "category_totals": sorted(categories.get(dataset_id, []),
+                                              key=lambda row: row["category"]),
+                    "total_value": sum(row["value"] for row in categories.get(dataset_id, []))
+                }
+                for dataset_id in dataset_ids
+            ]
+        }
+
+    @staticmethod
+    def _scan_dashboard_groups(dataset_id, granularity):
+        """One grouped pass over records, folded into per-category and per-bucket stats."""
+        bucket = bucket_expression(Record.date, granularity, db.engine.dialect.name).label('bucket')
+        groups = db.session.query(
+            Record.category,
+            bucket,
+            func.count(Record.id),
+            func.count(Record.value),
+            func.sum(Record.value),
+            func.min(Record.value),
+            func.max(Record.value),
+            func.min(Record.date),
+            func.max(Record.date)
+        ).filter(Record.dataset_id == dataset_id).group_by(Record.category, bucket).all()
+
+        categories = {}
+        buckets = {}
+        for category, key, count, value_count, total, low, high, first, last in groups:
+            stats = categories.setdefault(category, [category, 0, 0, 0.0, None, None])
+            stats[1] += count
+            stats[2] += value_count
+            stats[3] += float(total or 0)
+            if low is not None:
+                stats[4] = low if stats[4] is None else min(stats[4], low)
+                stats[5] = high if stats[5] is None else max(stats[5], high)
+            if key is not None:
+                entry = buckets.setdefault(key, [key, 0.0, first, last])
+                entry[1] += float(total or 0)
+                entry[2] = min(entry[2], first)
+                entry[3] = max(entry[3], last)
+
+        return list(categories.values()), list(buckets.values())
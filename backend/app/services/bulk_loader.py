@@ -0,0 +1,124 @@
+import csv
+import io
+import json
+import logging
+from datetime import datetime
+from sqlalchemy import insert
+from ..models.record import Record
+
+logger = logging.getLogger(__name__)
+
+RECORD_COLUMNS = ('dataset_id', 'date', 'category', 'value', 'metadata_json', 'row_number',
+                  'row_hash', 'created_at')
+
+
+class BulkLoader:
+    """Batched executemany of row mappings through a Core insert(), bypassing the ORM.
+
+    Loaders run on the caller's connection, so every batch joins the surrounding
+    transaction and a rollback there discards everything that was loaded.
+    Use as a context manager around the batches of one upload.
+    """
+    name = 'core'
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.statement = insert(Record.__table__)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def load(self, rows):
+        if rows:
+            self.connection.execute(self.statement, rows)
+        return len(rows)
+
+
+class SQLiteBulkLoader(BulkLoader):
+    """Core executemany with the page cache enlarged for large single-transaction inserts.
+
+    ``synchronous``, ``journal_mode`` and ``temp_store`` cannot change inside a
+    transaction, so only the per-connection cache size is raised here and restored
+    afterwards.
+    """
+    name = 'sqlite'
+    PRAGMAS = {
+        'cache_size': -64000,  # ~64MB page cache
+    }
+
+    def __enter__(self):
+        self._previous = {}
+        for pragma, value in self.PRAGMAS.items():
+            self._previous[pragma] = self.connection.exec_driver_sql(f"PRAGMA {pragma}").scalar()
+            self.connection.exec_driver_sql(f"PRAGMA {pragma} = {value}")
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        for pragma, value in self._previous.items():
+            self.connection.exec_driver_sql(f"PRAGMA {pragma} = {value}")
+        return False
+
+
+class PostgresCopyLoader(BulkLoader):
+    """Streams each batch to PostgreSQL with ``COPY ... FROM STDIN``.
+
+    Falls back to the Core executemany path when the DBAPI driver has no
+    ``copy_expert`` (anything other than psycopg2).
+    """
+    name = 'copy'
+    COPY_SQL = (
+        f"COPY {Record.__tablename__} ({', '.join(RECORD_COLUMNS)}) "
+        "FROM STDIN WITH (FORMAT csv, NULL '\\N')"
+    )
+
+    def load(self, rows):
+        if not rows:
+            return 0
+
+        cursor = self.connection.connection.dbapi_connection.cursor()
+        if not hasattr(cursor, 'copy_expert'):
+            cursor.close()
+            return super().load(rows)
+
+        created_at = datetime.utcnow()
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        for row in rows:
+            writer.writerow((
+                row['dataset_id'],
+                _copy_value(row.get('date')),
+                _copy_value(row.get('category')),
+                _copy_value(row.get('value')),
+                _copy_value(json.dumps(row['metadata_json'])
+                            if row.get('metadata_json') is not None else None),
+                _copy_value(row.get('row_number')),
+                _copy_value(row.get('row_hash')),
+                created_at,
+            ))
+        buf.seek(0)
+        try:
+            cursor.copy_expert(self.COPY_SQL, buf)
+        finally:
+            cursor.close()
+        return len(rows)
+
+
+def _copy_value(value):
+    return '\\N' if value is None else value
+
+
+LOADERS = {loader.name: loader for loader in (BulkLoader, SQLiteBulkLoader, PostgresCopyLoader)}
+DIALECT_LOADERS = {'sqlite': 'sqlite', 'postgresql': 'copy'}
+
+
+def get_bulk_loader(connection, strategy='auto'):
+    """Returns the bulk loader for ``strategy``, resolving ``auto`` from the engine dialect."""
+    if strategy == 'auto':
+        strategy = DIALECT_LOADERS.get(connection.dialect.name, 'core')
+    if strategy not in LOADERS:
+        raise ValueError(f"Unknown bulk load strategy: {strategy}")
+    logger.debug(f"Using '{strategy}' bulk loader for dialect {connection.dialect.name}")
+    return LOADERS[strategy](connection)
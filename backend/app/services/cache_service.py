@@ -0,0 +1,145 @@
+import functools
+import inspect
+import threading
+import time
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class AnalyticsCache:
+    """Bounded in-process LRU cache with TTL for per-dataset analytics results.
+
+    Entries are keyed by dataset id plus query name and parameters, and indexed
+    per dataset so a delete or re-ingest can drop everything derived from it.
+    Each worker process holds its own cache; the TTL bounds how long another
+    worker may serve a result after the dataset changed. Invalidation bumps a
+    per-dataset generation, so a result computed from data read before the
+    invalidation is returned to its caller but never stored.
+    """
+
+    def __init__(self, max_entries=1024, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._by_dataset = {}
+        self._generations = {}  # dataset id -> number of invalidations; survives clear()
+        self._epoch = 0  # bumped by clear()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def init_app(self, app):
+        self.max_entries = app.config.get('ANALYTICS_CACHE_SIZE', self.max_entries)
+        self.ttl = app.config.get('ANALYTICS_CACHE_TTL', self.ttl)
+        self.clear()
+        app.extensions['analytics_cache'] = self
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def get_or_compute(self, dataset_id, key, compute):
+        """Returns the cached value for ``(dataset_id, key)``, computing and storing it on a miss.
+
+        Cached values are shared between callers and must be treated as read-only.
+        """
+        if not self.enabled:
+            return compute()
+
+        full_key = (dataset_id, key)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(full_key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(full_key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                self._discard(full_key)
+                self.evictions += 1
+            self.misses += 1
+            generation = (self._epoch, self._generations.get(dataset_id, 0))
+
+        value = compute()
+
+        with self._lock:
+            if generation != (self._epoch, self._generations.get(dataset_id, 0)):
+                logger.debug(f"Not caching a result for dataset {dataset_id} "
+                             f"invalidated while it was computed")
+                return value
+            self._entries[full_key] = (now + self.ttl, value)
+            self._entries.move_to_end(full_key)
+            self._by_dataset.setdefault(dataset_id, set()).add(full_key)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._discard(oldest)
+                self.evictions += 1
+        return value
+
+    def invalidate_dataset(self, dataset_id):
+        """Drops every cached result derived from one dataset."""
+        with self._lock:
+            keys = self._by_dataset.pop(dataset_id, set())
+            self._generations[dataset_id] = self._generations.get(dataset_id, 0) + 1
+            for full_key in keys:
+                self._entries.pop(full_key, None)
+            self.invalidations += len(keys)
+        if keys:
+            logger.debug(
+                f"Invalidated {len(keys)} cached analytics results for dataset {dataset_id}"
+            )
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_dataset.clear()
+            self._epoch += 1
+            self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations
+            }
+
+    def _discard(self, full_key):
+        self._entries.pop(full_key, None)
+        keys = self._by_dataset.get(full_key[0])
+        if keys is not None:
+            keys.discard(full_key)
+            if not keys:
+                del self._by_dataset[full_key[0]]
+
+
+analytics_cache = AnalyticsCache()
+
+
+def cached_analytics(name):
+    """Caches a ``(dataset_id, ...)`` analytics function in ``analytics_cache``.
+
+    Arguments are normalized against the signature, so calls that rely on
+    defaults share an entry with calls that pass them explicitly.
+    """
+    def decorator(fn):
+        signature = inspect.signature(fn)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            params = tuple(bound.arguments.items())
+            dataset_id = params[0][1]
+            return analytics_cache.get_or_compute(dataset_id, (name,) + params[1:],
+                                                  lambda: fn(*args, **kwargs))
+        return wrapper
+    return decorator
@@ -0,0 +1,234 @@
+import bisect
+import json
+import logging
+import os
+import shutil
+import uuid
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+STORAGE_JSON = 'json'
+STORAGE_COLUMNAR = 'columnar'
+METADATA_STORAGES = (STORAGE_JSON, STORAGE_COLUMNAR)
+MANIFEST_FILE = 'manifest.json'
+PENDING_MANIFEST_FILE = 'manifest.pending.json'
+
+
+def validate_storage(storage):
+    if storage not in METADATA_STORAGES:
+        raise ValueError(f"Invalid metadata storage '{storage}'. "
+                         f"Expected one of: {', '.join(METADATA_STORAGES)}")
+    if storage == STORAGE_COLUMNAR:
+        _require_pyarrow()
+    return storage
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ValueError("Columnar metadata storage requires the optional pyarrow package.")
+    return pyarrow, pyarrow.parquet
+
+
+def dataset_directory(dataset_id):
+    return os.path.join(current_app.config['UPLOAD_FOLDER'], 'columnar', str(dataset_id))
+
+
+def remove_dataset_files(dataset_id):
+    """Deletes the part files of a dataset; a no-op for datasets stored as JSON."""
+    shutil.rmtree(dataset_directory(dataset_id), ignore_errors=True)
+
+
+def commit_dataset_files(dataset_id):
+    """Publishes the manifest written by an ingest once its database transaction committed.
+
+    Parts the new manifest no longer lists (superseded by a widening) are removed.
+    """
+    directory = dataset_directory(dataset_id)
+    pending = os.path.join(directory, PENDING_MANIFEST_FILE)
+    if os.path.exists(pending):
+        os.replace(pending, os.path.join(directory, MANIFEST_FILE))
+        _remove_unlisted_parts(directory)
+
+
+def discard_uncommitted_files(dataset_id):
+    """Undoes the files of an ingest whose transaction rolled back.
+
+    A new dataset loses its whole directory; an append only loses the parts
+    its committed manifest does not list.
+    """
+    directory = dataset_directory(dataset_id)
+    if not os.path.exists(os.path.join(directory, MANIFEST_FILE)):
+        remove_dataset_files(dataset_id)
+        return
+    _remove_unlisted_parts(directory)
+
+
+def _remove_unlisted_parts(directory):
+    with open(os.path.join(directory, MANIFEST_FILE)) as fh:
+        listed = {part['file'] for part in json.load(fh)['parts']}
+    for name in os.listdir(directory):
+        if name != MANIFEST_FILE and name not in listed:
+            os.remove(os.path.join(directory, name))
+
+
+class ColumnarWriter:
+    """Writes the metadata columns of one upload as typed Parquet part files.
+
+    Each ingest chunk becomes one part file, so memory stays bounded by a chunk.
+    Column types are inferred from the first chunk; when a later chunk does not
+    fit (e.g. text in a column that started out numeric) the column is widened
+    and the parts already written are rewritten with the wider type. The
+    manifest written by ``close()`` records the types and each part's first
+    row number, which is what ``Record.row_number`` points into. With
+    ``append`` the writer continues after the parts already committed.
+    """
+
+    def __init__(self, dataset_id, columns, append=False):
+        self.pa, self.pq = _require_pyarrow()
+        self.directory = dataset_directory(dataset_id)
+        self.columns = columns
+        self.schema = None
+        self.parts = []
+        self.rows = 0
+        if append:
+            with open(os.path.join(self.directory, MANIFEST_FILE)) as fh:
+                manifest = json.load(fh)
+            self.parts = manifest['parts']
+            self.rows = manifest['rows']
+            if self.parts:
+                first_part = os.path.join(self.directory, self.parts[0]['file'])
+                self.schema = self.pq.read_schema(first_part)
+                self.schema = self.schema.remove_metadata()
+        else:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            os.makedirs(self.directory)
+
+    def write(self, df):
+        """Writes the metadata columns of one chunk and returns the row number of its first row."""
+        table = self.pa.Table.from_pandas(df[self.columns], preserve_index=False)
+        if self.schema is None:
+            self.schema = self.pa.schema([
+                (field.name, self._storage_type(field.type)) for field in table.schema
+            ])
+        table = self._conform(table)
+
+        name = self._part_name(len(self.parts))
+        self.pq.write_table(table, os.path.join(self.directory, name))
+        start = self.rows
+        self.parts.append({'file': name, 'start': start, 'rows': table.num_rows})
+        self.rows += table.num_rows
+        return start
+
+    def close(self):
+        """Writes the manifest as pending; ``commit_dataset_files`` publishes it."""
+        manifest = {
+            'rows': self.rows,
+            'columns': [{'name': field.name, 'type': str(field.type)} for field in self.schema],
+            'parts': self.parts,
+        }
+        with open(os.path.join(self.directory, PENDING_MANIFEST_FILE), 'w') as fh:
+            json.dump(manifest, fh)
+        logger.info(f"Wrote {self.rows} rows of {len(self.columns)} metadata columns "
+                    f"to {self.directory}")
+
+    @staticmethod
+    def _part_name(index):
+        # Parts are never rewritten in place, so a reader of the committed manifest stays consistent
+        return f"part-{index:05d}-{uuid.uuid4().hex[:8]}.parquet"
+
+    def _storage_type(self, arrow_type):
+        # Chunks may arrive categorical or downcast, so parts are stored at full width
+        pa = self.pa
+        if pa.types.is_dictionary(arrow_type):
+            arrow_type = arrow_type.value_type
+        if (pa.types.is_null(arrow_type) or pa.types.is_string(arrow_type)
+                or pa.types.is_large_string(arrow_type)):
+            return pa.string()
+        if pa.types.is_integer(arrow_type):
+            return pa.int64()
+        if pa.types.is_floating(arrow_type):
+            return pa.float64()
+        return arrow_type
+
+    def _conform(self, table):
+        pa = self.pa
+        columns = []
+        for field in self.schema:
+            column = table.column(field.name)
+            if column.type != field.type:
+                try:
+                    column = column.cast(field.type)
+                except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+                    numeric = pa.types.is_integer(field.type) and pa.types.is_floating(column.type)
+                    self._widen(field.name, pa.float64() if numeric else pa.string())
+                    column = column.cast(self.schema.field(field.name).type)
+            columns.append(column)
+        return pa.Table.from_arrays(columns, schema=self.schema)
+
+    def _widen(self, name, arrow_type):
+        index = self.schema.get_field_index(name)
+        logger.info(f"Widening metadata column '{name}' "
+                    f"from {self.schema.field(name).type} to {arrow_type}")
+        self.schema = self.schema.set(index, self.pa.field(name, arrow_type))
+        for number, part in enumerate(self.parts):
+            table = self.pq.read_table(os.path.join(self.directory, part['file']))
+            part['file'] = self._part_name(number)
+            self.pq.write_table(table.set_column(index, name, table.column(index).cast(arrow_type)),
+                                os.path.join(self.directory, part['file']))
+
+
+class ColumnarReader:
+    """Reads metadata columns of a columnar dataset, touching only the columns asked for."""
+
+    def __init__(self, dataset_id):
+        self.pa, self.pq = _require_pyarrow()
+        self.directory = dataset_directory(dataset_id)
+        with open(os.path.join(self.directory, MANIFEST_FILE)) as fh:
+            self.manifest = json.load(fh)
+        self._starts = [part['start'] for part in self.manifest['parts']]
+
+    @property
+    def column_types(self):
+        return {column['name']: column['type'] for column in self.manifest['columns']}
+
+    def iter_rows(self, columns, batch_size=5000):
+        """Yields one tuple of ``columns`` values per row, in row-number order."""
+        for part in self.manifest['parts']:
+            parquet_file = self.pq.ParquetFile(os.path.join(self.directory, part['file']))
+            for batch in parquet_file.iter_batches(batch_size=batch_size, columns=columns):
+                yield from zip(*(batch.column(col).to_pylist() for col in columns))
+
+    def iter_tables(self, columns):
+        """Yields each part as an Arrow table restricted to ``columns``."""
+        for part in self.manifest['parts']:
+            yield self.pq.read_table(os.path.join(self.directory, part['file']), columns=columns)
+
+    def take(self, columns, row_numbers):
+        """Returns ``{row_number: {column: value}}`` for scattered rows.
+
+        Only the parts those rows fall in are read.
+        """
+        if not columns:
+            return {row_number: {} for row_number in row_numbers}
+        by_part = {}
+        for row_number in row_numbers:
+            part = bisect.bisect_right(self._starts, row_number) - 1
+            by_part.setdefault(part, []).append(row_number)
+
+        values = {}
+        for index, wanted in by_part.items():
+            part = self.manifest['parts'][index]
+            table = self.pq.read_table(os.path.join(self.directory, part['file']), columns=columns)
+            rows = table.take([row_number - part['start'] for row_number in wanted]).to_pylist()
+            values.update(zip(wanted, rows))
+        return values
+
+    def storage_bytes(self):
+        return sum(
+            os.path.getsize(os.path.join(self.directory, part['file']))
+            for part in self.manifest['parts']
+        )
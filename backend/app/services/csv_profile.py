@@ -0,0 +1,182 @@
+import io
+import logging
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+CSV_ENGINES = ('c', 'pyarrow')
+REQUIRED_COLUMNS = ('category', 'value')
+SAMPLE_BYTES = 4 * 1024 * 1024  # upper bound on what the profile reads up front
+MAX_REPORTED_ROWS = 10  # row numbers listed in a validation error
+
+
+class CsvProfile:
+    """Column types of an upload, inferred from a sample before the full parse.
+
+    Low-cardinality text columns are parsed as ``category``, integer columns
+    are downcast per chunk, the ``date`` format is detected once instead of
+    per chunk, and ``value`` is checked over the whole file before anything
+    is written, so a bad cell is reported with its row number.
+    """
+
+    def __init__(self, columns, categorical, integer, numeric, date_format, bytes_per_row):
+        self.columns = columns
+        self.categorical = categorical
+        self.integer = integer
+        self.numeric = numeric
+        self.date_format = date_format
+        self.bytes_per_row = bytes_per_row
+
+    @classmethod
+    def sample(cls, stream, sample_rows=10000, category_ratio=0.5):
+        """Profiles the first ``sample_rows`` rows of ``stream`` and rewinds it."""
+        start = stream.tell()
+        head = stream.read(SAMPLE_BYTES)
+        stream.seek(start)
+        if len(head) == SAMPLE_BYTES:
+            head = head[:head.rfind(b'\n') + 1]  # never sample a truncated last row
+        sample = pd.read_csv(io.BytesIO(head), nrows=sample_rows)
+
+        categorical, integer, numeric = [], [], []
+        for col in sample.columns:
+            series = sample[col]
+            if col == 'value':
+                continue
+            if pd.api.types.is_integer_dtype(series):
+                integer.append(col)
+            elif pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+                numeric.append(col)
+            elif (col != 'date' and series.count()
+                  and series.nunique() <= category_ratio * series.count()):
+                categorical.append(col)
+
+        date_format = None
+        if 'date' in sample.columns:
+            dates = sample['date'].dropna().astype(str)
+            if not dates.empty:
+                date_format = pd.tseries.api.guess_datetime_format(dates.iloc[0])
+                if date_format is not None and pd.to_datetime(
+                    dates, format=date_format, errors='coerce'
+                ).isna().any():
+                    date_format = None
+
+        profile = cls(sample.columns.tolist(), categorical, integer, numeric, date_format,
+                      len(head) / max(len(sample), 1))
+        logger.info(f"CSV profile from {len(sample)} rows: categorical={categorical}, "
+                    f"integer={integer}, date_format={date_format}")
+        return profile
+
+    def validate(self, stream):
+        """Checks the header and every ``value`` cell, then rewinds ``stream``.
+
+        Runs before any database work. Only the ``value`` column is converted,
+        with pyarrow when available; the slower pass that finds the offending
+        row numbers runs only when that conversion fails.
+        """
+        missing_cols = [col for col in REQUIRED_COLUMNS if col not in self.columns]
+        if missing_cols:
+            raise ValueError(f"Missing required columns in CSV: {', '.join(missing_cols)}")
+
+        start = stream.tell()
+        try:
+            valid = _values_convert(stream)
+        finally:
+            stream.seek(start)
+        if valid:
+            return
+
+        raw = pd.read_csv(stream, usecols=['value'], dtype={'value': str})['value']
+        stream.seek(start)
+        bad = pd.to_numeric(raw, errors='coerce').isna() & raw.notna()
+        if bad.any():
+            rows = (bad[bad].index + 1).tolist()  # 1-based data rows, excluding the header
+            listed = ', '.join(str(row) for row in rows[:MAX_REPORTED_ROWS])
+            more = (f" and {len(rows) - MAX_REPORTED_ROWS} more"
+                    if len(rows) > MAX_REPORTED_ROWS else "")
+            raise ValueError(f"Non-numeric values in column 'value' at rows {listed}{more}.")
+
+    def iter_chunks(self, stream, chunk_size, engine='c'):
+        """Parses ``stream`` with the profiled types in DataFrames of about ``chunk_size`` rows."""
+        if engine not in CSV_ENGINES:
+            raise ValueError(
+                f"Unknown CSV engine '{engine}'. Expected one of: {', '.join(CSV_ENGINES)}"
+            )
+        if engine == 'pyarrow':
+            chunks = self._iter_arrow(stream, chunk_size)
+        else:
+            chunks = self._iter_pandas(stream, chunk_size)
+        for chunk in chunks:
+            for col in self.integer:
+                if pd.api.types.is_integer_dtype(chunk[col]):
+                    chunk[col] = _downcast_integer(chunk[col])
+            yield chunk
+
+    def _iter_pandas(self, stream, chunk_size):
+        dtype = {col: 'category' for col in self.categorical}
+        dtype['value'] = 'float64'
+        yield from pd.read_csv(stream, chunksize=chunk_size, dtype=dtype)
+
+    def _iter_arrow(self, stream, chunk_size):
+        try:
+            import pyarrow as pa
+            import pyarrow.csv as pa_csv
+        except ImportError:
+            raise ValueError("The pyarrow CSV engine requires pyarrow to be installed.")
+
+        # Every column but value arrives as text and numbers are inferred per chunk,
+        # as the C parser does, so dates in metadata stay strings
+        column_types = {col: pa.string() for col in self.columns}
+        column_types.update(
+            {col: pa.dictionary(pa.int32(), pa.string()) for col in self.categorical}
+        )
+        column_types['value'] = pa.float64()
+        block_size = int(min(max(self.bytes_per_row * chunk_size, 1 << 20), 64 << 20))
+        reader = pa_csv.open_csv(
+            stream,
+            read_options=pa_csv.ReadOptions(block_size=block_size),
+            convert_options=pa_csv.ConvertOptions(column_types=column_types,
+                                                  strings_can_be_null=True)
+        )
+        numeric_types = {col: pa.int64() for col in self.integer}
+        numeric_types.update({col: pa.float64() for col in self.numeric})
+        for batch in reader:
+            columns = dict(zip(batch.schema.names, batch.columns))
+            for col, arrow_type in numeric_types.items():
+                try:
+                    columns[col] = columns[col].cast(arrow_type)
+                except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+                    pass  # text in this chunk: kept as strings, like the C parser
+            yield pa.table(columns).to_pandas()
+
+
+def _values_convert(stream):
+    """True when every ``value`` cell parses as a number; streams the column only."""
+    try:
+        import pyarrow as pa
+        import pyarrow.csv as pa_csv
+    except ImportError:
+        try:
+            pd.read_csv(stream, usecols=['value'], dtype={'value': 'float64'})
+        except ValueError:
+            return False
+        return True
+
+    try:
+        reader = pa_csv.open_csv(stream, convert_options=pa_csv.ConvertOptions(
+            include_columns=['value'], column_types={'value': pa.float64()}
+        ))
+        for _ in reader:
+            pass
+    except pa.ArrowInvalid:
+        return False
+    return True
+
+
+def _downcast_integer(series):
+    """Smallest integer dtype holding every value; cheaper than ``pd.to_numeric(downcast=...)``."""
+    values = series.to_numpy()
+    if values.size == 0:
+        return series
+    dtype = np.promote_types(np.min_scalar_type(values.min()), np.min_scalar_type(values.max()))
+    return series if dtype == values.dtype else series.astype(dtype)
@@ -1,35 +1,143 @@
+import numpy as np
 import pandas as pd
 import os
+from flask import abort, current_app
+from sqlalchemy import delete, select
 from werkzeug.utils import secure_filename
 from ..models.dataset import Dataset
 from ..models.record import Record
+from .bulk_loader import get_bulk_loader
+from .rollup_service import RollupAccumulator, RollupService
+from .sketch_service import SketchAccumulator, SketchService
+from .cache_service import analytics_cache
+from .metrics_service import metrics
+from .csv_profile import CsvProfile
+from .partition_service import PartitionService
+from .duckdb_engine import ReplicaWriter, duckdb_enabled, remove_replica_files, replica_files
+from .columnar_store import (
+    STORAGE_COLUMNAR, STORAGE_JSON, ColumnarWriter, commit_dataset_files, discard_uncommitted_files,
+    remove_dataset_files, validate_storage
+)
 from .. import db
 from datetime import datetime
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Row hashes per IN (...) lookup, well below every driver's parameter limit
+DEDUPE_LOOKUP_BATCH = 1000
+
 class DatasetService:
     @staticmethod
     def get_all_datasets():
         logger.info("Fetching all datasets")
-        return Dataset.query.order_by(Dataset.upload_time.desc()).all()
+        return Dataset.query.filter_by(status=Dataset.STATUS_READY).order_by(
+            Dataset.upload_time.desc()
+        ).all()
 
     @staticmethod
     def get_dataset_by_id(dataset_id):
         logger.info(f"Fetching dataset with id: {dataset_id}")
-        return Dataset.query.get_or_404(dataset_id)
+        dataset = Dataset.query.get_or_404(dataset_id)
+        if dataset.status == Dataset.STATUS_DELETING:
+            abort(404)
+        return dataset
 
     @staticmethod
     def delete_dataset(dataset_id):
         logger.info(f"Deleting dataset with id: {dataset_id}")
-        dataset = Dataset.query.get_or_404(dataset_id)
-        db.session.delete(dataset)
-        db.session.commit()
+        DatasetService.mark_deleting(dataset_id)
+        DatasetService.purge_dataset(dataset_id)
         return True
 
     @staticmethod
-    def process_csv_upload(file, name, description):
+    def mark_deleting(dataset_id):
+        """Soft-deletes a dataset: it answers 404 from now on and waits for ``purge_dataset``."""
+        dataset = DatasetService.get_dataset_by_id(dataset_id)
+        if dataset.status != Dataset.STATUS_READY:
+            raise ValueError("Datasets still being ingested cannot be deleted.")
+        # Conditional on the status, so a concurrent delete or append claim wins only once
+        claimed = Dataset.query.filter_by(id=dataset_id, status=Dataset.STATUS_READY).update(
+            {'status': Dataset.STATUS_DELETING}, synchronize_session=False
+        )
+        db.session.commit()
+        if not claimed:
+            abort(404)
+        analytics_cache.invalidate_dataset(dataset_id)
+
+    @staticmethod
+    def purge_dataset(dataset_id, batch_size=None):
+        """Removes a dataset with its records, rollups, sketches and files.
+
+        A partitioned dataset drops its partition. Otherwise records go in
+        set-based ``DELETE`` batches of ``DELETE_BATCH_SIZE``, each committed on
+        its own: nothing is loaded into the session and no single transaction
+        locks or journals the whole dataset. Safe to re-run after an interruption.
+        """
+        batch_size = batch_size or current_app.config.get('DELETE_BATCH_SIZE', 50000)
+        batch = select(Record.id).where(Record.dataset_id == dataset_id).limit(batch_size)
+        deleted = 0
+        # A dataset with its own partition loses every record at once
+        partitioned = PartitionService.drop_partition(dataset_id)
+        while not partitioned:
+            result = db.session.execute(
+                delete(Record).where(Record.id.in_(batch))
+                .execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+            deleted += result.rowcount
+            if result.rowcount < batch_size:
+                break
+
+        RollupService.delete(dataset_id)
+        SketchService.delete(dataset_id)
+        # Also catches rows an append committed after the last batch
+        db.session.execute(
+            delete(Record).where(Record.dataset_id == dataset_id)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.execute(delete(Dataset).where(Dataset.id == dataset_id))
+        db.session.commit()
+        remove_dataset_files(dataset_id)
+        remove_replica_files(dataset_id)
+        analytics_cache.invalidate_dataset(dataset_id)
+        logger.info(f"Purged dataset {dataset_id} ({deleted} records)")
+
+    @staticmethod
+    def create_pending_dataset(filename, name, description, dedupe_key=None):
+        """Registers a dataset that is still being ingested; it stays hidden from listings."""
+        dataset = Dataset(
+            name=name,
+            description=description,
+            filename=secure_filename(filename),
+            row_count=0,
+            status=Dataset.STATUS_PROCESSING,
+            metadata_storage=validate_storage(
+                current_app.config.get('METADATA_STORAGE', STORAGE_JSON)
+            ),
+            dedupe_key=dedupe_key or None
+        )
+        db.session.add(dataset)
+        db.session.commit()
+        PartitionService.create_partition(dataset.id)
+        logger.info(f"Registered pending dataset {dataset.id} for {dataset.filename}")
+        return dataset
+
+    @staticmethod
+    def discard_pending_dataset(dataset_id):
+        """Removes the placeholder of an ingestion that failed."""
+        dataset = db.session.get(Dataset, dataset_id)
+        if dataset is not None and dataset.status == Dataset.STATUS_PROCESSING:
+            DatasetService.purge_dataset(dataset_id)
+
+    @staticmethod
+    def process_csv_upload(file, name, description, dataset=None, progress=None, dedupe_key=None):
+        """Ingests a CSV upload into a new dataset, or into a pending one when given.
+
+        ``progress`` is called with the running row count after every inserted chunk.
+        ``dedupe_key`` names the columns identifying a row: repeated rows are
+        skipped, here and in every later append.
+        """
         if not file:
             logger.error("No file provided for upload")
             raise ValueError("No file provided")
@@ -37,90 +145,401 @@ class DatasetService:
         filename = secure_filename(file.filename)
         logger.info(f"Initiating CSV upload sequence: {filename}")
 
+        pending = None
         try:
-            df = pd.read_csv(file)
-            DatasetService._validate_csv(df)
-            
-            dataset = Dataset(
-                name=name,
-                description=description,
-                filename=filename,
-                row_count=len(df),
-                column_names=df.columns.tolist()
-            )
+            if dataset is None and PartitionService.is_partitioned():
+                # The dataset's partition has to be committed before its records are loaded
+                dataset = pending = DatasetService.create_pending_dataset(
+                    filename, name, description, dedupe_key
+                )
+            elif dataset is None:
+                dataset = Dataset(
+                    name=name,
+                    description=description,
+                    filename=filename,
+                    row_count=0,
+                    status=Dataset.STATUS_PROCESSING,
+                    metadata_storage=validate_storage(
+                current_app.config.get('METADATA_STORAGE', STORAGE_JSON)
+            ),
+                    dedupe_key=dedupe_key or None
+                )
 
-            records = DatasetService._parse_and_prepare_records(df)
-            return DatasetService._persist_dataset(dataset, records)
+            with metrics.track_ingest('upload') as run:
+                reader, profile = DatasetService._open_csv(file)
+                batches = DatasetService._iter_record_batches(reader, dataset, profile=profile)
+                dataset = DatasetService._persist_dataset(dataset, batches, progress)
+                run.rows = dataset.row_count
+            return dataset
 
         except ValueError as ve:
             logger.error(f"Validation failed for {filename}: {str(ve)}")
+            if pending is not None:
+                db.session.rollback()
+                DatasetService.discard_pending_dataset(pending.id)
             raise ve
         except Exception as e:
             db.session.rollback()
             logger.error(f"Critical failure during CSV processing: {str(e)}")
+            if pending is not None:
+                DatasetService.discard_pending_dataset(pending.id)
             raise e
 
     @staticmethod
-    def _validate_csv(df):
-        """Internal validation for CSV structure."""
-        if df.empty:
+    def append_csv(dataset_id, file, progress=None):
+        """Ingests only the rows of ``file`` into an existing dataset.
+
+        The CSV must have exactly the dataset's columns. Rollups and sketches
+        are merged with the new rows instead of being rebuilt, and rows whose
+        dedupe key is already present are skipped. Returns the dataset and the
+        number of rows appended and skipped.
+        """
+        if not file:
+            logger.error("No file provided for append")
+            raise ValueError("No file provided")
+
+        dataset = Dataset.query.get_or_404(dataset_id)
+        if dataset.status != Dataset.STATUS_READY:
+            raise ValueError("Only datasets that finished ingesting can be appended to.")
+        filename = secure_filename(file.filename)
+        logger.info(f"Appending {filename} to dataset {dataset_id}")
+
+        try:
+            with metrics.track_ingest('append') as run:
+                reader, profile = DatasetService._open_csv(file)
+                # Claiming the row first serializes concurrent appends to one dataset
+                # and fails once a delete has claimed it
+                claimed = Dataset.query.filter_by(
+                    id=dataset_id, status=Dataset.STATUS_READY
+                ).update({'updated_at': datetime.utcnow()})
+                if not claimed:
+                    raise ValueError("Only datasets that finished ingesting can be appended to.")
+                db.session.refresh(dataset)
+                previous_rows = dataset.row_count or 0
+                counters = {'skipped_duplicates': 0}
+
+                batches = DatasetService._iter_record_batches(
+                    reader, dataset, append=True, counters=counters, profile=profile
+                )
+                DatasetService._persist_dataset(dataset, batches, progress, append=True)
+                run.rows = dataset.row_count - previous_rows
+            return dataset, {
+                "appended_rows": run.rows,
+                "skipped_duplicates": counters['skipped_duplicates']
+            }
+
+        except ValueError as ve:
+            db.session.rollback()
+            logger.error(f"Append validation failed for {filename}: {str(ve)}")
+            raise ve
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Critical failure during CSV append: {str(e)}")
+            raise e
+
+    @staticmethod
+    def _open_csv(file):
+        """Profiles and validates an upload, then returns its chunk iterator and profile.
+
+        Streams that cannot be rewound are parsed with default types and no
+        up-front validation; the profile is then None.
+        """
+        config = current_app.config
+        chunk_size = config.get('INGEST_CHUNK_SIZE', 50000)
+        stream = file.stream
+        if not stream.seekable():
+            return pd.read_csv(stream, chunksize=chunk_size), None
+
+        with metrics.phase('parse'):
+            profile = CsvProfile.sample(stream, config.get('INGEST_SAMPLE_ROWS', 10000),
+                                        config.get('INGEST_CATEGORY_RATIO', 0.5))
+            profile.validate(stream)
+        chunks = profile.iter_chunks(stream, chunk_size, config.get('INGEST_CSV_ENGINE', 'c'))
+        return chunks, profile
+
+    @staticmethod
+    def _iter_record_batches(reader, dataset, append=False, counters=None, profile=None):
+        """Validates and transforms CSV chunks lazily, one batch of row mappings at a time.
+
+        Only a single chunk is held in memory; ``dataset.column_names`` is taken
+        from the first chunk and every following chunk must match it (with
+        ``append`` the first chunk must match the dataset's existing columns).
+        For columnar datasets the metadata columns of each chunk are written to
+        Parquet here and the records only carry their row number. Datasets
+        with a dedupe key drop rows already stored, counting them in
+        ``counters['skipped_duplicates']``.
+        """
+        columns = None
+        row_count = 0
+        writer = None
+        counters = counters if counters is not None else {'skipped_duplicates': 0}
+        for chunk in metrics.timed_iter(reader, 'parse'):
+            with metrics.phase('transform'):
+                if columns is None:
+                    columns = chunk.columns.tolist()
+                    if append and columns != dataset.column_names:
+                        raise ValueError(
+                            f"CSV columns {columns} do not match the dataset columns "
+                            f"{dataset.column_names}."
+                        )
+                    dataset.column_names = columns
+                    if not append:
+                        dataset.column_types = {}
+                    missing_key = [col for col in dataset.dedupe_key or [] if col not in columns]
+                    if missing_key:
+                        raise ValueError(
+                            f"Dedupe key columns not found in CSV: {', '.join(missing_key)}"
+                        )
+                    meta_cols = [col for col in columns if col not in ('date', 'category', 'value')]
+                    if dataset.metadata_storage == STORAGE_COLUMNAR:
+                        if meta_cols:
+                            writer = ColumnarWriter(dataset.id, meta_cols, append=append)
+                        else:
+                            dataset.metadata_storage = STORAGE_JSON
+                DatasetService._validate_csv(chunk, columns)
+                if dataset.column_types is not None:
+                    # Datasets ingested before types were recorded keep None, which exports as text
+                    dataset.column_types = DatasetService._widen_column_types(
+                        dataset.column_types, chunk, meta_cols
+                    )
+                row_count += len(chunk)
+                records = DatasetService._prepare_chunk(
+                    chunk, dataset, writer, counters, profile.date_format if profile else None
+                )
+            if records:
+                yield records
+
+        if row_count == 0:
             raise ValueError("The uploaded CSV file contains no data.")
-            
+        if writer is not None:
+            writer.close()
+        logger.info(f"CSV validation successful across {row_count} rows.")
+
+    @staticmethod
+    def _widen_column_types(column_types, chunk, meta_cols):
+        """Merges a chunk's metadata column types into ``column_types`` as Arrow type names.
+
+        A column keeps its type while every chunk agrees, integers mixed with
+        floats become ``double`` and any other mix becomes ``string``; chunks
+        where a column is empty say nothing about it.
+        """
+        merged = dict(column_types)
+        for col in meta_cols:
+            series = chunk[col]
+            if not series.notna().any():
+                continue
+            dtype = series.dtype
+            if isinstance(dtype, pd.CategoricalDtype):
+                dtype = dtype.categories.dtype
+            if pd.api.types.is_bool_dtype(dtype):
+                chunk_type = 'bool'
+            elif pd.api.types.is_integer_dtype(dtype):
+                chunk_type = 'int64'
+            elif pd.api.types.is_float_dtype(dtype):
+                chunk_type = 'double'
+            else:
+                chunk_type = 'string'
+            current = merged.get(col)
+            if current is None or current == chunk_type:
+                merged[col] = chunk_type
+            elif {current, chunk_type} == {'int64', 'double'}:
+                merged[col] = 'double'
+            else:
+                merged[col] = 'string'
+        return merged
+
+    @staticmethod
+    def _prepare_chunk(chunk, dataset, writer, counters, date_format=None):
+        """Row mappings for the rows of a validated chunk that are not duplicates."""
+        row_hashes = None
+        if dataset.dedupe_key:
+            received = len(chunk)
+            chunk, row_hashes = DatasetService._drop_known_rows(chunk, dataset)
+            counters['skipped_duplicates'] += received - len(chunk)
+            if chunk.empty:
+                return []
+
+        if writer is None:
+            records = DatasetService._parse_and_prepare_records(chunk, date_format=date_format)
+        else:
+            records = DatasetService._parse_and_prepare_records(
+                chunk, row_offset=writer.write(chunk), date_format=date_format
+            )
+        if row_hashes is not None:
+            for record, row_hash in zip(records, row_hashes):
+                record['row_hash'] = row_hash
+        return records
+
+    @staticmethod
+    def _drop_known_rows(df, dataset):
+        """Drops rows whose dedupe key repeats within the chunk or is already stored.
+
+        Earlier chunks of the same upload were inserted in the current
+        transaction, so the lookup sees them too. Returns the remaining rows
+        and their key hashes.
+        """
+        row_hashes = DatasetService._row_hashes(df, dataset.dedupe_key)
+        keep = ~row_hashes.duplicated()
+        candidates = row_hashes[keep].tolist()
+        known = set()
+        for start in range(0, len(candidates), DEDUPE_LOOKUP_BATCH):
+            known.update(db.session.execute(
+                select(Record.row_hash).where(
+                    Record.dataset_id == dataset.id,
+                    Record.row_hash.isnot(None),
+                    Record.row_hash.in_(candidates[start:start + DEDUPE_LOOKUP_BATCH])
+                )
+            ).scalars())
+        if known:
+            keep &= ~row_hashes.isin(known)
+        return df[keep.to_numpy()], row_hashes[keep].tolist()
+
+    @staticmethod
+    def _row_hashes(df, key_columns):
+        """64-bit hashes of the key columns; numbers are compared as floats so 5 and 5.0 match."""
+        key = pd.DataFrame({
+            col: (df[col].astype(float).astype(str) if pd.api.types.is_numeric_dtype(df[col])
+                  else df[col].astype(str))
+            for col in key_columns
+        })
+        hashes = pd.util.hash_pandas_object(key, index=False).to_numpy().view(np.int64)
+        return pd.Series(hashes, index=df.index)
+
+    @staticmethod
+    def _validate_csv(df, expected_columns=None):
+        """Internal validation for CSV structure."""
         required_columns = ['category', 'value']
         missing_cols = [col for col in required_columns if col not in df.columns]
         if missing_cols:
             raise ValueError(f"Missing required columns in CSV: {', '.join(missing_cols)}")
-        
-        logger.info("CSV validation successful.")
+
+        if expected_columns is not None and df.columns.tolist() != expected_columns:
+            raise ValueError("CSV chunk columns do not match the file header.")
 
     @staticmethod
-    def _parse_and_prepare_records(df):
-        """Transforms DataFrame rows into Record objects without persisting."""
-        records = []
-        # Pre-calculate non-metadata columns for performance
+    def _parse_and_prepare_records(df, row_offset=None, date_format=None):
+        """Transforms a DataFrame into plain row mappings for bulk insertion.
+
+        Every column is converted in a single vectorized pass instead of walking
+        the frame row by row, so the cost is dominated by pandas internals rather
+        than per-row Python overhead. With ``row_offset`` the metadata columns are
+        stored columnar elsewhere, and each row gets its row number instead of a
+        metadata document. ``date_format``, when the upload's profile detected
+        one, skips per-chunk format inference.
+        """
+        row_count = len(df)
         standard_cols = {'date', 'category', 'value'}
         meta_cols = [col for col in df.columns if col not in standard_cols]
 
-        for _, row in df.iterrows():
-            record_date = None
-            if 'date' in row and pd.notnull(row['date']):
-                try:
-                    record_date = pd.to_datetime(row['date']).date()
-                except Exception:
-                    logger.debug(f"Parsing skip: Invalid date format '{row['date']}'")
-
-            category = row.get('category', 'Uncategorized')
-            value = row.get('value', 0)
-            
-            # Efficient metadata extraction
-            meta = {col: row[col] for col in meta_cols}
-
-            records.append(Record(
-                date=record_date,
-                category=str(category),
-                value=float(value),
-                metadata_json=meta
-            ))
-        
+        if 'date' in df.columns:
+            parsed = pd.to_datetime(df['date'], errors='coerce', format=date_format)
+            failed = parsed.isna() & df['date'].notna()
+            if failed.any():
+                # Inferred format did not fit every row; retry only those element-wise
+                parsed[failed] = pd.to_datetime(df.loc[failed, 'date'], errors='coerce',
+                                                format='mixed')
+            invalid = int((parsed.isna() & df['date'].notna()).sum())
+            if invalid:
+                logger.debug(f"Parsing skip: {invalid} rows with invalid date format")
+            dates = parsed.dt.date.astype(object).where(parsed.notna(), None).tolist()
+        else:
+            dates = [None] * row_count
+
+        if 'category' in df.columns:
+            categories = df['category'].to_numpy(dtype=object).astype(str).tolist()
+        else:
+            categories = ['Uncategorized'] * row_count
+
+        if 'value' in df.columns:
+            numeric = df['value'].astype(float)
+            values = numeric.astype(object).where(numeric.notna(), None).tolist()
+        else:
+            values = [0.0] * row_count
+
+        if row_offset is not None:
+            records = [
+                {'date': d, 'category': c, 'value': v, 'row_number': n}
+                for n, (d, c, v) in enumerate(zip(dates, categories, values), start=row_offset)
+            ]
+            logger.info(f"Prepared {len(records)} records for persistence.")
+            return records
+
+        if meta_cols:
+            # Missing cells become JSON null rather than NaN, which is not valid JSON
+            meta = df[meta_cols].astype(object)
+            metadata = meta.where(meta.notna(), None).to_dict('records')
+        else:
+            metadata = [{} for _ in range(row_count)]
+
+        records = [
+            {'date': d, 'category': c, 'value': v, 'metadata_json': m}
+            for d, c, v, m in zip(dates, categories, values, metadata)
+        ]
+
         logger.info(f"Prepared {len(records)} records for persistence.")
         return records
 
     @staticmethod
-    def _persist_dataset(dataset, records):
-        """Atomic persistence of dataset and associated records."""
+    def _persist_dataset(dataset, record_batches, progress=None, append=False):
+        """Atomic persistence of dataset and associated records.
+
+        Batches are inserted as they arrive so memory stays bounded by one batch,
+        while the whole upload still commits (or rolls back) as one transaction.
+        Per-dataset rollups and sketches are accumulated from the same batches
+        and written in that transaction too; with ``append`` they are merged
+        into the dataset's existing ones, which are skipped for legacy
+        datasets that never had them. Under ``ANALYTICS_ENGINE=duckdb`` the
+        rows are also written to the dataset's Parquet replica, unless an
+        append targets a dataset ingested without one.
+        """
+        replica = None
         try:
             db.session.add(dataset)
             db.session.flush()  # Get dataset.id
 
-            for record in records:
-                record.dataset_id = dataset.id
+            row_count = 0
+            merge_rollups = append and RollupService.has_rollups(dataset.id)
+            rollups = RollupAccumulator() if merge_rollups or not append else None
+            sketches = SketchAccumulator.resume(dataset.id) if append else SketchAccumulator()
+            if duckdb_enabled() and (not append or replica_files(dataset.id)):
+                replica = ReplicaWriter(dataset.id)
+            strategy = current_app.config.get('BULK_LOAD_STRATEGY', 'auto')
+            with get_bulk_loader(db.session.connection(), strategy) as loader:
+                for records in record_batches:
+                    with metrics.phase('insert'):
+                        for record in records:
+                            record['dataset_id'] = dataset.id
+                        row_count += loader.load(records)
+                    with metrics.phase('aggregate'):
+                        if rollups is not None:
+                            rollups.add_records(records)
+                        if sketches is not None:
+                            sketches.add_records(records)
+                        if replica is not None:
+                            replica.write(records)
+                    if progress is not None:
+                        progress(row_count)
 
-            db.session.bulk_save_objects(records)
-            db.session.commit()
-            
-            logger.info(f"Successfully persisted dataset {dataset.id} with {len(records)} records.")
+            with metrics.phase('commit'):
+                if rollups is not None:
+                    rollups.persist(dataset.id, merge=merge_rollups)
+                if sketches is not None:
+                    sketches.persist(dataset.id)
+                dataset.row_count = (dataset.row_count or 0) + row_count if append else row_count
+                dataset.status = Dataset.STATUS_READY
+                db.session.commit()
+                commit_dataset_files(dataset.id)
+                if replica is not None:
+                    replica.commit()
+            analytics_cache.invalidate_dataset(dataset.id)
+
+            logger.info(f"Successfully persisted dataset {dataset.id} with {row_count} records.")
             return dataset
         except Exception as e:
             db.session.rollback()
+            if dataset.id is not None:
+                discard_uncommitted_files(dataset.id)
+            if replica is not None:
+                replica.discard()
             logger.error(f"Database persistence failure: {str(e)}")
             raise e
@@ -0,0 +1,86 @@
+import numpy as np
+
+METHODS = ('lttb', 'minmax')
+DEFAULT_METHOD = 'lttb'
+MIN_POINTS = 4  # first and last point plus one bucket's minimum and maximum
+
+
+def validate_method(method):
+    if method not in METHODS:
+        raise ValueError(f"Invalid downsampling method '{method}'. "
+                         f"Expected one of: {', '.join(METHODS)}")
+    return method
+
+
+def lttb_indices(values, threshold):
+    """Indices of the points kept by Largest-Triangle-Three-Buckets.
+
+    The first and last points are always kept; the interior is split into
+    ``threshold - 2`` buckets and each keeps the point forming the largest
+    triangle with the previously kept point and the next bucket's average.
+    Points are assumed evenly spaced, which gap-filled series are.
+    """
+    y = np.asarray(values, dtype=np.float64)
+    n = len(y)
+    if threshold >= n:
+        return np.arange(n)
+    x = np.arange(n, dtype=np.float64)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+
+    kept = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_start, next_end = (edges[i + 1], edges[i + 2]) if i + 2 < len(edges) else (n - 1, n)
+        avg_x, avg_y = x[next_start:next_end].mean(), y[next_start:next_end].mean()
+        area = np.abs((x[kept] - avg_x) * (y[start:end] - y[kept])
+                      - (x[kept] - x[start:end]) * (avg_y - y[kept]))
+        kept = start + int(np.argmax(area))
+        selected[i + 1] = kept
+    return selected
+
+
+def minmax_indices(values, threshold):
+    """Indices of the first and last points plus each bucket's minimum and maximum.
+
+    Keeps every peak and trough exactly, at the cost of less even spacing than
+    LTTB; returns at most ``threshold`` indices in order.
+    """
+    y = np.asarray(values, dtype=np.float64)
+    n = len(y)
+    if threshold >= n:
+        return np.arange(n)
+    buckets = (threshold - 2) // 2
+    width = -(-(n - 2) // buckets)
+    # Interior points laid out one bucket per row; the padding never wins a min or max
+    lows = np.full(buckets * width, np.inf)
+    highs = np.full(buckets * width, -np.inf)
+    lows[:n - 2] = highs[:n - 2] = y[1:n - 1]
+    offsets = np.arange(buckets) * width
+    extremes = np.concatenate([
+        offsets + lows.reshape(buckets, width).argmin(axis=1),
+        offsets + highs.reshape(buckets, width).argmax(axis=1),
+    ])
+    extremes = extremes[extremes < n - 2] + 1
+    return np.unique(np.concatenate([[0, n - 1], extremes]))
+
+
+def downsample_series(series, max_points, method=DEFAULT_METHOD):
+    """Reduces a ``[{"date", "value"}]`` series to at most ``max_points`` points.
+
+    Returns the series and a description of what was applied; series already
+    within the limit are returned unchanged with method ``'none'``.
+    """
+    validate_method(method)
+    if max_points < MIN_POINTS:
+        raise ValueError(f"max_points must be at least {MIN_POINTS}")
+    applied, original = 'none', len(series)
+    if original > max_points:
+        values = np.fromiter((point['value'] for point in series), dtype=np.float64, count=original)
+        pick = lttb_indices if method == 'lttb' else minmax_indices
+        indices = pick(values, max_points)
+        series = [series[i] for i in indices.tolist()]
+        applied = method
+    return series, {"method": applied, "max_points": max_points, "original_points": original,
+                    "returned_points": len(series)}
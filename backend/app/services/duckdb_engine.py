@@ -0,0 +1,290 @@
+import glob
+import json
+import logging
+import os
+import shutil
+import threading
+import uuid
+from flask import current_app
+from sqlalchemy import select
+from ..models.record import Record
+from .time_buckets import validate_granularity
+from .. import db
+
+logger = logging.getLogger(__name__)
+
+ENGINE_SQL = 'sql'
+ENGINE_DUCKDB = 'duckdb'
+ANALYTICS_ENGINES = (ENGINE_SQL, ENGINE_DUCKDB)
+PENDING_SUFFIX = '.pending'
+MANIFEST_FILE = 'manifest.json'  # lists the committed parts; replaced atomically
+VALUE_SCALE = 2  # decimal places of records.value
+
+
+def validate_engine(engine):
+    if engine not in ANALYTICS_ENGINES:
+        raise ValueError(f"Invalid analytics engine '{engine}'. "
+                         f"Expected one of: {', '.join(ANALYTICS_ENGINES)}")
+    if engine == ENGINE_DUCKDB:
+        _require_duckdb()
+    return engine
+
+
+def duckdb_enabled():
+    return validate_engine(current_app.config.get('ANALYTICS_ENGINE', ENGINE_SQL)) == ENGINE_DUCKDB
+
+
+def _require_duckdb():
+    try:
+        import duckdb
+        import pyarrow
+        import pyarrow.compute
+        import pyarrow.parquet
+    except ImportError:
+        raise ValueError(
+            "The duckdb analytics engine requires the optional duckdb and pyarrow packages."
+        )
+    return duckdb, pyarrow, pyarrow.parquet
+
+
+def replica_directory(dataset_id):
+    return os.path.join(current_app.config['UPLOAD_FOLDER'], 'analytics', str(dataset_id))
+
+
+def replica_files(dataset_id):
+    """Committed Parquet parts of a dataset's replica, empty when it has none.
+
+    The parts are those listed in the replica's manifest, so a rebuild never
+    shows readers a mix of old and new parts. Replicas written before the
+    manifest existed are listed by their file names.
+    """
+    directory = replica_directory(dataset_id)
+    try:
+        with open(os.path.join(directory, MANIFEST_FILE)) as fh:
+            return [os.path.join(directory, name) for name in json.load(fh)['parts']]
+    except FileNotFoundError:
+        return sorted(glob.glob(os.path.join(directory, 'part-*.parquet')))
+
+
+def remove_replica_files(dataset_id):
+    shutil.rmtree(replica_directory(dataset_id), ignore_errors=True)
+
+
+class ReplicaWriter:
+    """Writes the date, category and value of ingested records as Parquet parts.
+
+    Parts stay ``.pending`` (and invisible to queries) until ``commit`` is
+    called after the ingest's database transaction committed; ``discard``
+    removes them when it rolled back. Appends add parts next to the
+    committed ones; with ``replace`` the committed parts are swapped for
+    the new ones in a single manifest update and then removed.
+    """
+
+    def __init__(self, dataset_id, replace=False):
+        _, self.pa, self.pq = _require_duckdb()
+        self.dataset_id = dataset_id
+        self.directory = replica_directory(dataset_id)
+        self.replace = replace
+        os.makedirs(self.directory, exist_ok=True)
+        self.paths = []
+
+    def write(self, records):
+        if not records:
+            return
+        pa = self.pa
+        values = pa.array([record['value'] for record in records], pa.float64())
+        table = pa.table({
+            'date': pa.array([record['date'] for record in records], pa.date32()),
+            'category': pa.array([record['category'] for record in records], pa.string()),
+            # Rounded like the Numeric(15, 2) column, so both engines sum the same numbers
+            'value': pa.compute.round(values, VALUE_SCALE, round_mode='half_towards_infinity'),
+        })
+        path = os.path.join(self.directory, f'part-{uuid.uuid4().hex}.parquet{PENDING_SUFFIX}')
+        self.pq.write_table(table, path)
+        self.paths.append(path)
+
+    def commit(self):
+        previous = replica_files(self.dataset_id)
+        names = [] if self.replace else [os.path.basename(path) for path in previous]
+        for path in self.paths:
+            os.replace(path, path[:-len(PENDING_SUFFIX)])
+            names.append(os.path.basename(path[:-len(PENDING_SUFFIX)]))
+        pending = os.path.join(self.directory, MANIFEST_FILE + PENDING_SUFFIX)
+        with open(pending, 'w') as fh:
+            json.dump({'parts': names}, fh)
+        os.replace(pending, os.path.join(self.directory, MANIFEST_FILE))
+        if self.replace:
+            # Queries already running against the old parts may fail, but none double-counts
+            for path in previous:
+                if os.path.basename(path) not in names:
+                    os.remove(path)
+        self.paths = []
+
+    def discard(self):
+        for path in self.paths:
+            if os.path.exists(path):
+                os.remove(path)
+        self.paths = []
+
+
+class DuckDBAnalytics:
+    """Scan-and-aggregate queries over a dataset's Parquet replica in embedded DuckDB.
+
+    Each query reads only the columns it needs from the replica's parts; the
+    rows themselves still live in the SQL database, which stays the system of
+    record. One in-memory DuckDB database is shared per process and every
+    query runs on its own cursor, as DuckDB requires across threads.
+    """
+    _connection = None
+    _lock = threading.Lock()
+
+    @staticmethod
+    def _cursor():
+        with DuckDBAnalytics._lock:
+            if DuckDBAnalytics._connection is None:
+                duckdb, _, _ = _require_duckdb()
+                DuckDBAnalytics._connection = duckdb.connect()
+            return DuckDBAnalytics._connection.cursor()
+
+    @staticmethod
+    def _query(sql, files, params=None):
+        cursor = DuckDBAnalytics._cursor()
+        try:
+            return cursor.execute(sql, {**(params or {}), 'files': files}).fetchall()
+        finally:
+            cursor.close()
+
+    @staticmethod
+    def summary(dataset_id, files):
+        """The summary statistics of ``AnalyticsService.get_summary_statistics``."""
+        (total, value_count, total_value, min_value, max_value, min_date, max_date, categories), = \
+            DuckDBAnalytics._query(
+                "SELECT count(*), count(value), sum(value), min(value), max(value), "
+                "min(date), max(date), count(DISTINCT category) FROM read_parquet($files)", files
+            )
+        total_value = float(total_value or 0)
+        return {
+            "dataset_id": dataset_id,
+            "total_records": total,
+            "date_range": {
+                "min": str(min_date) if min_date else None,
+                "max": str(max_date) if max_date else None
+            },
+            "category_count": categories,
+            "total_value": total_value,
+            "avg_value": total_value / value_count if value_count else 0.0,
+            "min_value": float(min_value or 0),
+            "max_value": float(max_value or 0)
+        }
+
+    @staticmethod
+    def category_totals(files):
+        """``(category, sum of value)`` rows."""
+        return DuckDBAnalytics._query(
+            "SELECT category, sum(value) FROM read_parquet($files) "
+            "GROUP BY category ORDER BY category", files
+        )
+
+    @staticmethod
+    def bucket_totals(files, granularity):
+        """``(bucket start date, sum of value)`` rows; weeks start on Monday as in SQL."""
+        bucket = _bucket(granularity)
+        return DuckDBAnalytics._query(
+            f"SELECT {bucket} AS bucket, sum(value) FROM read_parquet($files) "
+            "WHERE date IS NOT NULL GROUP BY bucket ORDER BY bucket", files
+        )
+
+    @staticmethod
+    def dashboard_groups(files, granularity):
+        """Per-category and per-bucket stats shaped like ``_scan_dashboard_groups``."""
+        bucket = _bucket(granularity)
+        categories = DuckDBAnalytics._query(
+            "SELECT category, count(*), count(value), sum(value), min(value), max(value) "
+            "FROM read_parquet($files) GROUP BY category ORDER BY category", files
+        )
+        buckets = DuckDBAnalytics._query(
+            f"SELECT {bucket} AS bucket, sum(value), min(date), max(date) "
+            "FROM read_parquet($files) WHERE date IS NOT NULL "
+            "GROUP BY bucket ORDER BY bucket", files
+        )
+        return [list(row) for row in categories], [list(row) for row in buckets]
+
+    @staticmethod
+    def aggregate(plan, files, cap):
+        """Rows of an ``AggregateService`` plan that only touches date, category and value.
+
+        Returns up to ``cap + 1`` mappings keyed by group column and measure
+        name, so the caller can tell whether the output was truncated.
+        """
+        keys = [f'{_bucket(plan["granularity"]) if column == "date" else column} AS "{column}"'
+                for column in plan['group_by']]
+        aggregates = []
+        for measure in plan['measures']:
+            op, column = measure['op'], measure['column']
+            if op == 'count':
+                expression = f'count({column or "*"})'
+            elif op == 'distinct':
+                expression = f'count(DISTINCT {column})'
+            else:
+                expression = f'{op}({column})'
+            aggregates.append(f'{expression} AS "{measure["name"]}"')
+
+        conditions, params = [], {}
+        for condition in plan['filters']:
+            column, op = condition['column'], condition['op']
+            values = condition['value'] if op == 'in' else [condition['value']]
+            names = []
+            for value in values:
+                names.append(f'p{len(params)}')
+                # Categories are text; the SQL engine compares other filter values as text too
+                params[names[-1]] = str(value) if column == 'category' else value
+            if op == 'in':
+                placeholders = ", ".join("$" + name for name in names)
+                conditions.append(f'{column} IN ({placeholders})' if names else 'FALSE')
+            else:
+                operator = {'eq': '=', 'ne': '<>', 'gt': '>', 'gte': '>=', 'lt': '<',
+                            'lte': '<='}[op]
+                conditions.append(f'{column} {operator} ${names[0]}')
+
+        sql = f'SELECT {", ".join(keys + aggregates)} FROM read_parquet($files)'
+        if conditions:
+            sql += f' WHERE {" AND ".join(conditions)}'
+        if keys:
+            sql += f' GROUP BY {", ".join(str(i + 1) for i in range(len(keys)))}'
+        if plan['order_by'] is not None:
+            sql += f' ORDER BY "{plan["order_by"]}" {plan["order"].upper()}'
+        elif keys:
+            sql += f' ORDER BY {", ".join(str(i + 1) for i in range(len(keys)))}'
+        sql += f' LIMIT {int(cap) + 1}'
+
+        names = plan['group_by'] + [measure['name'] for measure in plan['measures']]
+        return [dict(zip(names, row)) for row in DuckDBAnalytics._query(sql, files, params)]
+
+
+def _bucket(granularity):
+    # Inlined once validated: DuckDB needs a constant part name to group by the expression
+    return f"CAST(date_trunc('{validate_granularity(granularity)}', date) AS DATE)"
+
+
+def rebuild_replica(dataset_id, batch_size=50000):
+    """Rewrites a dataset's replica from its records.
+
+    Used by ``flask rollups rebuild``, e.g. for datasets ingested under the SQL engine.
+    """
+    writer = ReplicaWriter(dataset_id, replace=True)
+    rows = db.session.execute(
+        select(Record.date, Record.category, Record.value)
+        .where(Record.dataset_id == dataset_id).execution_options(yield_per=batch_size)
+    )
+    try:
+        for partition in rows.partitions():
+            writer.write([
+                {'date': row.date, 'category': row.category,
+                 'value': float(row.value) if row.value is not None else None}
+                for row in partition
+            ])
+    except Exception:
+        writer.discard()
+        raise
+    writer.commit()
+    logger.info(f"Rebuilt the analytics replica of dataset {dataset_id}")
@@ -0,0 +1,213 @@
+import csv
+import io
+import json
+import logging
+from itertools import islice
+from operator import itemgetter
+from datetime import date
+from decimal import Decimal
+from sqlalchemy import select
+from ..models.record import Record
+from .columnar_store import STORAGE_COLUMNAR, ColumnarReader
+from .. import db
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+
+
+class _StreamSink(io.RawIOBase):
+    """Write-only file object that hands written bytes back in pieces.
+
+    ``tell()`` stays exact, which the Parquet writer relies on.
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+class ExportService:
+    @staticmethod
+    def iter_row_batches(dataset, batch_size=5000):
+        """Yields batches of row tuples in the original column order.
+
+        Rows are read through a streaming cursor in id (i.e. upload) order, and
+        ``metadata_json`` is flattened back into its columns using
+        ``dataset.column_names``, so memory is bounded by one batch. Columnar
+        datasets read their metadata from the Parquet parts alongside, which
+        are in the same row order.
+        """
+        columns = dataset.column_names or ['date', 'category', 'value']
+        if dataset.metadata_storage == STORAGE_COLUMNAR:
+            yield from ExportService._iter_columnar_batches(dataset, columns, batch_size)
+            return
+
+        query = select(Record.date, Record.category, Record.value, Record.metadata_json).where(
+            Record.dataset_id == dataset.id
+        ).order_by(Record.id).execution_options(stream_results=True, yield_per=batch_size)
+
+        result = db.session.execute(query)
+        for partition in result.partitions():
+            batch = []
+            for record_date, category, value, metadata in partition:
+                standard = {'date': record_date, 'category': category, 'value': value}
+                metadata = metadata or {}
+                batch.append(tuple(
+                    standard[col] if col in standard else metadata.get(col) for col in columns
+                ))
+            yield batch
+
+    @staticmethod
+    def _iter_columnar_batches(dataset, columns, batch_size):
+        standard_cols = ['date', 'category', 'value']
+        meta_cols = [col for col in columns if col not in standard_cols]
+        # Each output row is picked from (standard values + metadata values) by position
+        reorder = itemgetter(*[(standard_cols + meta_cols).index(col) for col in columns])
+        meta_rows = ColumnarReader(dataset.id).iter_rows(meta_cols, batch_size)
+
+        query = select(Record.date, Record.category, Record.value).where(
+            Record.dataset_id == dataset.id
+        ).order_by(Record.id).execution_options(stream_results=True, yield_per=batch_size)
+        for partition in db.session.execute(query).partitions():
+            yield [
+                reorder(tuple(standard) + meta)
+                for standard, meta in zip(partition, islice(meta_rows, len(partition)))
+            ]
+
+    @staticmethod
+    def stream(dataset, export_format, batch_size=5000):
+        """Returns ``(generator of bytes, mimetype, file extension)`` for an export format."""
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(f"Invalid format '{export_format}'. "
+                             f"Expected one of: {', '.join(EXPORT_FORMATS)}")
+        mimetype, extension = EXPORT_FORMATS[export_format]
+        batches = ExportService.iter_row_batches(dataset, batch_size)
+        columns = dataset.column_names or ['date', 'category', 'value']
+
+        if export_format == 'csv':
+            generator = ExportService._csv(columns, batches)
+        elif export_format == 'ndjson':
+            generator = ExportService._ndjson(columns, batches)
+        else:
+            generator = ExportService._parquet(columns, batches,
+                                               ExportService._column_types(dataset))
+        logger.info(f"Streaming {export_format} export of dataset {dataset.id}")
+        return generator, mimetype, extension
+
+    @staticmethod
+    def _csv(columns, batches):
+        buf = io.StringIO()
+        writer = csv.writer(buf, lineterminator='\n')
+        writer.writerow(columns)
+        for batch in batches:
+            writer.writerows([_csv_value(value) for value in row] for row in batch)
+            yield buf.getvalue().encode('utf-8')
+            buf.seek(0)
+            buf.truncate()
+        if buf.tell():
+            yield buf.getvalue().encode('utf-8')
+
+    @staticmethod
+    def _ndjson(columns, batches):
+        for batch in batches:
+            lines = [json.dumps(dict(zip(columns, row)), default=_json_default) for row in batch]
+            yield ('\n'.join(lines) + '\n').encode('utf-8')
+
+    @staticmethod
+    def _column_types(dataset):
+        """Arrow type names of the metadata columns, as recorded over every chunk and append."""
+        if dataset.column_types is not None:
+            return dataset.column_types
+        if dataset.metadata_storage == STORAGE_COLUMNAR:
+            return ColumnarReader(dataset.id).column_types
+        return {}
+
+    @staticmethod
+    def _parquet(columns, batches, column_types):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ValueError("Parquet export requires the optional pyarrow package.")
+
+        # Fixed before the first byte is sent: a type that only fits some batches
+        # would otherwise fail halfway through a response that already said 200
+        schema = pa.schema([(col, _arrow_type(pa, col, column_types.get(col))) for col in columns])
+
+        def generate():
+            sink = _StreamSink()
+            writer = pq.ParquetWriter(sink, schema)
+            for batch in batches:
+                if not batch:
+                    continue
+                table = pa.Table.from_arrays(
+                    [_arrow_array(pa, values, field.type)
+                     for values, field in zip(zip(*batch), schema)],
+                    schema=schema
+                )
+                writer.write_table(table)
+                yield sink.drain()
+            writer.close()
+            yield sink.drain()
+
+        return generate()
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def _json_default(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _arrow_type(pa, column, type_name):
+    """Column type for parquet export; metadata columns without a recorded type are text."""
+    if column == 'date':
+        return pa.date32()
+    if column == 'value':
+        return pa.decimal128(15, 2)
+    types = {'bool': pa.bool_(), 'int64': pa.int64(), 'double': pa.float64()}
+    return types.get(type_name, pa.string())
+
+
+def _arrow_array(pa, values, arrow_type):
+    """Values of one column as ``arrow_type``.
+
+    Converts numbers stored before the column widened to text.
+    """
+    if pa.types.is_string(arrow_type):
+        values = [value if value is None or isinstance(value, str) else str(value)
+                  for value in values]
+    elif pa.types.is_floating(arrow_type):
+        values = [value if value is None else float(value) for value in values]
+    return pa.array(values, type=arrow_type)
@@ -0,0 +1,178 @@
+import os
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from sqlalchemy import delete, select, update
+from werkzeug.datastructures import FileStorage
+from ..models.dataset import Dataset
+from ..models.ingest_job import IngestJob
+from .. import db
+from .dataset_service import DatasetService
+
+logger = logging.getLogger(__name__)
+
+
+class JobService:
+    """Runs ingestion jobs on a local thread pool and records their state in ``ingest_jobs``.
+
+    Any worker process can answer a poll from the table. The row count only
+    reaches the table when a job finishes, since the ingest transaction holds
+    the write lock on SQLite; until then the worker running the job reports
+    its live progress and the others report the state alone.
+    """
+    _executor = None
+    _progress = {}  # job id -> rows ingested so far, for jobs running in this process
+    _lock = threading.Lock()
+
+    @staticmethod
+    def _get_executor(app):
+        with JobService._lock:
+            if JobService._executor is None:
+                workers = app.config.get('INGEST_WORKERS', 2)
+                JobService._executor = ThreadPoolExecutor(max_workers=workers,
+                                                          thread_name_prefix='ingest')
+            return JobService._executor
+
+    @staticmethod
+    def submit_upload(app, file, name, description, dedupe_key=None):
+        """Spools the upload to disk, registers a pending dataset and queues its ingestion."""
+        os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+        dataset = DatasetService.create_pending_dataset(file.filename, name, description,
+                                                        dedupe_key)
+        job = IngestJob(dataset_id=dataset.id, filename=dataset.filename, state=IngestJob.QUEUED)
+        db.session.add(job)
+        db.session.flush()
+        path = os.path.join(app.config['UPLOAD_FOLDER'], f"{job.id}.csv")
+        try:
+            file.save(path)
+            JobService._trim_history(app.config.get('INGEST_JOB_HISTORY', 1000))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            if os.path.exists(path):
+                os.remove(path)
+            DatasetService.discard_pending_dataset(dataset.id)
+            raise
+
+        JobService._get_executor(app).submit(JobService._run_upload, app, job.id, path,
+                                             file.filename)
+        logger.info(f"Queued ingestion job {job.id} for dataset {dataset.id}")
+        return job
+
+    @staticmethod
+    def _trim_history(history):
+        """Deletes all but the ``history`` most recent jobs."""
+        kept = select(IngestJob.id).order_by(
+            IngestJob.created_at.desc()
+        ).limit(history).scalar_subquery()
+        db.session.execute(delete(IngestJob).where(IngestJob.id.not_in(kept)).execution_options(
+            synchronize_session=False
+        ))
+
+    @staticmethod
+    def submit_delete(app, dataset_id):
+        """Queues the purge of a dataset already marked as deleting."""
+        JobService._get_executor(app).submit(JobService._run_delete, app, dataset_id)
+        logger.info(f"Queued purge of dataset {dataset_id}")
+
+    @staticmethod
+    def get_job(job_id):
+        """Status of a job as a dict, or None when it is unknown."""
+        job = db.session.get(IngestJob, job_id)
+        if job is None:
+            return None
+        with JobService._lock:
+            rows = JobService._progress.get(job_id)
+        return job.to_dict(rows_processed=rows)
+
+    @staticmethod
+    def sweep_interrupted(older_than):
+        """Fails jobs and discards pending datasets left behind by a worker that died.
+
+        Only uploads registered more than ``older_than`` seconds ago are touched,
+        so ingestions still running on another worker are left alone. Returns
+        the number of datasets discarded.
+        """
+        cutoff = datetime.utcnow() - timedelta(seconds=older_than)
+        dataset_ids = db.session.execute(
+            select(Dataset.id).where(Dataset.status == Dataset.STATUS_PROCESSING,
+                                     Dataset.created_at < cutoff)
+        ).scalars().all()
+        for dataset_id in dataset_ids:
+            DatasetService.purge_dataset(dataset_id)
+        db.session.execute(
+            update(IngestJob)
+            .where(IngestJob.state.in_([IngestJob.QUEUED, IngestJob.RUNNING]),
+                   IngestJob.created_at < cutoff)
+            .values(state=IngestJob.FAILED, error="Ingestion was interrupted",
+                    finished_at=datetime.utcnow())
+        )
+        db.session.commit()
+        logger.info(f"Swept {len(dataset_ids)} interrupted uploads older than {cutoff.isoformat()}")
+        return len(dataset_ids)
+
+    @staticmethod
+    def _run_upload(app, job_id, path, filename):
+        with app.app_context():
+            job = db.session.get(IngestJob, job_id)
+            job.state = IngestJob.RUNNING
+            job.started_at = datetime.utcnow()
+            db.session.commit()
+            rows_processed = 0
+
+            def progress(rows):
+                nonlocal rows_processed
+                rows_processed = rows
+                with JobService._lock:
+                    JobService._progress[job_id] = rows
+
+            try:
+                with open(path, 'rb') as stream:
+                    dataset = db.session.get(Dataset, job.dataset_id)
+                    DatasetService.process_csv_upload(
+                        FileStorage(stream=stream, filename=filename),
+                        dataset.name,
+                        dataset.description,
+                        dataset=dataset,
+                        progress=progress
+                    )
+                state, error = IngestJob.SUCCEEDED, None
+            except Exception as e:
+                state = IngestJob.FAILED
+                error = (str(e) if isinstance(e, ValueError)
+                         else "Internal server error during processing")
+                logger.error(f"Ingestion job {job_id} failed: {str(e)}")
+                db.session.rollback()
+                try:
+                    DatasetService.discard_pending_dataset(job.dataset_id)
+                except Exception as discard_error:
+                    # Left in 'processing'; `flask datasets sweep` removes it later
+                    logger.error(
+                        f"Discarding dataset {job.dataset_id} failed: {str(discard_error)}"
+                    )
+                    db.session.rollback()
+            finally:
+                if os.path.exists(path):
+                    os.remove(path)
+            try:
+                db.session.execute(update(IngestJob).where(IngestJob.id == job_id).values(
+                    state=state, error=error, rows_processed=rows_processed,
+                    finished_at=datetime.utcnow()
+                ))
+                db.session.commit()
+            finally:
+                with JobService._lock:
+                    JobService._progress.pop(job_id, None)
+                db.session.remove()
+
+    @staticmethod
+    def _run_delete(app, dataset_id):
+        with app.app_context():
+            try:
+                DatasetService.purge_dataset(dataset_id)
+            except Exception as e:
+                # The dataset stays in 'deleting'; `flask datasets purge` finishes it
+                logger.error(f"Purge of dataset {dataset_id} failed: {str(e)}")
+            finally:
+                db.session.remove()
@@ -0,0 +1,319 @@
+import bisect
+import contextlib
+import logging
+import sys
+import threading
+import time
+import tracemalloc
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 500, 1000)
+ROWS_PER_SECOND_BUCKETS = (1e3, 5e3, 1e4, 2.5e4, 5e4, 1e5, 2.5e5, 5e5, 1e6)
+MEMORY_BUCKETS = tuple(2 ** power for power in range(20, 34))  # 1MB .. 8GB
+INGEST_PHASES = ('parse', 'transform', 'insert', 'aggregate', 'commit')
+
+
+class Histogram:
+    """Cumulative bucket counts, sum and count per label set, as Prometheus expects them."""
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self.series = {}
+
+    def observe(self, value, labels=()):
+        counts = self.series.get(labels)
+        if counts is None:
+            counts = self.series[labels] = [[0] * len(self.buckets), 0.0, 0]
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            counts[0][index] += 1
+        counts[1] += value
+        counts[2] += 1
+
+    def render(self):
+        for labels, (buckets, total, count) in sorted(self.series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, buckets):
+                cumulative += bucket_count
+                le = _labels(labels + (('le', _number(bound)),))
+                yield f"{self.name}_bucket{le} {cumulative}"
+            yield f"{self.name}_bucket{_labels(labels + (('le', '+Inf'),))} {count}"
+            yield f"{self.name}_sum{_labels(labels)} {_number(total)}"
+            yield f"{self.name}_count{_labels(labels)} {count}"
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self.series = {}
+
+    def inc(self, amount=1, labels=()):
+        self.series[labels] = self.series.get(labels, 0) + amount
+
+    def render(self):
+        for labels, value in sorted(self.series.items()):
+            yield f"{self.name}{_labels(labels)} {_number(value)}"
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def set(self, value, labels=()):
+        self.series[labels] = value
+
+
+class MetricsRegistry:
+    """In-process request, query and ingest metrics rendered in the Prometheus text format.
+
+    Like the analytics cache, every worker process keeps its own numbers; with
+    several gunicorn workers each scrape sees the worker that answered it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ingest = threading.local()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.request_seconds = Histogram(
+                'http_request_duration_seconds', 'Request latency by route.')
+            self.request_queries = Histogram(
+                'http_request_db_queries', 'SQL statements executed per request.',
+                QUERY_COUNT_BUCKETS)
+            self.request_query_seconds = Histogram(
+                'http_request_db_seconds', 'Time spent in SQL statements per request.')
+            self.queries = Counter(
+                'db_queries_total', 'SQL statements executed, including background jobs.')
+            self.query_seconds = Counter('db_query_seconds_total', 'Time spent in SQL statements.')
+            self.ingest_phase_seconds = Histogram(
+                'ingest_phase_seconds', 'Time per ingest spent in each phase.')
+            self.ingest_rows = Counter('ingest_rows_total', 'Rows stored by uploads and appends.')
+            self.ingest_rate = Histogram(
+                'ingest_rows_per_second', 'Throughput of each upload or append.',
+                ROWS_PER_SECOND_BUCKETS)
+            self.ingest_memory = Histogram(
+                'ingest_peak_memory_bytes',
+                'Peak memory traced during each ingest (INGEST_TRACE_MEMORY).', MEMORY_BUCKETS)
+            self.ingest_peak_rss = Gauge(
+                'ingest_peak_rss_bytes',
+                'Process peak resident memory observed at the end of the last ingest.')
+
+    def init_app(self, app):
+        self.reset()
+        _listen_for_queries()
+        # Server-Timing reads the same per-request numbers, so it needs the hooks on its own too
+        if app.config.get('METRICS_ENABLED', True) or app.config.get('SERVER_TIMING', False):
+            app.before_request(_start_request)
+            app.after_request(_finish_request)
+        app.extensions['metrics'] = self
+
+    def render(self, extra=()):
+        """Returns every metric in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            metrics = [value for value in vars(self).values()
+                       if isinstance(value, (Histogram, Counter))]
+            for metric in list(metrics) + list(extra):
+                lines.append(f"# HELP {metric.name} {metric.help}")
+                lines.append(f"# TYPE {metric.name} {metric.kind}")
+                lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    def record_query(self, elapsed):
+        with self._lock:
+            self.queries.inc()
+            self.query_seconds.inc(elapsed)
+        if has_request_context() and 'request_started' in g:
+            g.query_count += 1
+            g.query_seconds += elapsed
+
+    def record_request(self, endpoint, method, status, elapsed, query_count, query_seconds):
+        with self._lock:
+            self.request_seconds.observe(
+                elapsed, (('endpoint', endpoint), ('method', method), ('status', status)))
+            self.request_queries.observe(query_count, (('endpoint', endpoint),))
+            self.request_query_seconds.observe(query_seconds, (('endpoint', endpoint),))
+
+    @contextlib.contextmanager
+    def track_ingest(self, kind):
+        """Collects the phase timings of one upload or append run in this thread.
+
+        Yields the run; setting its ``rows`` to the number of rows stored marks
+        it successful, and its phases, throughput and memory are recorded on exit.
+        """
+        run = IngestRun(kind)
+        previous = getattr(self._ingest, 'run', None)
+        self._ingest.run = run
+        trace_memory = current_app.config.get('INGEST_TRACE_MEMORY', False)
+        if trace_memory:
+            # tracemalloc is process-wide: concurrent ingests share the peak
+            run.traced = not tracemalloc.is_tracing()
+            if run.traced:
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+        try:
+            yield run
+        finally:
+            if trace_memory:
+                run.peak_memory = tracemalloc.get_traced_memory()[1]
+                if run.traced:
+                    tracemalloc.stop()
+            self._ingest.run = previous
+            if run.rows is not None:
+                self._record_ingest(run)
+            if has_request_context():
+                g.ingest_phases = run.phases
+
+    def _record_ingest(self, run):
+        rows = run.rows
+        elapsed = time.perf_counter() - run.started
+        peak = _peak_rss_bytes()
+        with self._lock:
+            for phase, seconds in run.phases.items():
+                self.ingest_phase_seconds.observe(seconds, (('kind', run.kind), ('phase', phase)))
+            self.ingest_rows.inc(rows, (('kind', run.kind),))
+            if elapsed > 0:
+                self.ingest_rate.observe(rows / elapsed, (('kind', run.kind),))
+            if peak is not None:
+                self.ingest_peak_rss.set(peak)
+            if run.peak_memory is not None:
+                self.ingest_memory.observe(run.peak_memory, (('kind', run.kind),))
+        phases = ', '.join(f"{phase}={seconds:.3f}s" for phase, seconds in run.phases.items())
+        logger.info(f"Ingested {rows} rows in {elapsed:.3f}s ({phases})")
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Adds the time spent in the block to the current ingest's ``name`` phase.
+
+        A no-op outside an ingest.
+        """
+        run = getattr(self._ingest, 'run', None)
+        if run is None:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            run.phases[name] = run.phases.get(name, 0.0) + time.perf_counter() - start
+
+    def timed_iter(self, iterable, name):
+        """Iterates ``iterable``, counting the time spent producing each item as phase ``name``."""
+        iterator = iter(iterable)
+        while True:
+            with self.phase(name):
+                item = next(iterator, _DONE)
+            if item is _DONE:
+                return
+            yield item
+
+
+class IngestRun:
+    def __init__(self, kind):
+        self.kind = kind
+        self.started = time.perf_counter()
+        self.phases = dict.fromkeys(INGEST_PHASES, 0.0)
+        self.rows = None
+        self.traced = False
+        self.peak_memory = None
+
+
+_DONE = object()
+_listening = False
+
+
+def _listen_for_queries():
+    global _listening
+    if _listening:
+        return
+    event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+    event.listen(Engine, 'handle_error', _handle_error)
+    _listening = True
+
+
+# Kept on the statement's execution context, which is discarded with it, rather than on the
+# pooled connection, where a failed statement's start time would never be removed
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context.metrics_query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, 'metrics_query_started', None)
+    if started is not None:
+        metrics.record_query(time.perf_counter() - started)
+
+
+def _handle_error(exception_context):
+    """Counts a failed statement's time; ``after_cursor_execute`` never fires for it."""
+    started = getattr(exception_context.execution_context, 'metrics_query_started', None)
+    if started is not None:
+        metrics.record_query(time.perf_counter() - started)
+
+
+def _start_request():
+    g.request_started = time.perf_counter()
+    g.query_count = 0
+    g.query_seconds = 0.0
+
+
+def _finish_request(response):
+    if 'request_started' not in g:
+        return response
+    elapsed = time.perf_counter() - g.request_started
+    endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    if current_app.config.get('METRICS_ENABLED', True):
+        metrics.record_request(endpoint, request.method, str(response.status_code), elapsed,
+                               g.query_count, g.query_seconds)
+    if current_app.config.get('SERVER_TIMING', False):
+        timings = [f'app;dur={elapsed * 1000:.1f}',
+                   f'db;dur={g.query_seconds * 1000:.1f};desc="{g.query_count} queries"']
+        timings.extend(
+            f'{phase};dur={seconds * 1000:.1f}'
+            for phase, seconds in g.get('ingest_phases', {}).items()
+        )
+        response.headers['Server-Timing'] = ', '.join(timings)
+    return response
+
+
+def _peak_rss_bytes():
+    """Peak resident set size of this process so far (a high-water mark, not per ingest)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024  # kilobytes on Linux
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels) + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+metrics = MetricsRegistry()
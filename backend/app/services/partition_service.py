@@ -0,0 +1,120 @@
+import logging
+from sqlalchemy import text
+from ..models.dataset import Dataset
+from ..models.record import Record
+from .. import db
+
+logger = logging.getLogger(__name__)
+
+RECORDS = Record.__tablename__
+DEFAULT_PARTITION = f'{RECORDS}_default'
+
+
+class PartitionService:
+    """Per-dataset partitions of the records table on PostgreSQL.
+
+    Once ``flask datasets partition`` has converted ``records`` into a table
+    ``PARTITION BY LIST (dataset_id)``, every dataset gets its own partition
+    when it is registered and loses it with a ``DROP TABLE`` when deleted.
+    Queries keep addressing ``records``: their ``dataset_id`` filter lets the
+    planner prune to one partition, so ``Record`` and the services need no
+    changes. Without a partitioned table (and always on SQLite) every method
+    here is a no-op.
+    """
+
+    @staticmethod
+    def is_partitioned():
+        if db.session.get_bind().dialect.name != 'postgresql':
+            return False
+        return db.session.execute(text(
+            "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table "
+            "WHERE partrelid = to_regclass(:table))"
+        ), {'table': RECORDS}).scalar()
+
+    @staticmethod
+    def partition_name(dataset_id):
+        return f'{RECORDS}_p{int(dataset_id)}'
+
+    @staticmethod
+    def create_partition(dataset_id):
+        """Creates and commits the partition of a dataset before anything is loaded into it.
+
+        Attaching a partition briefly locks the whole records table, so it is
+        never done inside a long ingest transaction.
+        """
+        if not PartitionService.is_partitioned():
+            return False
+        name = PartitionService.partition_name(dataset_id)
+        db.session.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {RECORDS} "
+            f"FOR VALUES IN ({int(dataset_id)})"
+        ))
+        db.session.commit()
+        logger.info(f"Created partition {name}")
+        return True
+
+    @staticmethod
+    def drop_partition(dataset_id):
+        """Drops a dataset's partition with all its records.
+
+        Returns False when records is not partitioned.
+        """
+        if not PartitionService.is_partitioned():
+            return False
+        name = PartitionService.partition_name(dataset_id)
+        db.session.execute(text(f"DROP TABLE IF EXISTS {name}"))
+        db.session.commit()
+        return True
+
+    @staticmethod
+    def partition_records():
+        """Rebuilds the records table as a LIST-partitioned table with one partition per dataset.
+
+        Runs in one transaction that holds the records table exclusively while
+        every row is copied, so schedule it like any table rewrite. Rows of
+        datasets without a partition land in a default partition. Returns the
+        number of partitions created.
+        """
+        if db.session.get_bind().dialect.name != 'postgresql':
+            raise ValueError("Partitioned records storage requires PostgreSQL.")
+        if PartitionService.is_partitioned():
+            return 0
+
+        legacy = f'{RECORDS}_unpartitioned'
+        sequence = db.session.execute(
+            text(f"SELECT pg_get_serial_sequence('{RECORDS}', 'id')")
+        ).scalar()
+        dataset_ids = [row.id for row in db.session.query(Dataset.id)]
+        statements = [
+            f"LOCK TABLE {RECORDS} IN ACCESS EXCLUSIVE MODE",
+            f"ALTER TABLE {RECORDS} RENAME TO {legacy}",
+            f"CREATE TABLE {RECORDS} (LIKE {legacy} INCLUDING DEFAULTS) "
+            "PARTITION BY LIST (dataset_id)",
+            f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {RECORDS} DEFAULT",
+        ]
+        statements.extend(
+            f"CREATE TABLE {PartitionService.partition_name(dataset_id)} PARTITION OF {RECORDS} "
+            f"FOR VALUES IN ({int(dataset_id)})"
+            for dataset_id in dataset_ids
+        )
+        statements.extend([
+            f"INSERT INTO {RECORDS} SELECT * FROM {legacy}",
+            f"ALTER SEQUENCE {sequence} OWNED BY {RECORDS}.id",
+            f"DROP TABLE {legacy}",
+            # A partitioned table's unique keys must include the partition key
+            f"ALTER TABLE {RECORDS} ADD CONSTRAINT {RECORDS}_pkey PRIMARY KEY (id, dataset_id)",
+            f"ALTER TABLE {RECORDS} ADD CONSTRAINT {RECORDS}_dataset_id_fkey "
+            f"FOREIGN KEY (dataset_id) REFERENCES {Dataset.__tablename__} (id) ON DELETE CASCADE",
+        ])
+        try:
+            for statement in statements:
+                db.session.execute(text(statement))
+            connection = db.session.connection()
+            for index in Record.__table__.indexes:
+                index.create(connection)  # created on the parent, so every partition inherits it
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        logger.info(f"Partitioned {RECORDS} into {len(dataset_ids)} dataset partitions")
+        return len(dataset_ids)
@@ -0,0 +1,195 @@
+import logging
+import pandas as pd
+from sqlalchemy import insert, func
+from ..models.record import Record
+from ..models.rollup import CategoryRollup, DailyRollup, CategoryMonthRollup
+from .. import db
+
+logger = logging.getLogger(__name__)
+
+AGGREGATES = ['record_count', 'value_count', 'total_value', 'min_value', 'max_value']
+ROLLUPS = {
+    CategoryRollup: ['category'],
+    DailyRollup: ['date'],
+    CategoryMonthRollup: ['category', 'month'],
+}
+
+
+def _aggregate(frame, keys):
+    return frame.groupby(keys, sort=False).agg(
+        record_count=('value', 'size'),
+        value_count=('value', 'count'),
+        total_value=('value', 'sum'),
+        min_value=('value', 'min'),
+        max_value=('value', 'max'),
+    )
+
+
+def _combine(current, partial):
+    """Merges two partial aggregates that share the same group keys."""
+    if current is None:
+        return partial
+    levels = list(range(partial.index.nlevels))
+    merged = pd.concat([current, partial]).groupby(level=levels, sort=False)
+    return merged.agg({
+        'record_count': 'sum',
+        'value_count': 'sum',
+        'total_value': 'sum',
+        'min_value': 'min',
+        'max_value': 'max',
+    })
+
+
+class RollupAccumulator:
+    """Builds per-dataset rollups incrementally from batches of record mappings.
+
+    Memory is bounded by the number of groups (categories, days, category x month),
+    never by the number of rows.
+    """
+
+    def __init__(self):
+        self.partials = {model: None for model in ROLLUPS}
+
+    def add_records(self, records):
+        frame = pd.DataFrame.from_records(records, columns=['date', 'category', 'value'])
+        if frame.empty:
+            return
+        frame['value'] = frame['value'].astype(float)
+        self._add(CategoryRollup, frame)
+
+        dated = frame[frame['date'].notna()].copy()
+        if not dated.empty:
+            dated['month'] = pd.to_datetime(dated['date']).dt.to_period('M').dt.start_time.dt.date
+            self._add(DailyRollup, dated)
+            self._add(CategoryMonthRollup, dated)
+
+    def _add(self, model, frame):
+        self.partials[model] = _combine(self.partials[model], _aggregate(frame, ROLLUPS[model]))
+
+    def rows(self, model, dataset_id):
+        """Returns insertable mappings for one rollup table."""
+        partial = self.partials[model]
+        if partial is None:
+            return []
+        frame = partial.reset_index()
+        frame['total_value'] = frame['total_value'].round(2)
+        frame = frame.astype(object).where(frame.notna(), None)
+        frame['dataset_id'] = dataset_id
+        return frame.to_dict('records')
+
+    def persist(self, dataset_id, merge=False):
+        """Writes every rollup table inside the caller's transaction.
+
+        With ``merge`` the accumulated groups are combined with the rollups the
+        dataset already has (an append), which costs O(groups), not O(rows).
+        """
+        connection = db.session.connection()
+        for model in ROLLUPS:
+            if merge and self.partials[model] is not None:
+                self.partials[model] = _combine(_stored_rollups(model, dataset_id),
+                                                self.partials[model])
+                model.query.filter_by(dataset_id=dataset_id).delete(synchronize_session=False)
+            rows = self.rows(model, dataset_id)
+            if rows:
+                connection.execute(insert(model.__table__), rows)
+        logger.info(f"Rollups persisted for dataset {dataset_id}.")
+
+
+class RollupService:
+    @staticmethod
+    def delete(dataset_id):
+        """Removes all rollups of a dataset without committing."""
+        for model in ROLLUPS:
+            model.query.filter_by(dataset_id=dataset_id).delete(synchronize_session=False)
+
+    @staticmethod
+    def has_rollups(dataset_id):
+        return db.session.query(CategoryRollup.dataset_id).filter_by(
+            dataset_id=dataset_id
+        ).first() is not None
+
+    @staticmethod
+    def rebuild(dataset_id, batch_size=50000):
+        """Recomputes the rollups of a dataset from its records, e.g. for legacy datasets."""
+        accumulator = RollupAccumulator()
+        query = db.session.query(Record.date, Record.category, Record.value).filter(
+            Record.dataset_id == dataset_id
+        ).execution_options(yield_per=batch_size)
+        batch = []
+        for row in query:
+            batch.append({'date': row.date, 'category': row.category, 'value': row.value})
+            if len(batch) >= batch_size:
+                accumulator.add_records(batch)
+                batch = []
+        accumulator.add_records(batch)
+
+        RollupService.delete(dataset_id)
+        accumulator.persist(dataset_id)
+        db.session.commit()
+        return accumulator
+
+    @staticmethod
+    def verify(dataset_id, tolerance=0.005):
+        """Compares stored rollups with a full scan of the records table.
+
+        Returns a list of human readable mismatches; an empty list means consistent.
+        """
+        scan = db.session.query(
+            Record.category,
+            Record.date,
+            func.count(Record.id).label('record_count'),
+            func.count(Record.value).label('value_count'),
+            func.sum(Record.value).label('total_value'),
+            func.min(Record.value).label('min_value'),
+            func.max(Record.value).label('max_value')
+        ).filter(Record.dataset_id == dataset_id).group_by(Record.category, Record.date).all()
+
+        frame = pd.DataFrame(scan, columns=['category', 'date'] + AGGREGATES)
+        for col in ('total_value', 'min_value', 'max_value'):
+            frame[col] = frame[col].astype(float)
+        expected = {CategoryRollup: _reaggregate(frame, ['category'])}
+        dated = frame[frame['date'].notna()].copy()
+        dated['month'] = pd.to_datetime(dated['date']).dt.to_period('M').dt.start_time.dt.date
+        expected[DailyRollup] = _reaggregate(dated, ['date'])
+        expected[CategoryMonthRollup] = _reaggregate(dated, ['category', 'month'])
+
+        mismatches = []
+        for model, keys in ROLLUPS.items():
+            stored = pd.read_sql(
+                db.session.query(model).filter_by(dataset_id=dataset_id).statement,
+                db.session.connection()
+            )
+            stored = stored.set_index(keys)[AGGREGATES].astype(float)
+            want = expected[model][AGGREGATES].astype(float)
+            if set(stored.index) != set(want.index):
+                mismatches.append(f"{model.__tablename__}: group keys differ from full scan")
+                continue
+            diff = (stored.loc[want.index] - want).abs().fillna(0)
+            for key, row in diff[(diff > tolerance).any(axis=1)].iterrows():
+                mismatches.append(f"{model.__tablename__}{key}: {row[row > tolerance].to_dict()}")
+
+        if mismatches:
+            logger.warning(f"Rollup consistency check failed for dataset {dataset_id}: "
+                           f"{len(mismatches)} mismatches")
+        return mismatches
+
+
+def _stored_rollups(model, dataset_id):
+    stored = pd.read_sql(
+        db.session.query(model).filter_by(dataset_id=dataset_id).statement,
+        db.session.connection()
+    )
+    if stored.empty:
+        return None
+    stored = stored.set_index(ROLLUPS[model])[AGGREGATES]
+    return stored.astype({col: float for col in ('total_value', 'min_value', 'max_value')})
+
+
+def _reaggregate(frame, keys):
+    return frame.groupby(keys).agg({
+        'record_count': 'sum',
+        'value_count': 'sum',
+        'total_value': 'sum',
+        'min_value': 'min',
+        'max_value': 'max',
+    })
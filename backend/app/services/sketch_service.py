@@ -0,0 +1,191 @@
+import logging
+from datetime import date
+from flask import current_app
+from ..models.sketch import DatasetSketch
+from ..models.record import Record
+from .sketches import HyperLogLog, KLLSketch, ReservoirSample
+from .. import db
+
+logger = logging.getLogger(__name__)
+
+QUANTILES = {'p50': 0.5, 'p90': 0.9, 'p99': 0.99}
+Z_95 = 1.96
+
+
+class SketchAccumulator:
+    """Builds a dataset's sketches incrementally from batches of record mappings."""
+
+    def __init__(self, sample_size=None):
+        if sample_size is None:
+            sample_size = current_app.config.get('SKETCH_SAMPLE_SIZE', 1000)
+        self.categories = HyperLogLog(current_app.config.get('SKETCH_HLL_PRECISION', 14))
+        self.values = KLLSketch(current_app.config.get('SKETCH_KLL_K', 200))
+        self.sample = ReservoirSample(sample_size)
+        self.record_count = 0
+        self.total_value = 0.0
+        self.min_date = None
+        self.max_date = None
+
+    @classmethod
+    def resume(cls, dataset_id):
+        """Continues from a dataset's stored sketches, e.g. for an append.
+
+        Returns None when the dataset has no sketches yet.
+        """
+        sketch = db.session.get(DatasetSketch, dataset_id)
+        if sketch is None:
+            return None
+        accumulator = cls(sketch.sample['size'])
+        accumulator.categories = HyperLogLog.from_state(sketch.category_hll)
+        accumulator.values = KLLSketch.from_state(sketch.value_kll)
+        accumulator.sample = ReservoirSample.from_state(sketch.sample)
+        accumulator.record_count = sketch.record_count
+        accumulator.total_value = float(sketch.total_value or 0)
+        accumulator.min_date = sketch.min_date
+        accumulator.max_date = sketch.max_date
+        return accumulator
+
+    def add_records(self, records):
+        if not records:
+            return
+        self.record_count += len(records)
+        self.categories.add_many([record['category'] for record in records])
+        values = [record['value'] for record in records if record['value'] is not None]
+        self.values.add_many(values)
+        self.total_value += float(sum(values))
+        dates = [record['date'] for record in records if record['date'] is not None]
+        if dates:
+            low, high = min(dates), max(dates)
+            self.min_date = low if self.min_date is None else min(self.min_date, low)
+            self.max_date = high if self.max_date is None else max(self.max_date, high)
+        self.sample.add_many(records, convert=_preview_row)
+
+    def persist(self, dataset_id):
+        """Writes the sketches inside the caller's transaction."""
+        db.session.merge(DatasetSketch(
+            dataset_id=dataset_id,
+            record_count=self.record_count,
+            value_count=self.values.count,
+            total_value=round(self.total_value, 2),
+            min_date=self.min_date,
+            max_date=self.max_date,
+            category_hll=self.categories.to_state(),
+            value_kll=self.values.to_state(),
+            sample=self.sample.to_state()
+        ))
+        logger.info(f"Sketches persisted for dataset {dataset_id}.")
+
+
+class SketchService:
+    @staticmethod
+    def delete(dataset_id):
+        """Removes the sketches of a dataset without committing."""
+        DatasetSketch.query.filter_by(dataset_id=dataset_id).delete(synchronize_session=False)
+
+    @staticmethod
+    def get_approximate_summary(dataset_ids):
+        """Summary with approximate distinct categories and value quantiles from stored sketches.
+
+        Sketches of several datasets are merged, so the result describes their
+        union. Returns None when any dataset has no sketch (ingested before
+        sketches existed); ``flask rollups rebuild`` creates them.
+        """
+        sketches = DatasetSketch.query.filter(DatasetSketch.dataset_id.in_(dataset_ids)).all()
+        if len(sketches) != len(set(dataset_ids)):
+            return None
+
+        categories = values = None
+        record_count = value_count = 0
+        total_value = 0.0
+        min_dates, max_dates = [], []
+        for sketch in sketches:
+            hll = HyperLogLog.from_state(sketch.category_hll)
+            kll = KLLSketch.from_state(sketch.value_kll)
+            categories = hll if categories is None else categories.merge(hll)
+            values = kll if values is None else values.merge(kll)
+            record_count += sketch.record_count
+            value_count += sketch.value_count
+            total_value += float(sketch.total_value or 0)
+            if sketch.min_date is not None:
+                min_dates.append(sketch.min_date)
+                max_dates.append(sketch.max_date)
+
+        distinct = categories.estimate()
+        spread = Z_95 * categories.relative_error * distinct
+        quantiles = dict(zip(QUANTILES, values.quantiles(list(QUANTILES.values()))))
+        rank_error = values.rank_error
+        return {
+            "dataset_id": dataset_ids[0] if len(dataset_ids) == 1 else None,
+            "mode": "approx",
+            "total_records": record_count,
+            "date_range": {
+                "min": str(min(min_dates)) if min_dates else None,
+                "max": str(max(max_dates)) if max_dates else None
+            },
+            "category_count": round(distinct),
+            "total_value": total_value,
+            "avg_value": total_value / value_count if value_count else 0.0,
+            "min_value": values.min if values.min is not None else 0.0,
+            "max_value": values.max if values.max is not None else 0.0,
+            "quantiles": quantiles,
+            "error_bounds": {
+                "category_count": {
+                    "relative_standard_error": categories.relative_error,
+                    "low": max(0, int(distinct - spread)),
+                    "high": int(round(distinct + spread)),
+                    "confidence": 0.95
+                },
+                "quantiles": {
+                    "normalized_rank_error": rank_error,
+                    "confidence": 0.99,
+                    "ranges": {
+                        name: dict(zip(('low', 'high'), values.quantiles(
+                            [max(q - rank_error, 0), min(q + rank_error, 1)]
+                        )))
+                        for name, q in QUANTILES.items()
+                    }
+                }
+            }
+        }
+
+    @staticmethod
+    def get_sample(dataset_id, limit=100):
+        """Returns up to ``limit`` rows of the dataset's uniform reservoir sample."""
+        sketch = db.session.get(DatasetSketch, dataset_id)
+        if sketch is None:
+            return None
+        items = sketch.sample['items'][:limit]
+        return {
+            "dataset_id": dataset_id,
+            "sampled_from": sketch.sample['seen'],
+            "rows": items
+        }
+
+    @staticmethod
+    def rebuild(dataset_id, batch_size=50000):
+        """Recomputes a dataset's sketches from its records, e.g. for legacy datasets."""
+        accumulator = SketchAccumulator()
+        query = db.session.query(
+            Record.date, Record.category, Record.value, Record.metadata_json
+        ).filter(Record.dataset_id == dataset_id).execution_options(yield_per=batch_size)
+        batch = []
+        for row in query:
+            batch.append({'date': row.date, 'category': row.category, 'value': row.value,
+                          'metadata_json': row.metadata_json})
+            if len(batch) >= batch_size:
+                accumulator.add_records(batch)
+                batch = []
+        accumulator.add_records(batch)
+        accumulator.persist(dataset_id)
+        db.session.commit()
+        return accumulator
+
+
+def _preview_row(record):
+    row = {
+        'date': record['date'].isoformat() if isinstance(record['date'], date) else record['date'],
+        'category': record['category'],
+        'value': float(record['value']) if record['value'] is not None else None,
+    }
+    row.update(record.get('metadata_json') or {})
+    return row
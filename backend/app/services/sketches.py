@@ -0,0 +1,216 @@
+"""Mergeable streaming sketches for approximate analytics.
+
+All three sketches are updated a whole batch at a time with NumPy, keep a
+size independent of the number of rows, serialize to plain JSON-compatible
+state, and merge with another sketch of the same kind so results can be
+combined across datasets.
+"""
+import math
+import numpy as np
+import pandas as pd
+
+
+class HyperLogLog:
+    """Distinct-count estimator with relative standard error ``1.04 / sqrt(2**precision)``."""
+
+    def __init__(self, precision=14, registers=None):
+        self.precision = precision
+        if registers is None:
+            registers = np.zeros(1 << precision, dtype=np.uint8)
+        self.registers = registers
+
+    def add_many(self, values):
+        values = np.asarray(values, dtype=object)
+        if values.size == 0:
+            return
+        hashes = pd.util.hash_array(values)
+        index = (hashes >> np.uint64(64 - self.precision)).astype(np.int64)
+        remainder = hashes << np.uint64(self.precision)
+        # Rank = leading zeros of the remaining bits + 1, from the bit length of each 32-bit half
+        high = (remainder >> np.uint64(32)).astype(np.float64)
+        low = (remainder & np.uint64(0xFFFFFFFF)).astype(np.float64)
+        high_bits = np.frexp(high)[1]
+        low_bits = np.frexp(low)[1]
+        rank = np.where(high > 0, 33 - high_bits, 65 - low_bits)
+        rank = np.minimum(rank, 64 - self.precision + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLog sketches with different precision.")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    @property
+    def relative_error(self):
+        return 1.04 / math.sqrt(len(self.registers))
+
+    def estimate(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros:
+            return m * math.log(m / zeros)  # linear counting for small cardinalities
+        return float(raw)
+
+    def to_state(self):
+        return {'precision': self.precision, 'registers': self.registers.tobytes().hex()}
+
+    @classmethod
+    def from_state(cls, state):
+        registers = np.frombuffer(bytes.fromhex(state['registers']), dtype=np.uint8).copy()
+        return cls(state['precision'], registers)
+
+
+class KLLSketch:
+    """KLL quantile sketch (Karnin, Lang, Liberty) over a stream of floats.
+
+    Level ``h`` holds items of weight ``2**h``; a level over capacity is sorted
+    and every other item, from a random offset, is promoted to the next level.
+    Capacities shrink geometrically below the top level, so the sketch holds
+    O(k) items. ``rank_error`` is the normalized rank error at 99% confidence.
+    """
+
+    def __init__(self, k=200, seed=None):
+        self.k = k
+        self.count = 0
+        self.min = None
+        self.max = None
+        self.levels = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def add_many(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if values.size == 0:
+            return
+        self.count += int(values.size)
+        low, high = float(values.min()), float(values.max())
+        self.min = low if self.min is None else min(self.min, low)
+        self.max = high if self.max is None else max(self.max, high)
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+
+    def merge(self, other):
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for height, items in enumerate(other.levels):
+            self.levels[height] = np.concatenate([self.levels[height], items])
+        self.count += other.count
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+        self._compress()
+        return self
+
+    def _capacity(self, height):
+        depth = len(self.levels) - height - 1
+        return max(int(math.ceil(self.k * (2 / 3) ** depth)), 2)
+
+    def _compress(self):
+        height = 0
+        while height < len(self.levels):
+            items = self.levels[height]
+            if len(items) > self._capacity(height):
+                if height + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                items = np.sort(items)
+                # An odd item out stays behind so the total weight is preserved
+                keep = items[:1] if len(items) % 2 else items[:0]
+                pairs = items[len(keep):]
+                promoted = pairs[int(self._rng.integers(0, 2))::2]
+                self.levels[height] = keep
+                self.levels[height + 1] = np.concatenate([self.levels[height + 1], promoted])
+                height = 0  # capacities depend on the number of levels
+                continue
+            height += 1
+
+    @property
+    def rank_error(self):
+        return 2.296 / self.k ** 0.9723
+
+    def quantiles(self, fractions):
+        if not self.count:
+            return [None for _ in fractions]
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(level), 2.0 ** height)
+                                  for height, level in enumerate(self.levels)])
+        order = np.argsort(items, kind='stable')
+        items, cumulative = items[order], np.cumsum(weights[order])
+        results = []
+        for fraction in fractions:
+            position = int(np.searchsorted(cumulative, fraction * cumulative[-1], side='left'))
+            results.append(float(items[min(position, len(items) - 1)]))
+        return results
+
+    def to_state(self):
+        return {
+            'k': self.k,
+            'count': self.count,
+            'min': self.min,
+            'max': self.max,
+            'levels': [level.tolist() for level in self.levels],
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        sketch = cls(state['k'])
+        sketch.count = state['count']
+        sketch.min = state['min']
+        sketch.max = state['max']
+        sketch.levels = [np.asarray(level, dtype=np.float64) for level in state['levels']]
+        return sketch
+
+
+class ReservoirSample:
+    """Uniform random sample of at most ``size`` items from a stream (algorithm R)."""
+
+    def __init__(self, size=1000, seed=None):
+        self.size = size
+        self.seen = 0
+        self.items = []
+        self._rng = np.random.default_rng(seed)
+
+    def add_many(self, items, convert=None):
+        """Offers every item to the sample; ``convert`` is applied only to the items kept."""
+        if not items:
+            return
+        convert = convert or (lambda item: item)
+        fill = min(max(self.size - len(self.items), 0), len(items))
+        self.items.extend(convert(item) for item in items[:fill])
+        self.seen += fill
+        rest = items[fill:]
+        if rest:
+            # Item t (0-based over the stream) replaces a random slot
+            # with probability size / (t + 1)
+            slots = self._rng.integers(0, np.arange(self.seen + 1, self.seen + len(rest) + 1))
+            for offset in np.flatnonzero(slots < self.size):
+                self.items[slots[offset]] = convert(rest[offset])
+            self.seen += len(rest)
+
+    def merge(self, other):
+        """Combines two samples into a uniform sample of their union."""
+        total = self.seen + other.seen
+        if not total:
+            return self
+        mine, theirs = list(self.items), list(other.items)
+        self._rng.shuffle(mine)
+        self._rng.shuffle(theirs)
+        merged = []
+        while len(merged) < self.size and (mine or theirs):
+            take_mine = theirs == [] or (mine and self._rng.random() < self.seen / total)
+            merged.append(mine.pop() if take_mine else theirs.pop())
+        self.items = merged
+        self.seen = total
+        return self
+
+    def to_state(self):
+        return {'size': self.size, 'seen': self.seen, 'items': self.items}
+
+    @classmethod
+    def from_state(cls, state):
+        sample = cls(state['size'])
+        sample.seen = state['seen']
+        sample.items = list(state['items'])
+        return sample
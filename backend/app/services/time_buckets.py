@@ -0,0 +1,78 @@
+from datetime import date, timedelta
+from sqlalchemy import Date, Integer, cast, func, literal_column
+
+GRANULARITIES = ('day', 'week', 'month', 'quarter', 'year')
+DEFAULT_GRANULARITY = 'month'
+
+
+def validate_granularity(granularity):
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Invalid granularity '{granularity}'. "
+                         f"Expected one of: {', '.join(GRANULARITIES)}")
+    return granularity
+
+
+def bucket_expression(column, granularity, dialect_name):
+    """SQL expression mapping a date column to the first day of its bucket.
+
+    PostgreSQL (and other engines with ``date_trunc``) truncate natively; SQLite
+    uses ``date()`` modifiers. Weeks start on Monday on every dialect.
+    """
+    validate_granularity(granularity)
+    if dialect_name == 'sqlite':
+        if granularity == 'day':
+            return func.date(column)
+        if granularity == 'week':
+            return func.date(column, '-6 days', 'weekday 1')
+        if granularity == 'month':
+            return func.date(column, 'start of month')
+        if granularity == 'quarter':
+            month_in_quarter = (cast(func.strftime('%m', column), Integer) - 1) % 3
+            return func.date(column, 'start of month', func.printf('-%d months', month_in_quarter))
+        return func.date(column, 'start of year')
+    # Inlined rather than bound so the SELECT and GROUP BY expressions compare equal
+    return cast(func.date_trunc(literal_column(f"'{granularity}'"), column), Date)
+
+
+def to_date(value):
+    """Normalizes a bucket returned by the database (``date`` or ISO string) to ``date``."""
+    if value is None or isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def next_bucket(bucket, granularity):
+    if granularity == 'day':
+        return bucket + timedelta(days=1)
+    if granularity == 'week':
+        return bucket + timedelta(days=7)
+    months = {'month': 1, 'quarter': 3, 'year': 12}[granularity]
+    month_index = bucket.year * 12 + bucket.month - 1 + months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def bucket_label(bucket, granularity):
+    if granularity in ('day', 'week'):
+        return bucket.isoformat()
+    if granularity == 'month':
+        return bucket.strftime('%Y-%m')
+    if granularity == 'quarter':
+        return f"{bucket.year}-Q{(bucket.month - 1) // 3 + 1}"
+    return str(bucket.year)
+
+
+def fill_series(rows, granularity):
+    """Turns sparse ``(bucket, value)`` rows into a continuous labelled series.
+
+    Buckets without data between the first and last one are emitted with 0,
+    matching what a pandas resample produced.
+    """
+    totals = {to_date(bucket): float(value or 0) for bucket, value in rows if bucket is not None}
+    if not totals:
+        return []
+    series = []
+    bucket, last = min(totals), max(totals)
+    while bucket <= last:
+        series.append({"date": bucket_label(bucket, granularity), "value": totals.get(bucket, 0.0)})
+        bucket = next_bucket(bucket, granularity)
+    return series
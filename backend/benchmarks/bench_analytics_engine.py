@@ -0,0 +1,101 @@
+"""Per-query latency of the SQL and DuckDB analytics engines on one large dataset.
+
+Ingests a synthetic sales-shaped dataset once with ``ANALYTICS_ENGINE=duckdb``
+(so it has rollups, records and a Parquet replica), then times summary,
+chart-data and dashboard three ways:
+
+- ``sql``: the default engine, reading the precomputed rollups;
+- ``sql-scan``: the SQL engine's full scan of records, which datasets without
+  rollups (and any new ad-hoc aggregation) pay;
+- ``duckdb``: the embedded DuckDB engine scanning the Parquet replica.
+
+The analytics cache is disabled so every call runs its queries.
+
+Usage (from backend/):
+    python -m benchmarks.bench_analytics_engine [rows] [repeats] [--postgres URL]
+
+``--postgres`` drops and recreates every table in that database; point it at
+a scratch database.
+"""
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+
+GENERATE_BATCH = 1_000_000  # rows generated per slice of the synthetic file
+QUERIES = ('summary', 'chart_data', 'dashboard')
+
+
+def _write_csv(path, rows):
+    from .synthetic import make_csv
+    with open(path, 'wb') as fh:
+        for start in range(0, rows, GENERATE_BATCH):
+            payload = make_csv(min(GENERATE_BATCH, rows - start), seed=start)
+            fh.write(payload if start == 0 else payload.split(b'\n', 1)[1])
+
+
+def _timed(call, repeats):
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        call()
+        samples.append(time.perf_counter() - start)
+    return float(np.percentile(samples, 50)) * 1000
+
+
+def main(rows, repeats, database_url):
+    workdir = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = database_url or f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ['ANALYTICS_CACHE_SIZE'] = '0'
+    from werkzeug.datastructures import FileStorage
+    from app import create_app, db
+    from app.services.analytics_service import AnalyticsService
+    from app.services.dataset_service import DatasetService
+
+    app = create_app('production')
+    app.config.update(UPLOAD_FOLDER=workdir, ANALYTICS_ENGINE='duckdb')
+    csv_path = os.path.join(workdir, 'sales.csv')
+    _write_csv(csv_path, rows)
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        start = time.perf_counter()
+        with open(csv_path, 'rb') as stream:
+            dataset = DatasetService.process_csv_upload(
+                FileStorage(stream=stream, filename='sales.csv'), 'bench', ''
+            )
+        print(f"{rows:,} rows on {db.engine.dialect.name}, "
+              f"ingested in {time.perf_counter() - start:.1f}s; p50 of {repeats} runs")
+        dataset_id = dataset.id
+
+        engines = {
+            'sql': {
+                'summary': lambda: AnalyticsService.get_summary_statistics(dataset_id),
+                'chart_data': lambda: AnalyticsService.get_chart_data(dataset_id, 'month'),
+                'dashboard': lambda: AnalyticsService.get_dashboard(dataset_id, 'month'),
+            },
+            'sql-scan': {
+                'summary': lambda: AnalyticsService._scan_summary_statistics(dataset_id),
+                'chart_data': lambda: AnalyticsService._scan_chart_data(dataset_id, 'month'),
+                'dashboard': lambda: AnalyticsService._scan_dashboard_groups(dataset_id, 'month'),
+            },
+        }
+        engines['duckdb'] = engines['sql']
+
+        print(f"{'engine':>10} " + ' '.join(f"{name + ' ms':>14}" for name in QUERIES))
+        for engine, calls in engines.items():
+            app.config['ANALYTICS_ENGINE'] = 'duckdb' if engine == 'duckdb' else 'sql'
+            latencies = [_timed(calls[name], repeats) for name in QUERIES]
+            print(f"{engine:>10} " + ' '.join(f"{latency:>14.1f}" for latency in latencies))
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    postgres = None
+    if '--postgres' in args:
+        index = args.index('--postgres')
+        postgres = args[index + 1]
+        del args[index:index + 2]
+    main(int(args[0]) if args else 10_000_000, int(args[1]) if len(args) > 1 else 5, postgres)
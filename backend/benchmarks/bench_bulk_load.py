@@ -0,0 +1,76 @@
+"""Compares ORM bulk_save_objects, Core executemany and PostgreSQL COPY inserts.
+
+Runs against DATABASE_URL when set (use a PostgreSQL URL to include COPY),
+otherwise against a temporary SQLite file.
+
+Usage (from backend/):
+    python -m benchmarks.bench_bulk_load [rows ...]
+"""
+import os
+import sys
+import tempfile
+import time
+
+# Must be set before the app config is imported
+if 'DATABASE_URL' not in os.environ:
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+
+from app import create_app, db
+from app.models.dataset import Dataset
+from app.models.record import Record
+from app.services.bulk_loader import get_bulk_loader
+from app.services.dataset_service import DatasetService
+from .synthetic import make_frame
+
+DEFAULT_SIZES = [10_000, 100_000]
+
+
+def _orm(rows):
+    db.session.bulk_save_objects([Record(**row) for row in rows])
+
+
+def _loader(strategy):
+    def run(rows):
+        with get_bulk_loader(db.session.connection(), strategy) as loader:
+            loader.load(rows)
+    return run
+
+
+def _run(strategy, load, rows_template):
+    dataset = Dataset(name=f'bench-{strategy}', filename='bench.csv')
+    db.session.add(dataset)
+    db.session.flush()
+    rows = [dict(row, dataset_id=dataset.id) for row in rows_template]
+
+    start = time.perf_counter()
+    load(rows)
+    db.session.commit()
+    elapsed = time.perf_counter() - start
+
+    db.session.query(Record).filter_by(dataset_id=dataset.id).delete()
+    db.session.delete(dataset)
+    db.session.commit()
+    return elapsed
+
+
+def main(sizes):
+    app = create_app('production')
+    with app.app_context():
+        db.create_all()
+        dialect = db.engine.dialect.name
+        strategies = {'orm': _orm, 'core': _loader('core')}
+        if dialect == 'sqlite':
+            strategies['sqlite'] = _loader('sqlite')
+        if dialect == 'postgresql':
+            strategies['copy'] = _loader('copy')
+
+        print(f"dialect: {dialect}")
+        print(f"{'rows':>10} " + ' '.join(f"{name + ' rows/s':>16}" for name in strategies))
+        for size in sizes:
+            rows_template = DatasetService._parse_and_prepare_records(make_frame(size))
+            rates = [size / _run(name, load, rows_template) for name, load in strategies.items()]
+            print(f"{size:>10} " + ' '.join(f"{rate:>16,.0f}" for rate in rates))
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
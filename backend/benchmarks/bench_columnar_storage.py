@@ -0,0 +1,102 @@
+"""Compares JSON and columnar metadata storage: size on disk and scan times.
+
+Ingests the same synthetic sales_*.csv-shaped upload once per storage mode into
+a temporary SQLite database (or DATABASE_URL) and reports the metadata storage
+size plus the time to read one metadata column, group by it, and export.
+
+Usage (from backend/):
+    python -m benchmarks.bench_columnar_storage [rows] [extra_columns]
+"""
+import io
+import os
+import sys
+import tempfile
+import time
+
+# Must be set before the app config is imported
+if 'DATABASE_URL' not in os.environ:
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+
+from sqlalchemy import func, select, text
+from werkzeug.datastructures import FileStorage
+from app import create_app, db
+from app.models.record import Record
+from app.services.columnar_store import ColumnarReader
+from app.services.dataset_service import DatasetService
+from app.services.export_service import ExportService
+from .synthetic import make_csv
+
+
+def _table_bytes():
+    if db.engine.dialect.name == 'postgresql':
+        return db.session.execute(text("SELECT pg_total_relation_size('records')")).scalar()
+    return db.session.execute(
+        text("SELECT SUM(pgsize) FROM dbstat WHERE name LIKE '%records%'")
+    ).scalar()
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def _ingest(app, payload, storage):
+    app.config['METADATA_STORAGE'] = storage
+    before = _table_bytes()
+    start = time.perf_counter()
+    dataset = DatasetService.process_csv_upload(
+        FileStorage(stream=io.BytesIO(payload), filename='bench.csv'), f'bench-{storage}', None
+    )
+    elapsed = time.perf_counter() - start
+    return dataset, elapsed, _table_bytes() - before
+
+
+def _json_scans(dataset):
+    notes = Record.metadata_json['notes'].as_string()
+    column = lambda: db.session.execute(select(notes).where(Record.dataset_id == dataset.id)).all()
+    group = lambda: db.session.execute(
+        select(notes, func.count()).where(Record.dataset_id == dataset.id).group_by(notes)
+    ).all()
+    return column, group
+
+
+def _columnar_scans(dataset):
+    reader = ColumnarReader(dataset.id)
+    column = lambda: [table.column('notes').to_pylist() for table in reader.iter_tables(['notes'])]
+    group = lambda: [table.group_by('notes').aggregate([('notes', 'count')])
+                     for table in reader.iter_tables(['notes'])]
+    return column, group
+
+
+def _export(dataset):
+    generator, _, _ = ExportService.stream(dataset, 'csv', batch_size=10_000)
+    for _ in generator:
+        pass
+
+
+def main(rows, extra_columns):
+    app = create_app('production')
+    app.config['UPLOAD_FOLDER'] = tempfile.mkdtemp()
+    with app.app_context():
+        db.create_all()
+        payload = make_csv(rows, extra_columns=extra_columns)
+        print(f"dialect: {db.engine.dialect.name}, {rows:,} rows, {4 + extra_columns} columns")
+        print(f"{'storage':>9} {'ingest s':>9} {'records MB':>11} {'parquet MB':>11} "
+              f"{'column s':>9} {'group s':>8} {'export s':>9}")
+        for storage in ('json', 'columnar'):
+            dataset, ingest, table_bytes = _ingest(app, payload, storage)
+            if storage == 'json':
+                column, group = _json_scans(dataset)
+                parquet_bytes = 0
+            else:
+                column, group = _columnar_scans(dataset)
+                parquet_bytes = ColumnarReader(dataset.id).storage_bytes()
+            print(f"{storage:>9} {ingest:>9.2f} {table_bytes / 1e6:>11.1f} "
+                  f"{parquet_bytes / 1e6:>11.1f} {_timed(column):>9.2f} {_timed(group):>8.2f} "
+                  f"{_timed(lambda: _export(dataset)):>9.2f}")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 0)
@@ -0,0 +1,150 @@
+"""Parallel uploads and dashboard reads against gunicorn on one SQLite file.
+
+Starts gunicorn with several workers on a fresh SQLite database and, while
+``--uploaders`` threads each post ``--uploads`` synthetic CSVs, ``--readers``
+threads keep requesting the dataset listing and a dataset summary. Reports
+upload and read throughput, read latency, failed requests and how many
+"database is locked" errors the workers logged. Each profile runs in turn:
+
+- ``legacy``: rollback journal, ``synchronous=FULL`` and pysqlite's 5s busy
+  timeout, as before per-connection tuning;
+- ``tuned``: the configured ``SQLITE_PRAGMAS`` (WAL by default).
+
+Usage (from backend/):
+    python -m benchmarks.bench_concurrency [--workers 4] [--uploaders 4] [--uploads 3]
+        [--readers 4] [--rows 100000] [--profiles legacy,tuned]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import numpy as np
+from .bench_suite import _free_port, _http, _upload_over_http
+from .synthetic import make_csv
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROFILES = {
+    'legacy': {'SQLITE_JOURNAL_MODE': 'DELETE', 'SQLITE_SYNCHRONOUS': 'FULL',
+               'SQLITE_BUSY_TIMEOUT': '5000'},
+    'tuned': {},
+}
+
+
+def _run_profile(profile, csv_path, args):
+    workdir = tempfile.mkdtemp()
+    env = dict(os.environ, FLASK_ENV='production', ANALYTICS_CACHE_SIZE='0',
+               DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'bench.db')}", **PROFILES[profile])
+    create_tables = 'from run import app, db\nwith app.app_context(): db.create_all()'
+    subprocess.run([sys.executable, '-c', create_tables],
+                   cwd=BACKEND_DIR, env=env, check=True, stderr=subprocess.DEVNULL)
+
+    port = _free_port()
+    log_path = os.path.join(workdir, 'gunicorn.log')
+    with open(log_path, 'wb') as log:
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '--workers', str(args.workers),
+             '--bind', f'127.0.0.1:{port}', '--timeout', '0', '--log-level', 'warning', 'run:app'],
+            cwd=BACKEND_DIR, env=env, stderr=log
+        )
+    try:
+        deadline = time.monotonic() + 60
+        while True:
+            try:
+                if _http(port, 'GET', '/api/datasets')[0] == 200:
+                    break
+            except OSError:
+                pass
+            if time.monotonic() > deadline or server.poll() is not None:
+                raise RuntimeError("gunicorn did not start")
+            time.sleep(0.2)
+
+        status, body = _upload_over_http(port, csv_path)
+        if status != 201:
+            raise RuntimeError(f"Seed upload failed: {status} {body[:500]!r}")
+        dataset_id = json.loads(body)['id']
+
+        lock = threading.Lock()
+        uploads = {'ok': 0, 'failed': 0}
+        reads = {'ok': 0, 'failed': 0, 'latency': []}
+        uploading = threading.Event()
+        uploading.set()
+
+        def upload():
+            for _ in range(args.uploads):
+                status, _ = _upload_over_http(port, csv_path)
+                with lock:
+                    uploads['ok' if status == 201 else 'failed'] += 1
+
+        def read():
+            paths = ['/api/datasets', f'/api/datasets/{dataset_id}/summary']
+            index = 0
+            while uploading.is_set():
+                start = time.perf_counter()
+                status, _ = _http(port, 'GET', paths[index % len(paths)])
+                elapsed = time.perf_counter() - start
+                index += 1
+                with lock:
+                    reads['ok' if status == 200 else 'failed'] += 1
+                    reads['latency'].append(elapsed)
+
+        readers = [threading.Thread(target=read) for _ in range(args.readers)]
+        uploaders = [threading.Thread(target=upload) for _ in range(args.uploaders)]
+        start = time.perf_counter()
+        for thread in readers + uploaders:
+            thread.start()
+        for thread in uploaders:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        uploading.clear()
+        for thread in readers:
+            thread.join()
+    finally:
+        server.terminate()
+        server.wait(timeout=60)
+
+    with open(log_path, 'rb') as log:
+        locked = log.read().count(b'database is locked')
+    latency = reads['latency'] or [0.0]
+    return {
+        'upload_rows_per_second': uploads['ok'] * args.rows / elapsed,
+        'uploads_failed': uploads['failed'],
+        'reads_per_second': (reads['ok'] + reads['failed']) / elapsed,
+        'read_p50_ms': float(np.percentile(latency, 50)) * 1000,
+        'read_p99_ms': float(np.percentile(latency, 99)) * 1000,
+        'reads_failed': reads['failed'],
+        'lock_errors': locked,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4, help="gunicorn workers")
+    parser.add_argument('--uploaders', type=int, default=4, help="concurrent upload threads")
+    parser.add_argument('--uploads', type=int, default=3, help="uploads per upload thread")
+    parser.add_argument('--readers', type=int, default=4, help="concurrent read threads")
+    parser.add_argument('--rows', type=int, default=100_000, help="rows per uploaded file")
+    parser.add_argument('--profiles', default=','.join(PROFILES))
+    args = parser.parse_args()
+
+    csv_path = os.path.join(tempfile.mkdtemp(), 'sales.csv')
+    with open(csv_path, 'wb') as fh:
+        fh.write(make_csv(args.rows))
+
+    print(f"{args.workers} workers, {args.uploaders}x{args.uploads} uploads of {args.rows:,} rows, "
+          f"{args.readers} readers")
+    print(f"{'profile':>8} {'upload rows/s':>14} {'failed':>7} {'reads/s':>8} {'p50 ms':>8} "
+          f"{'p99 ms':>9} {'failed':>7} {'locked':>7}")
+    for profile in args.profiles.split(','):
+        result = _run_profile(profile, csv_path, args)
+        print(f"{profile:>8} {result['upload_rows_per_second']:>14,.0f} "
+              f"{result['uploads_failed']:>7} {result['reads_per_second']:>8.1f} "
+              f"{result['read_p50_ms']:>8.1f} {result['read_p99_ms']:>9.1f} "
+              f"{result['reads_failed']:>7} {result['lock_errors']:>7}")
+
+
+if __name__ == '__main__':
+    main()
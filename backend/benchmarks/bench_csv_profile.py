@@ -0,0 +1,69 @@
+"""Compares default-dtype CSV parsing with the sampled ingest profile.
+
+Parses a wide, metadata-heavy synthetic upload chunk by chunk three ways: plain
+``pd.read_csv`` (the previous ingest path), the profile with the pandas parser,
+and the profile with the pyarrow engine. Each variant runs in its own
+interpreter and reports parse time (including the profile's sample and
+validation passes) and the largest in-memory size of a parsed chunk.
+
+Usage (from backend/):
+    python -m benchmarks.bench_csv_profile [rows] [extra_columns] [chunk_size]
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+VARIANTS = ('default', 'profile-c', 'profile-pyarrow')
+
+
+def _run_variant(variant, path, chunk_size):
+    import pandas as pd
+    from app.services.csv_profile import CsvProfile
+
+    chunk_bytes = 0
+    start = time.perf_counter()
+    with open(path, 'rb') as stream:
+        if variant == 'default':
+            chunks = pd.read_csv(stream, chunksize=chunk_size)
+        else:
+            profile = CsvProfile.sample(stream)
+            profile.validate(stream)
+            chunks = profile.iter_chunks(stream, chunk_size, engine=variant.split('-')[1])
+        for chunk in chunks:
+            chunk_bytes = max(chunk_bytes, int(chunk.memory_usage(deep=True).sum()))
+    return {
+        'seconds': time.perf_counter() - start,
+        'chunk_mb': chunk_bytes / 2 ** 20,
+    }
+
+
+def main(rows, extra_columns, chunk_size):
+    from .synthetic import make_csv
+    path = os.path.join(tempfile.mkdtemp(), 'wide.csv')
+    with open(path, 'wb') as fh:
+        fh.write(make_csv(rows, extra_columns=extra_columns))
+
+    print(f"{rows:,} rows, {4 + extra_columns} columns, {os.path.getsize(path) / 2 ** 20:.1f} MB, "
+          f"chunks of {chunk_size:,}")
+    print(f"{'variant':>16} {'parse s':>8} {'chunk MB':>9}")
+    for variant in VARIANTS:
+        output = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.bench_csv_profile', '--variant', variant, path,
+             str(chunk_size)],
+            cwd=BACKEND_DIR, check=True, stdout=subprocess.PIPE, text=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"{variant:>16} {result['seconds']:>8.2f} {result['chunk_mb']:>9.1f}")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--variant':
+        print(json.dumps(_run_variant(sys.argv[2], sys.argv[3], int(sys.argv[4]))))
+    else:
+        main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000,
+             int(sys.argv[2]) if len(sys.argv) > 2 else 20,
+             int(sys.argv[3]) if len(sys.argv) > 3 else 50_000)
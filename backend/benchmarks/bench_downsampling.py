@@ -0,0 +1,55 @@
+"""Cost and payload size of downsampling long chart-data time series.
+
+Builds daily series of increasing length (a random walk with weekly
+seasonality, shaped like the gap-filled ``line_chart``), then times
+``downsample_series`` with each method and reports the JSON payload size
+before and after.
+
+Usage (from backend/):
+    python -m benchmarks.bench_downsampling [max_points] [repeats]
+"""
+import json
+import sys
+import time
+from datetime import date, timedelta
+import numpy as np
+from app.services.downsampling import METHODS, downsample_series
+
+LENGTHS = [3_650, 36_500, 365_000]  # 10, 100 and 1,000 years of days
+
+
+def _series(length):
+    rng = np.random.default_rng(length)
+    seasonality = 50 * np.sin(np.arange(length) * 2 * np.pi / 7)
+    values = 1000 + rng.normal(size=length).cumsum() + seasonality
+    start = date(2000, 1, 1)
+    return [{"date": (start + timedelta(days=i)).isoformat(), "value": round(float(value), 2)}
+            for i, value in enumerate(values)]
+
+
+def _timed(call, repeats):
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        call()
+        samples.append(time.perf_counter() - start)
+    return float(np.percentile(samples, 50)) * 1000
+
+
+def main(max_points, repeats):
+    print(f"max_points={max_points}, p50 of {repeats} runs")
+    columns = ' '.join(f"{method + ' ms':>10} {method + ' KB':>10}" for method in METHODS)
+    print(f"{'points':>9} {'raw KB':>8} {columns}")
+    for length in LENGTHS:
+        series = _series(length)
+        row = f"{length:>9,} {len(json.dumps(series)) / 1024:>8.1f} "
+        for method in METHODS:
+            elapsed = _timed(lambda: downsample_series(series, max_points, method), repeats)
+            sampled, _ = downsample_series(series, max_points, method)
+            row += f"{elapsed:>10.2f} {len(json.dumps(sampled)) / 1024:>10.1f} "
+        print(row.rstrip())
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    main(int(args[0]) if args else 1000, int(args[1]) if len(args) > 1 else 10)
@@ -0,0 +1,92 @@
+"""Measures /records latency by page depth, compared with an OFFSET query.
+
+Seeds one dataset into a temporary SQLite database (or DATABASE_URL) and times
+the page at several depths through the Flask test client.
+
+Usage (from backend/):
+    python -m benchmarks.bench_records_pagination [rows]
+"""
+import os
+import sys
+import tempfile
+import time
+import statistics
+
+# Must be set before the app config is imported
+if 'DATABASE_URL' not in os.environ:
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+
+from sqlalchemy import select
+from app import create_app, db
+from app.models.dataset import Dataset
+from app.models.record import Record
+from app.services.bulk_loader import get_bulk_loader
+from app.services.dataset_service import DatasetService
+from app.services.record_service import encode_cursor
+from .synthetic import make_frame
+
+PAGE_SIZE = 100
+PAGES = [1, 10, 100, 1000, 10000]
+REPEATS = 20
+
+
+def _seed(rows):
+    dataset = Dataset(name='pagination', filename='bench.csv',
+                      column_names=['date', 'category', 'value', 'notes'])
+    db.session.add(dataset)
+    db.session.flush()
+    with get_bulk_loader(db.session.connection()) as loader:
+        for start in range(0, rows, 100_000):
+            frame = make_frame(min(100_000, rows - start), seed=start)
+            batch = DatasetService._parse_and_prepare_records(frame)
+            for row in batch:
+                row['dataset_id'] = dataset.id
+            loader.load(batch)
+    dataset.row_count = rows
+    db.session.commit()
+    return dataset.id
+
+
+def _median_ms(fn):
+    samples = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main(rows):
+    app = create_app('production')
+    with app.app_context():
+        db.create_all()
+        dataset_id = _seed(rows)
+        client = app.test_client()
+        url = f'/api/datasets/{dataset_id}/records?limit={PAGE_SIZE}'
+
+        print(f"{rows:,} rows, {PAGE_SIZE} per page")
+        print(f"{'page':>8} {'keyset ms':>10} {'offset ms':>10}")
+        for page in PAGES:
+            offset = (page - 1) * PAGE_SIZE
+            if offset >= rows:
+                break
+            cursor = ''
+            if offset:
+                last_id = db.session.execute(
+                    select(Record.id).where(Record.dataset_id == dataset_id)
+                    .order_by(Record.id).offset(offset - 1).limit(1)
+                ).scalar()
+                cursor = f'&cursor={encode_cursor([last_id])}'
+
+            keyset = _median_ms(lambda: client.get(url + cursor))
+            offset_query = select(
+                Record.id, Record.date, Record.category, Record.value, Record.metadata_json
+            ).where(
+                Record.dataset_id == dataset_id
+            ).order_by(Record.id).offset(offset).limit(PAGE_SIZE)
+            offset_ms = _median_ms(lambda: db.session.execute(offset_query).all())
+            print(f"{page:>8} {keyset:>10.2f} {offset_ms:>10.2f}")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,110 @@
+"""Serialization cost of the hot JSON responses, before and after the fast path.
+
+Builds the payloads of a large dataset listing, a dataset summary and a page
+of records, then times turning each into a response body two ways:
+
+- ``legacy``: the marshmallow schemas and Flask's standard library provider;
+- ``fast``: the schema-free ``dump_*`` serializers and the orjson provider.
+
+Also reports each body's size raw, gzipped and brotli-compressed at the
+levels ``app.compression`` uses.
+
+Usage (from backend/):
+    python -m benchmarks.bench_serialization [datasets] [page_size] [repeats]
+"""
+import gzip
+import sys
+import time
+from datetime import date, datetime, timedelta
+import numpy as np
+from flask.json.provider import DefaultJSONProvider
+from app import create_app
+from app.compression import BROTLI_QUALITY, GZIP_LEVEL, brotli
+from app.json_provider import OrjsonProvider
+from app.models.dataset import Dataset
+from app.schemas.dataset_schema import (DatasetSchema, DatasetSummarySchema, dump_dataset,
+                                        dump_summary)
+
+
+def _datasets(count):
+    start = datetime(2024, 1, 1)
+    return [
+        Dataset(id=i, name=f'dataset {i}', description='synthetic', filename=f'sales_{i}.csv',
+                upload_time=start + timedelta(minutes=i), row_count=100_000 + i,
+                column_names=['date', 'category', 'value', 'notes'], status=Dataset.STATUS_READY,
+                metadata_storage='json', dedupe_key=None,
+                created_at=start + timedelta(minutes=i), updated_at=start + timedelta(minutes=i))
+        for i in range(count)
+    ]
+
+
+def _summary():
+    return {
+        "total_records": 10_000_000, "total_value": 12_345_678.9, "avg_value": 1.23456789,
+        "min_value": 0.01, "max_value": 9999.99,
+        "categories": {f'cat-{i}': 1000 * i for i in range(50)},
+        "date_range": {"min": "2020-01-01", "max": "2024-12-31"},
+        "mode": "exact",
+    }
+
+
+def _records(count):
+    return {
+        "records": [
+            {"id": i, "date": (date(2024, 1, 1) + timedelta(days=i % 365)).isoformat(),
+             "category": f'cat-{i % 50}', "value": round(i * 1.37, 2),
+             "data": {"notes": f'row {i}', "region": 'north' if i % 2 else 'south'}}
+            for i in range(count)
+        ],
+        "next_cursor": "eyJpZCI6IDEwMDB9", "limit": count,
+    }
+
+
+def _timed(call, repeats):
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        call()
+        samples.append(time.perf_counter() - start)
+    return float(np.percentile(samples, 50)) * 1000
+
+
+def main(datasets, page_size, repeats):
+    app = create_app('production')
+    legacy, fast = DefaultJSONProvider(app), OrjsonProvider(app)
+    listing, summary, page = _datasets(datasets), _summary(), _records(page_size)
+    datasets_schema, summary_schema = DatasetSchema(many=True), DatasetSummarySchema()
+
+    cases = {
+        f'listing ({datasets:,})': (
+            lambda: legacy.dumps({"datasets": datasets_schema.dump(listing),
+                                  "total": len(listing)}),
+            lambda: fast.dumps({"datasets": [dump_dataset(d) for d in listing],
+                                "total": len(listing)}),
+        ),
+        'summary': (
+            lambda: legacy.dumps(summary_schema.dump(summary)),
+            lambda: fast.dumps(dump_summary(summary)),
+        ),
+        f'records ({page_size:,})': (
+            lambda: legacy.dumps(page),
+            lambda: fast.dumps(page),
+        ),
+    }
+
+    print(f"p50 of {repeats} runs")
+    print(f"{'payload':>18} {'legacy ms':>10} {'fast ms':>8} {'raw KB':>8} {'gzip KB':>8} "
+          f"{'br KB':>7}")
+    for name, (slow_call, fast_call) in cases.items():
+        body = fast_call().encode()
+        gzipped = len(gzip.compress(body, compresslevel=GZIP_LEVEL)) / 1024
+        compressed = (len(brotli.compress(body, quality=BROTLI_QUALITY)) / 1024
+                      if brotli else float('nan'))
+        print(f"{name:>18} {_timed(slow_call, repeats):>10.2f} {_timed(fast_call, repeats):>8.2f} "
+              f"{len(body) / 1024:>8.1f} {gzipped:>8.1f} {compressed:>7.1f}")
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    main(int(args[0]) if args else 2000, int(args[1]) if len(args) > 1 else 1000,
+         int(args[2]) if len(args) > 2 else 20)
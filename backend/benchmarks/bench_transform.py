@@ -0,0 +1,58 @@
+"""Compares the row-by-row and vectorized CSV-to-record transforms.
+
+Usage (from backend/):
+    python -m benchmarks.bench_transform [rows ...]
+"""
+import sys
+import time
+import pandas as pd
+
+from app.models.record import Record
+from app.services.dataset_service import DatasetService
+from .synthetic import make_frame
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+
+
+def legacy_parse_and_prepare_records(df):
+    """The original iterrows-based transform, kept here as the comparison baseline."""
+    records = []
+    standard_cols = {'date', 'category', 'value'}
+    meta_cols = [col for col in df.columns if col not in standard_cols]
+
+    for _, row in df.iterrows():
+        record_date = None
+        if 'date' in row and pd.notnull(row['date']):
+            try:
+                record_date = pd.to_datetime(row['date']).date()
+            except Exception:
+                pass
+
+        meta = {col: row[col] for col in meta_cols}
+        records.append(Record(
+            date=record_date,
+            category=str(row.get('category', 'Uncategorized')),
+            value=float(row.get('value', 0)),
+            metadata_json=meta
+        ))
+    return records
+
+
+def _time(fn, df):
+    start = time.perf_counter()
+    fn(df)
+    return time.perf_counter() - start
+
+
+def main(sizes):
+    print(f"{'rows':>10} {'legacy rows/s':>15} {'vectorized rows/s':>18} {'speedup':>8}")
+    for rows in sizes:
+        df = make_frame(rows)
+        legacy = _time(legacy_parse_and_prepare_records, df)
+        vectorized = _time(DatasetService._parse_and_prepare_records, df)
+        print(f"{rows:>10} {rows / legacy:>15,.0f} {rows / vectorized:>18,.0f} "
+              f"{legacy / vectorized:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
@@ -0,0 +1,42 @@
+"""Synthetic CSV generation shaped like the bundled sales_*.csv files."""
+import io
+import numpy as np
+import pandas as pd
+
+BUSINESS_LINES = {
+    'electronics': ['Smartphones', 'Laptops', 'Tablets', 'Accessories', 'Audio'],
+    'fashion': ["Women's Wear", "Men's Wear", 'Footwear', 'Accessories', 'Kids'],
+    'groceries': ['Fresh Produce', 'Dairy', 'Bakery', 'Beverages', 'Frozen'],
+    'services': ['Consulting', 'Development', 'Design', 'Support', 'Training'],
+}
+
+NOTES = ['New Year sale', 'Weekly stock', 'Seasonal sale', 'Restock', 'Promo', 'Clearance']
+
+
+def make_frame(rows, line='electronics', seed=0, extra_columns=0):
+    """Builds a DataFrame with date/category/value/notes columns.
+
+    ``extra_columns`` appends additional metadata columns to mimic wider,
+    metadata-heavy uploads.
+    """
+    rng = np.random.default_rng(seed)
+    start = np.datetime64('2020-01-01')
+    df = pd.DataFrame({
+        'date': (start + rng.integers(0, 5 * 365, rows).astype('timedelta64[D]')).astype(str),
+        'category': rng.choice(BUSINESS_LINES[line], rows),
+        'value': np.round(rng.uniform(50, 9000, rows), 2),
+        'notes': rng.choice(NOTES, rows),
+    })
+    for i in range(extra_columns):
+        if i % 2:
+            df[f'attr_{i}'] = rng.integers(0, 1000, rows)
+        else:
+            df[f'attr_{i}'] = rng.choice(NOTES, rows)
+    return df
+
+
+def make_csv(rows, line='electronics', seed=0, extra_columns=0):
+    """Returns the synthetic frame serialized as CSV bytes."""
+    buf = io.StringIO()
+    make_frame(rows, line, seed, extra_columns).to_csv(buf, index=False, float_format='%.2f')
+    return buf.getvalue().encode('utf-8')
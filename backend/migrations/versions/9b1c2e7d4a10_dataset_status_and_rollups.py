@@ -0,0 +1,63 @@
+"""dataset status and rollup tables
+
+Revision ID: 9b1c2e7d4a10
+Revises: 6040de873012
+Create Date: 2026-10-18 00:52:40.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9b1c2e7d4a10'
+down_revision = '6040de873012'
+branch_labels = None
+depends_on = None
+
+
+def _rollup_columns():
+    return [
+        sa.Column('record_count', sa.Integer(), nullable=False),
+        sa.Column('value_count', sa.Integer(), nullable=False),
+        sa.Column('total_value', sa.Numeric(precision=20, scale=2), nullable=True),
+        sa.Column('min_value', sa.Numeric(precision=15, scale=2), nullable=True),
+        sa.Column('max_value', sa.Numeric(precision=15, scale=2), nullable=True),
+        sa.ForeignKeyConstraint(['dataset_id'], ['datasets.id'], ondelete='CASCADE'),
+    ]
+
+
+def upgrade():
+    with op.batch_alter_table('datasets', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('status', sa.String(length=20), nullable=False,
+                                      server_default='ready'))
+        batch_op.create_index(batch_op.f('ix_datasets_status'), ['status'], unique=False)
+
+    op.create_table('category_rollups',
+    sa.Column('dataset_id', sa.Integer(), nullable=False),
+    sa.Column('category', sa.String(length=255), nullable=False),
+    *_rollup_columns(),
+    sa.PrimaryKeyConstraint('dataset_id', 'category')
+    )
+    op.create_table('daily_rollups',
+    sa.Column('dataset_id', sa.Integer(), nullable=False),
+    sa.Column('date', sa.Date(), nullable=False),
+    *_rollup_columns(),
+    sa.PrimaryKeyConstraint('dataset_id', 'date')
+    )
+    op.create_table('category_month_rollups',
+    sa.Column('dataset_id', sa.Integer(), nullable=False),
+    sa.Column('category', sa.String(length=255), nullable=False),
+    sa.Column('month', sa.Date(), nullable=False),
+    *_rollup_columns(),
+    sa.PrimaryKeyConstraint('dataset_id', 'category', 'month')
+    )
+
+
+def downgrade():
+    op.drop_table('category_month_rollups')
+    op.drop_table('daily_rollups')
+    op.drop_table('category_rollups')
+    with op.batch_alter_table('datasets', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_datasets_status'))
+        batch_op.drop_column('status')
@@ -0,0 +1,37 @@
+"""dataset dedupe key and record row hashes for appends
+
+Revision ID: a4d9e1c7b582
+Revises: f2b6d8e4a7c3
+Create Date: 2026-10-18 05:02:41.918264
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4d9e1c7b582'
+down_revision = 'f2b6d8e4a7c3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('datasets', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('dedupe_key', sa.JSON(), nullable=True))
+
+    with op.batch_alter_table('records', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('row_hash', sa.BigInteger(), nullable=True))
+        batch_op.create_index('ix_records_dataset_row_hash', ['dataset_id', 'row_hash'],
+                              unique=False,
+                              postgresql_where=sa.text('row_hash IS NOT NULL'),
+                              sqlite_where=sa.text('row_hash IS NOT NULL'))
+
+
+def downgrade():
+    with op.batch_alter_table('records', schema=None) as batch_op:
+        batch_op.drop_index('ix_records_dataset_row_hash')
+        batch_op.drop_column('row_hash')
+
+    with op.batch_alter_table('datasets', schema=None) as batch_op:
+        batch_op.drop_column('dedupe_key')
@@ -0,0 +1,26 @@
+"""dataset metadata column types
+
+Revision ID: b8f3d2a6c914
+Revises: a4d9e1c7b582
+Create Date: 2026-10-18 14:12:07.302518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8f3d2a6c914'
+down_revision = 'a4d9e1c7b582'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('datasets', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('column_types', sa.JSON(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('datasets', schema=None) as batch_op:
+        batch_op.drop_column('column_types')
@@ -0,0 +1,44 @@
+"""ingest jobs table
+
+Revision ID: c1e7a9d3f285
+Revises: b8f3d2a6c914
+Create Date: 2026-10-18 14:48:33.120946
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c1e7a9d3f285'
+down_revision = 'b8f3d2a6c914'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('ingest_jobs',
+    sa.Column('id', sa.String(length=32), nullable=False),
+    sa.Column('dataset_id', sa.Integer(), nullable=True),
+    sa.Column('filename', sa.String(length=255), nullable=False),
+    sa.Column('state', sa.String(length=20), nullable=False),
+    sa.Column('rows_processed', sa.Integer(), nullable=False),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('ingest_jobs', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_ingest_jobs_created_at'), ['created_at'], unique=False)
+        batch_op.create_index(batch_op.f('ix_ingest_jobs_dataset_id'), ['dataset_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_ingest_jobs_state'), ['state'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('ingest_jobs', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_ingest_jobs_state'))
+        batch_op.drop_index(batch_op.f('ix_ingest_jobs_dataset_id'))
+        batch_op.drop_index(batch_op.f('ix_ingest_jobs_created_at'))
+
+    op.drop_table('ingest_jobs')
@@ -0,0 +1,31 @@
+"""composite indexes on records for dataset-scoped aggregation
+
+Revision ID: c3f8a91e5b27
+Revises: 9b1c2e7d4a10
+Create Date: 2026-10-18 01:03:17.402655
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3f8a91e5b27'
+down_revision = '9b1c2e7d4a10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # postgresql_include is ignored by other dialects, so SQLite gets plain composite indexes
+    with op.batch_alter_table('records', schema=None) as batch_op:
+        batch_op.create_index('ix_records_dataset_category', ['dataset_id', 'category'],
+                              unique=False, postgresql_include=['value'])
+        batch_op.create_index('ix_records_dataset_date', ['dataset_id', 'date'],
+                              unique=False, postgresql_include=['value'])
+
+
+def downgrade():
+    with op.batch_alter_table('records', schema=None) as batch_op:
+        batch_op.drop_index('ix_records_dataset_date', postgresql_include=['value'])
+        batch_op.drop_index('ix_records_dataset_category', postgresql_include=['value'])
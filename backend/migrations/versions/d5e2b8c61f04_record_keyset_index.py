@@ -0,0 +1,26 @@
+"""keyset pagination index on records
+
+Revision ID: d5e2b8c61f04
+Revises: c3f8a91e5b27
+Create Date: 2026-10-18 02:10:44.907316
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5e2b8c61f04'
+down_revision = 'c3f8a91e5b27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('records', schema=None) as batch_op:
+        batch_op.create_index('ix_records_dataset_id', ['dataset_id', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('records', schema=None) as batch_op:
+        batch_op.drop_index('ix_records_dataset_id')
@@ -0,0 +1,33 @@
+"""columnar metadata storage
+
+Revision ID: e7a4c2d9f318
+Revises: d5e2b8c61f04
+Create Date: 2026-10-18 03:02:17.514920
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7a4c2d9f318'
+down_revision = 'd5e2b8c61f04'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('datasets', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('metadata_storage', sa.String(length=10), nullable=False,
+                                      server_default='json'))
+
+    with op.batch_alter_table('records', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('row_number', sa.Integer(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('records', schema=None) as batch_op:
+        batch_op.drop_column('row_number')
+
+    with op.batch_alter_table('datasets', schema=None) as batch_op:
+        batch_op.drop_column('metadata_storage')
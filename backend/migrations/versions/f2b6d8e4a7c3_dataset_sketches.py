@@ -0,0 +1,37 @@
+"""dataset sketches for approximate analytics
+
+Revision ID: f2b6d8e4a7c3
+Revises: e7a4c2d9f318
+Create Date: 2026-10-18 04:11:52.337106
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2b6d8e4a7c3'
+down_revision = 'e7a4c2d9f318'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('dataset_sketches',
+    sa.Column('dataset_id', sa.Integer(), nullable=False),
+    sa.Column('record_count', sa.Integer(), nullable=False),
+    sa.Column('value_count', sa.Integer(), nullable=False),
+    sa.Column('total_value', sa.Numeric(precision=20, scale=2), nullable=True),
+    sa.Column('min_date', sa.Date(), nullable=True),
+    sa.Column('max_date', sa.Date(), nullable=True),
+    sa.Column('category_hll', sa.JSON(), nullable=False),
+    sa.Column('value_kll', sa.JSON(), nullable=False),
+    sa.Column('sample', sa.JSON(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['dataset_id'], ['datasets.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('dataset_id')
+    )
+
+
+def downgrade():
+    op.drop_table('dataset_sketches')
@@ -0,0 +1,108 @@
+import pytest
+import io
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app, db
+
+
+@pytest.fixture
+def app():
+    """Create and configure a test app instance."""
+    app = create_app('testing')
+    app.config['WTF_CSRF_ENABLED'] = False
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    """Create a test client."""
+    return app.test_client()
+
+
+@pytest.fixture
+def sample_csv():
+    """Create a sample CSV file for testing."""
+    csv_content = """date,category,value
+2024-01-15,Electronics,1000
+2024-01-20,Clothing,500
+2024-02-05,Electronics,800
+2024-02-14,Groceries,200
+2024-03-10,Clothing,600
+"""
+    return (io.BytesIO(csv_content.encode('utf-8')), 'test_data.csv')
+
+
+def _upload_csv(client, content, filename='sales.csv', **form):
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    file = content if isinstance(content, tuple) else (io.BytesIO(content), filename)
+    response = client.post(
+        '/api/upload',
+        data={'file': file, 'name': 'Test', **form},
+        content_type='multipart/form-data'
+    )
+    assert response.status_code == 201, response.get_json()
+    return response.get_json()
+
+
+@pytest.fixture
+def upload_csv():
+    """Upload CSV text, bytes or a ``(file, filename)`` pair and return the created dataset."""
+    return _upload_csv
+
+
+@pytest.fixture
+def records_csv():
+    """Create CSV content with two metadata columns for record paging."""
+    return "date,category,value,notes,region\n" + "".join(
+        f"2024-01-{day:02d},{'AB'[day % 2]},{day}.5,note {day},{'NS'[day % 2]}\n"
+        for day in range(1, 26)
+    )
+
+
+@pytest.fixture
+def export_csv():
+    """Create CSV content with a quoted field and an empty one, for export round trips."""
+    return (
+        "date,category,value,notes,units\n"
+        "2024-01-05,Smartphones,4500.00,New Year sale,3\n"
+        "2024-01-18,Laptops,3200.00,\"Back to work, promo\",1\n"
+        "2024-02-02,Tablets,1250.50,,2\n"
+    )
+
+
+@pytest.fixture
+def columnar_csv():
+    """Create CSV content whose numeric 'units' column turns to text after eight rows."""
+    return "date,category,value,notes,units\n" + "".join(
+        f"2024-01-{day:02d},{'AB'[day % 2]},{day}.50,note {day},{day if day < 8 else 'many'}\n"
+        for day in range(1, 11)
+    )
+
+
+@pytest.fixture
+def aggregate_csv():
+    """Create CSV content spread over three months with Promo and Restock notes."""
+    return "date,category,value,notes,units\n" + "".join(
+        f"2024-{1 + day % 3:02d}-{day:02d},{'AB'[day % 2]},{day}.00,"
+        f"{'Promo' if day % 3 else 'Restock'},{day % 4}\n"
+        for day in range(1, 13)
+    )
+
+
+@pytest.fixture
+def replica_csv():
+    """Create 61 rows over three categories, with missing values and one missing date."""
+    return "date,category,value\n" + "".join(
+        f"2024-{1 + i % 5:02d}-{1 + i % 28:02d},{'ABC'[i % 3]},"
+        f"{'' if i % 17 == 0 else f'{i * 1.25:.2f}'}\n"
+        for i in range(60)
+    ) + ",A,5.00\n"
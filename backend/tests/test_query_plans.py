@@ -0,0 +1,93 @@
+import pytest
+import os
+import re
+from datetime import date, timedelta
+
+import numpy as np
+from sqlalchemy import event, insert
+
+from app import db
+from app.models.dataset import Dataset
+from app.models.record import Record
+from app.services.analytics_service import AnalyticsService
+from app.services.rollup_service import RollupService
+
+# Set EXPLAIN_SEED_ROWS=2000000 (or more) to check plans on a multi-million-row database.
+SEED_ROWS = int(os.environ.get('EXPLAIN_SEED_ROWS', 50000))
+SEED_DATASETS = 10
+FULL_SCAN = {
+    'sqlite': re.compile(r'^SCAN (records|\w+_rollups)\b'),
+    'postgresql': re.compile(r'Seq Scan on (records|\w+_rollups)\b'),
+}
+
+
+@pytest.fixture
+def seeded(app):
+    """Seeds several datasets into one records table and returns the id of one of them."""
+    rng = np.random.default_rng(42)
+    start = date(2020, 1, 1)
+    dataset_ids = []
+    for i in range(SEED_DATASETS):
+        dataset = Dataset(name=f'seed-{i}', filename='seed.csv',
+                          row_count=SEED_ROWS // SEED_DATASETS)
+        db.session.add(dataset)
+        db.session.flush()
+        dataset_ids.append(dataset.id)
+
+    rows_per_dataset = SEED_ROWS // SEED_DATASETS
+    for dataset_id in dataset_ids:
+        offsets = rng.integers(0, 1500, rows_per_dataset).tolist()
+        categories = rng.integers(0, 20, rows_per_dataset).tolist()
+        values = np.round(rng.uniform(1, 1000, rows_per_dataset), 2).tolist()
+        db.session.execute(insert(Record.__table__), [
+            {'dataset_id': dataset_id, 'date': start + timedelta(days=o),
+             'category': f'cat-{c}', 'value': v, 'metadata_json': {}}
+            for o, c, v in zip(offsets, categories, values)
+        ])
+    db.session.commit()
+
+    for dataset_id in dataset_ids:
+        RollupService.rebuild(dataset_id)
+    db.session.execute(db.text('ANALYZE'))
+    db.session.commit()
+    return dataset_ids[SEED_DATASETS // 2]
+
+
+def _captured_selects(fn, *args):
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            statements.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', capture)
+    try:
+        fn(*args)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', capture)
+    return statements
+
+
+def _plan(statement, parameters):
+    connection = db.session.connection()
+    prefix = 'EXPLAIN QUERY PLAN' if connection.dialect.name == 'sqlite' else 'EXPLAIN'
+    rows = connection.exec_driver_sql(f"{prefix} {statement}", parameters).fetchall()
+    return [str(row[-1]) for row in rows]
+
+
+@pytest.mark.parametrize('query', [
+    AnalyticsService.get_summary_statistics,
+    AnalyticsService.get_chart_data,
+    AnalyticsService._scan_summary_statistics,
+    AnalyticsService._scan_chart_data,
+])
+def test_analytics_queries_use_indexes(app, seeded, query):
+    """Every dataset-scoped analytics query is answered from an index, never a full table scan."""
+    full_scan = FULL_SCAN[db.engine.dialect.name]
+    statements = _captured_selects(query, seeded)
+    assert statements
+
+    for statement, parameters in statements:
+        plan = _plan(statement, parameters)
+        scans = [line for line in plan if full_scan.search(line.strip())]
+        assert not scans, f"Full scan in plan for:\n{statement}\n" + '\n'.join(plan)
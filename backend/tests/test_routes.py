@@ -2,46 +2,14 @@ import pytest
 import io
 import sys
 import os
+import time
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from app import create_app, db
+from app import db
 from app.models.dataset import Dataset
 from app.models.record import Record
-
-
-@pytest.fixture
-def app():
-    """Create and configure a test app instance."""
-    app = create_app('development')
-    app.config['TESTING'] = True
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
-    app.config['WTF_CSRF_ENABLED'] = False
-
-    with app.app_context():
-        db.create_all()
-        yield app
-        db.session.remove()
-        db.drop_all()
-
-
-@pytest.fixture
-def client(app):
-    """Create a test client."""
-    return app.test_client()
-
-
-@pytest.fixture
-def sample_csv():
-    """Create a sample CSV file for testing."""
-    csv_content = """date,category,value
-2024-01-15,Electronics,1000
-2024-01-20,Clothing,500
-2024-02-05,Electronics,800
-2024-02-14,Groceries,200
-2024-03-10,Clothing,600
-"""
-    return (io.BytesIO(csv_content.encode('utf-8')), 'test_data.csv')
+from app.services.dataset_service import DatasetService
 
 
 class TestDatasetRoutes:
@@ -138,6 +106,196 @@ class TestDatasetRoutes:
         assert get_response.status_code == 404
 
 
+class TestUploadJobs:
+    """Test suite for background ingestion jobs."""
+
+    def _wait_for_job(self, client, status_url, timeout=10):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            job = client.get(status_url).get_json()
+            if job['state'] in ('succeeded', 'failed'):
+                return job
+            time.sleep(0.05)
+        raise AssertionError("Upload job did not finish in time")
+
+    def test_async_upload_returns_job(self, app, client, sample_csv, tmp_path):
+        """Test POST /api/upload?mode=async returns 202 and completes in the background."""
+        app.config['UPLOAD_FOLDER'] = str(tmp_path)
+        response = client.post(
+            '/api/upload?mode=async',
+            data={'file': sample_csv, 'name': 'Async'},
+            content_type='multipart/form-data'
+        )
+        assert response.status_code == 202
+        data = response.get_json()
+        assert data['state'] in ('queued', 'running', 'succeeded')
+        assert response.headers['Location'] == data['status_url']
+
+        job = self._wait_for_job(client, data['status_url'])
+        assert job['state'] == 'succeeded'
+        assert job['rows_processed'] == 5
+        assert job['error'] is None
+
+        dataset = client.get(f"/api/datasets/{data['dataset_id']}").get_json()
+        assert dataset['status'] == 'ready'
+        assert dataset['row_count'] == 5
+
+    def test_async_upload_failure_reports_error(self, app, client, tmp_path):
+        """Test a failed background ingestion reports its error and leaves no dataset."""
+        app.config['UPLOAD_FOLDER'] = str(tmp_path)
+        response = client.post(
+            '/api/upload?mode=async',
+            data={'file': (io.BytesIO(b"date,value\n2024-01-01,1\n"), 'bad.csv'), 'name': 'Bad'},
+            content_type='multipart/form-data'
+        )
+        job = self._wait_for_job(client, response.get_json()['status_url'])
+        assert job['state'] == 'failed'
+        assert 'category' in job['error']
+        assert client.get(f"/api/datasets/{job['dataset_id']}").status_code == 404
+
+    def test_pending_dataset_hidden_from_listing(self, client):
+        """Test datasets still being ingested are not listed."""
+        DatasetService.create_pending_dataset('pending.csv', 'Pending', '')
+        data = client.get('/api/datasets').get_json()
+        assert data['datasets'] == []
+
+    def test_job_state_read_from_database(self, app, client, sample_csv, tmp_path):
+        """Test job status is stored in the database, so any worker can answer a poll."""
+        from app.models.ingest_job import IngestJob
+        from app.services.job_service import JobService
+        app.config['UPLOAD_FOLDER'] = str(tmp_path)
+        response = client.post(
+            '/api/upload?mode=async',
+            data={'file': sample_csv, 'name': 'Async'},
+            content_type='multipart/form-data'
+        )
+        job_id = response.get_json()['job_id']
+        self._wait_for_job(client, response.get_json()['status_url'])
+        assert job_id not in JobService._progress
+
+        db.session.expire_all()
+        job = db.session.get(IngestJob, job_id)
+        assert (job.state, job.rows_processed, job.error) == ('succeeded', 5, None)
+        assert job.started_at <= job.finished_at
+
+        # A job accepted by another worker process is only known through its row
+        db.session.add(IngestJob(id='other-worker', filename='other.csv', state=IngestJob.RUNNING))
+        db.session.commit()
+        assert client.get('/api/upload/jobs/other-worker').get_json()['state'] == 'running'
+
+    def test_failed_spool_discards_pending_dataset(self, app, client, sample_csv, tmp_path,
+                                                   monkeypatch):
+        """Test an upload that cannot be written to disk leaves no pending dataset behind."""
+        from werkzeug.datastructures import FileStorage
+        app.config['UPLOAD_FOLDER'] = str(tmp_path)
+
+        def fail(self, dst, buffer_size=16384):
+            raise OSError("No space left on device")
+
+        monkeypatch.setattr(FileStorage, 'save', fail)
+        response = client.post(
+            '/api/upload?mode=async',
+            data={'file': sample_csv, 'name': 'Async'},
+            content_type='multipart/form-data'
+        )
+        assert response.status_code == 500
+        assert Dataset.query.count() == 0
+
+    def test_sweep_cli_discards_interrupted_uploads(self, app):
+        """Test `flask datasets sweep` fails stale jobs and purges their pending datasets only."""
+        from datetime import datetime, timedelta
+        from app.models.ingest_job import IngestJob
+        stale = DatasetService.create_pending_dataset('stale.csv', 'Stale', '')
+        fresh = DatasetService.create_pending_dataset('fresh.csv', 'Fresh', '')
+        stale.created_at = datetime.utcnow() - timedelta(hours=2)
+        db.session.add_all([
+            IngestJob(id='stale', dataset_id=stale.id, filename='stale.csv',
+                      state=IngestJob.RUNNING, created_at=stale.created_at),
+            IngestJob(id='fresh', dataset_id=fresh.id, filename='fresh.csv',
+                      state=IngestJob.RUNNING),
+        ])
+        db.session.commit()
+        stale_id, fresh_id = stale.id, fresh.id
+
+        result = app.test_cli_runner().invoke(args=['datasets', 'sweep', '--older-than', '3600'])
+        assert result.exit_code == 0
+        assert 'Discarded 1 interrupted uploads' in result.output
+        db.session.expire_all()
+        assert db.session.get(Dataset, stale_id) is None
+        assert db.session.get(Dataset, fresh_id).status == Dataset.STATUS_PROCESSING
+        assert db.session.get(IngestJob, 'stale').state == IngestJob.FAILED
+        assert db.session.get(IngestJob, 'fresh').state == IngestJob.RUNNING
+
+    def test_unknown_job_returns_404(self, client):
+        """Test GET /api/upload/jobs/<id> returns 404 for unknown jobs."""
+        assert client.get('/api/upload/jobs/missing').status_code == 404
+
+
+class TestDatasetDeletion:
+    """Test suite for batched, soft and background dataset deletion."""
+
+    def test_delete_purges_records_in_batches(self, app, client, sample_csv, upload_csv):
+        """Test records are removed by several set-based DELETEs without loading them."""
+        from app.models.sketch import DatasetSketch
+        app.config['DELETE_BATCH_SIZE'] = 2
+        dataset_id = upload_csv(client, sample_csv)['id']
+        kept_id = upload_csv(client, "date,category,value\n2024-01-01,A,1\n")['id']
+
+        statements = []
+        from sqlalchemy import event
+        def capture(conn, cursor, statement, *args):
+            statements.append(statement)
+        event.listen(db.engine, 'before_cursor_execute', capture)
+        try:
+            response = client.delete(f'/api/datasets/{dataset_id}')
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', capture)
+
+        assert response.status_code == 200
+        assert sum(statement.startswith('DELETE FROM records') for statement in statements) >= 3
+        assert not any(statement.startswith('SELECT records.') for statement in statements)
+        assert Record.query.filter_by(dataset_id=dataset_id).count() == 0
+        assert db.session.get(DatasetSketch, dataset_id) is None
+        assert Record.query.filter_by(dataset_id=kept_id).count() == 1
+
+    def test_async_delete_hides_dataset_then_purges(self, client, sample_csv, upload_csv):
+        """Test DELETE ?mode=async returns 202, hides the dataset at once and purges it."""
+        dataset_id = upload_csv(client, sample_csv)['id']
+        response = client.delete(f'/api/datasets/{dataset_id}?mode=async')
+        assert response.status_code == 202
+        assert client.get(f'/api/datasets/{dataset_id}').status_code == 404
+        assert client.get('/api/datasets').get_json()['total'] == 0
+
+        deadline = time.time() + 10
+        while db.session.get(Dataset, dataset_id) is not None:
+            assert time.time() < deadline, "Dataset was not purged in time"
+            db.session.expire_all()
+            time.sleep(0.05)
+        assert Record.query.filter_by(dataset_id=dataset_id).count() == 0
+
+    def test_purge_cli_finishes_interrupted_deletes(self, app, client, sample_csv, upload_csv):
+        """Test `flask datasets purge` removes datasets left in the deleting state."""
+        dataset_id = upload_csv(client, sample_csv)['id']
+        DatasetService.mark_deleting(dataset_id)
+        assert client.delete(f'/api/datasets/{dataset_id}').status_code == 404
+
+        result = app.test_cli_runner().invoke(args=['datasets', 'purge'])
+        assert result.exit_code == 0
+        assert db.session.get(Dataset, dataset_id) is None
+        assert Record.query.filter_by(dataset_id=dataset_id).count() == 0
+
+    def test_partitioning_requires_postgres(self, app, client, sample_csv, upload_csv):
+        """Test SQLite keeps the shared records table and refuses to partition it."""
+        from app.services.partition_service import PartitionService
+        dataset_id = upload_csv(client, sample_csv)['id']
+        assert PartitionService.is_partitioned() is False
+        assert PartitionService.create_partition(dataset_id) is False
+
+        result = app.test_cli_runner().invoke(args=['datasets', 'partition'])
+        assert result.exit_code != 0
+        assert 'PostgreSQL' in result.output
+
+
 class TestAnalyticsRoutes:
     """Test suite for analytics API endpoints."""
 
@@ -188,6 +346,1146 @@ class TestAnalyticsRoutes:
         assert 'line_chart' in data
         assert 'pie_chart' in data
 
+    def test_chart_data_granularity(self, client, sample_csv, upload_csv):
+        """Test chart-data buckets the time series in the database at each granularity."""
+        dataset_id = upload_csv(client, sample_csv)['id']
+
+        def line(granularity):
+            response = client.get(
+                f'/api/datasets/{dataset_id}/chart-data?granularity={granularity}'
+            )
+            assert response.status_code == 200
+            return [(point['date'], point['value'])
+                    for point in response.get_json()['line_chart']]
+
+        assert line('month') == [('2024-01', 1500.0), ('2024-02', 1000.0), ('2024-03', 600.0)]
+        assert line('quarter') == [('2024-Q1', 3100.0)]
+        assert line('year') == [('2024', 3100.0)]
+        weekly = line('week')
+        assert weekly[0] == ('2024-01-15', 1500.0)
+        assert weekly[-1] == ('2024-03-04', 600.0)
+        assert sum(value for _, value in weekly) == 3100.0
+        assert len(line('day')) == 56
+
+    def test_chart_data_fills_empty_months(self, client, upload_csv):
+        """Test months without records are reported with a zero value."""
+        csv_content = b"date,category,value\n2024-01-10,A,10\n2024-04-02,B,5\n"
+        dataset_id = upload_csv(client, csv_content)['id']
+        data = client.get(f'/api/datasets/{dataset_id}/chart-data').get_json()
+        assert data['line_chart'] == [
+            {'date': '2024-01', 'value': 10.0},
+            {'date': '2024-02', 'value': 0.0},
+            {'date': '2024-03', 'value': 0.0},
+            {'date': '2024-04', 'value': 5.0},
+        ]
+
+    def test_chart_data_invalid_granularity(self, client, sample_csv, upload_csv):
+        """Test an unknown granularity is rejected with 400."""
+        dataset_id = upload_csv(client, sample_csv)['id']
+        response = client.get(f'/api/datasets/{dataset_id}/chart-data?granularity=hour')
+        assert response.status_code == 400
+        assert 'granularity' in response.get_json()['error']
+
+    def test_chart_data_downsampling(self, client, sample_csv, upload_csv):
+        """Test max_points bounds the series with LTTB or min/max buckets and reports the method."""
+        dataset_id = upload_csv(client, sample_csv)['id']
+        url = f'/api/datasets/{dataset_id}/chart-data?granularity=day'
+        full = client.get(url).get_json()
+        assert 'downsampling' not in full
+
+        data = client.get(f'{url}&max_points=10').get_json()
+        assert data['downsampling'] == {'method': 'lttb', 'max_points': 10, 'original_points': 56,
+                                        'returned_points': 10}
+        assert len(data['line_chart']) == 10
+        assert data['line_chart'][0] == full['line_chart'][0]
+        assert data['line_chart'][-1] == full['line_chart'][-1]
+        assert data['bar_chart'] == full['bar_chart']
+
+        data = client.get(f'{url}&max_points=10&downsample=minmax').get_json()
+        assert data['downsampling']['method'] == 'minmax'
+        values = [point['value'] for point in data['line_chart']]
+        assert len(values) <= 10
+        assert max(values) == max(point['value'] for point in full['line_chart'])
+        assert all(point in full['line_chart'] for point in data['line_chart'])
+
+        data = client.get(f'{url}&max_points=100').get_json()
+        assert data['downsampling']['method'] == 'none'
+        assert data['line_chart'] == full['line_chart']
+
+    def test_chart_data_invalid_downsampling(self, client, sample_csv, upload_csv):
+        """Test an invalid max_points or downsampling method is rejected with 400."""
+        dataset_id = upload_csv(client, sample_csv)['id']
+        errors = {
+            'max_points=2': 'max_points must be at least 4',
+            'max_points=many': 'max_points must be an integer',
+            'max_points=10&downsample=average': "Invalid downsampling method 'average'",
+            'downsample=average': "Invalid downsampling method 'average'",
+        }
+        for query, error in errors.items():
+            response = client.get(f'/api/datasets/{dataset_id}/chart-data?{query}')
+            assert response.status_code == 400
+            assert response.get_json()['error'].startswith(error)
+
+    def test_dashboard_matches_separate_endpoints(self, client, sample_csv, upload_csv):
+        """Test /dashboard combines summary and chart data consistently."""
+        dataset_id = upload_csv(client, sample_csv)['id']
+        summary = client.get(f'/api/datasets/{dataset_id}/summary').get_json()
+        chart = client.get(f'/api/datasets/{dataset_id}/chart-data').get_json()
+
+        response = client.get(f'/api/datasets/{dataset_id}/dashboard')
+        assert response.status_code == 200
+        data = response.get_json()
+        assert data['summary'] == summary
+        assert data['category_breakdown'] == chart['bar_chart']
+        assert data['time_series'] == chart['line_chart']
+        assert data['granularity'] == 'month'
+
+    def test_dashboard_single_scan_without_rollups(self, client, sample_csv, upload_csv):
+        """Test datasets without rollups are answered by one grouped query over records."""
+        from sqlalchemy import event
+        from app.services.analytics_service import AnalyticsService
+        from app.services.cache_service import analytics_cache
+        from app.services.rollup_service import RollupService
+        dataset_id = upload_csv(client, sample_csv)['id']
+        expected = AnalyticsService.get_dashboard(dataset_id, 'quarter')
+        RollupService.delete(dataset_id)
+        db.session.commit()
+        analytics_cache.invalidate_dataset(dataset_id)
+
+        statements = []
+        capture = lambda conn, cursor, statement, *args: statements.append(statement)
+        event.listen(db.engine, 'before_cursor_execute', capture)
+        try:
+            scanned = AnalyticsService.get_dashboard(dataset_id, 'quarter')
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', capture)
+
+        assert scanned == expected
+        assert sum('FROM records' in statement for statement in statements) == 1
+
+
+class TestAnalyticsCache:
+    """Test suite for cached analytics results and conditional responses."""
+
+    def test_repeated_requests_hit_cache(self, client, sample_csv, upload_csv):
+        """Test identical analytics requests are served from the cache."""
+        dataset_id = upload_csv(client, sample_csv)['id']
+        first = client.get(f'/api/datasets/{dataset_id}/summary').get_json()
+        second = client.get(f'/api/datasets/{dataset_id}/summary').get_json()
+        assert first == second
+
+        stats = client.get('/api/analytics/cache').get_json()
+        assert stats['hits'] == 1
+        assert stats['misses'] == 1
+
+    def test_invalidation_during_compute_is_not_cached(self):
+        """Test a result computed across an invalidation is returned but not stored."""
+        from app.services.cache_service import AnalyticsCache
+        cache = AnalyticsCache(max_entries=16, ttl=300)
+
+        def stale_compute():
+            cache.invalidate_dataset(1)  # e.g. an append committed while the query ran
+            return 'stale'
+
+        assert cache.get_or_compute(1, ('summary',), stale_compute) == 'stale'
+        assert cache.stats()['entries'] == 0
+        assert cache.get_or_compute(1, ('summary',), lambda: 'fresh') == 'fresh'
+        assert cache.get_or_compute(1, ('summary',), lambda: 'unused') == 'fresh'
+
+    def test_delete_invalidates_cache(self, client, sample_csv, upload_csv):
+        """Test deleting a dataset drops its cached results."""
+        dataset_id = upload_csv(client, sample_csv)['id']
+        client.get(f'/api/datasets/{dataset_id}/chart-data')
+        client.delete(f'/api/datasets/{dataset_id}')
+
+        stats = client.get('/api/analytics/cache').get_json()
+        assert stats['entries'] == 0
+        assert stats['invalidations'] == 1
+
+    def test_etag_returns_304(self, client, sample_csv, upload_csv):
+        """Test a matching If-None-Match yields 304 with an empty body."""
+        dataset_id = upload_csv(client, sample_csv)['id']
+        response = client.get(f'/api/datasets/{dataset_id}/chart-data')
+        etag = response.headers['ETag']
+        assert etag
+
+        cached = client.get(f'/api/datasets/{dataset_id}/chart-data',
+                            headers={'If-None-Match': etag})
+        assert cached.status_code == 304
+        assert cached.data == b''
+
+    def test_lru_eviction_and_ttl(self):
+        """Test the cache evicts least recently used entries and expires stale ones."""
+        from app.services.cache_service import AnalyticsCache
+        cache = AnalyticsCache(max_entries=2, ttl=60)
+        cache.get_or_compute(1, 'a', lambda: 'a1')
+        cache.get_or_compute(2, 'a', lambda: 'a2')
+        cache.get_or_compute(1, 'a', lambda: 'unused')
+        cache.get_or_compute(3, 'a', lambda: 'a3')
+        assert cache.stats()['evictions'] == 1
+        assert cache.get_or_compute(1, 'a', lambda: 'recomputed') == 'a1'
+        assert cache.get_or_compute(2, 'a', lambda: 'recomputed') == 'recomputed'
+
+        cache.ttl = -1
+        cache.get_or_compute(4, 'b', lambda: 'stale')
+        assert cache.get_or_compute(4, 'b', lambda: 'fresh') == 'fresh'
+
+
+class TestRecordsEndpoint:
+    """Test suite for keyset-paginated record access."""
+
+    def _walk(self, client, url):
+        records, cursor = [], None
+        while True:
+            page_url = url + (f'&cursor={cursor}' if cursor else '')
+            data = client.get(page_url).get_json()
+            records.extend(data['records'])
+            cursor = data['next_cursor']
+            if cursor is None:
+                return records
+
+    def test_keyset_pages_cover_every_record_once(self, client, upload_csv, records_csv):
+        """Test walking cursors returns every record exactly once in id order."""
+        dataset_id = upload_csv(client, records_csv)['id']
+        records = self._walk(client, f'/api/datasets/{dataset_id}/records?limit=7')
+        ids = [record['id'] for record in records]
+        assert len(ids) == 25
+        assert ids == sorted(ids)
+        assert records[0]['metadata_json'] == {'notes': 'note 1', 'region': 'S'}
+
+    def test_sort_filter_and_projection(self, client, upload_csv, records_csv):
+        """Test sorting by date descending with filters and a projected metadata column."""
+        dataset_id = upload_csv(client, records_csv)['id']
+        records = self._walk(
+            client,
+            f'/api/datasets/{dataset_id}/records?limit=3&sort=date&order=desc&category=A'
+            f'&date_from=2024-01-05&date_to=2024-01-20&columns=region'
+        )
+        dates = [record['date'] for record in records]
+        assert dates == sorted(dates, reverse=True)
+        assert dates[0] == '2024-01-20' and dates[-1] == '2024-01-06'
+        assert all(record['category'] == 'A' for record in records)
+        assert all(record['metadata_json'] == {'region': 'N'} for record in records)
+
+    def test_invalid_parameters(self, client, upload_csv, records_csv):
+        """Test bad sort keys, cursors, columns and limits are rejected with 400."""
+        dataset_id = upload_csv(client, records_csv)['id']
+        base = f'/api/datasets/{dataset_id}/records'
+        for query in ('?sort=value', '?cursor=garbage', '?columns=missing', '?limit=0',
+                      '?date_from=yesterday'):
+            assert client.get(base + query).status_code == 400
+        assert client.get('/api/datasets/999/records').status_code == 404
+
+    def test_cursor_values_must_match_sort_columns(self, client, upload_csv, records_csv):
+        """Test cursors whose values do not fit the sort columns' types are rejected with 400."""
+        import base64
+        import json
+        dataset_id = upload_csv(client, records_csv)['id']
+        base = f'/api/datasets/{dataset_id}/records'
+        cases = {
+            'date': ([1, 2], ['2024-13-01', 2], ['2024-01-05', '2'], [None, 2]),
+            'category': ([1, 2], [{}, 2], ['A', True]),
+            'id': ([{}], ['5'], [1.5], [True]),
+        }
+        for sort, cursors in cases.items():
+            for values in cursors:
+                cursor = base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+                response = client.get(f'{base}?sort={sort}&cursor={cursor}')
+                assert response.status_code == 400, (sort, values)
+                assert 'Cursor' in response.get_json()['error']
+
+
+class TestExportEndpoint:
+    """Test suite for streaming dataset export."""
+
+    def test_csv_export_round_trips_upload(self, client, app, upload_csv, export_csv):
+        """Test the CSV export reproduces the uploaded file byte for byte."""
+        app.config['EXPORT_BATCH_SIZE'] = 2
+        dataset_id = upload_csv(client, export_csv)['id']
+        response = client.get(f'/api/datasets/{dataset_id}/export?format=csv')
+
+        assert response.status_code == 200
+        assert response.is_streamed
+        assert response.mimetype == 'text/csv'
+        assert 'filename="sales.csv"' in response.headers['Content-Disposition']
+        assert response.get_data(as_text=True) == export_csv
+
+    def test_ndjson_export(self, client, upload_csv, export_csv):
+        """Test NDJSON export emits one object per record in original column order."""
+        import json
+        dataset_id = upload_csv(client, export_csv)['id']
+        response = client.get(f'/api/datasets/{dataset_id}/export?format=ndjson')
+
+        lines = response.get_data(as_text=True).splitlines()
+        assert len(lines) == 3
+        first = json.loads(lines[0])
+        assert list(first) == ['date', 'category', 'value', 'notes', 'units']
+        assert first == {'date': '2024-01-05', 'category': 'Smartphones', 'value': 4500.0,
+                         'notes': 'New Year sale', 'units': 3}
+        assert json.loads(lines[2])['notes'] is None
+
+    def test_parquet_export(self, client, app, upload_csv, export_csv):
+        """Test parquet export is streamed as row groups that read back as a table."""
+        pq = pytest.importorskip('pyarrow.parquet')
+        app.config['EXPORT_BATCH_SIZE'] = 2
+        dataset_id = upload_csv(client, export_csv)['id']
+        response = client.get(f'/api/datasets/{dataset_id}/export?format=parquet')
+
+        assert response.status_code == 200
+        parquet_file = pq.ParquetFile(io.BytesIO(response.get_data()))
+        assert parquet_file.metadata.num_row_groups == 2
+        table = parquet_file.read()
+        assert table.column_names == ['date', 'category', 'value', 'notes', 'units']
+        assert table.column('units').to_pylist() == [3, 1, 2]
+        assert float(table.column('value').to_pylist()[2]) == 1250.5
+
+    def test_parquet_export_mixed_types_across_batches(self, client, app, upload_csv):
+        """Test metadata types that change across chunks and appends are widened for export."""
+        pq = pytest.importorskip('pyarrow.parquet')
+        app.config.update(INGEST_CHUNK_SIZE=2, EXPORT_BATCH_SIZE=2)
+        csv_content = "date,category,value,code,score\n" + "".join(
+            f"2024-01-0{i + 1},A,{i}.00,{i if i < 2 else f'x{i}'},{i}\n" for i in range(4)
+        )
+        dataset_id = upload_csv(client, csv_content)['id']
+        response = client.post(
+            f'/api/datasets/{dataset_id}/append',
+            data={'file': (io.BytesIO(b"date,category,value,code,score\n2024-01-05,B,4.00,7,2.5\n"),
+                           'more.csv')},
+            content_type='multipart/form-data'
+        )
+        assert response.status_code == 200
+
+        response = client.get(f'/api/datasets/{dataset_id}/export?format=parquet')
+        assert response.status_code == 200
+        parquet_file = pq.ParquetFile(io.BytesIO(response.get_data()))
+        assert parquet_file.metadata.num_row_groups == 3
+        table = parquet_file.read()
+        assert table.column('code').to_pylist() == ['0', '1', 'x2', 'x3', '7']
+        assert table.column('score').to_pylist() == [0.0, 1.0, 2.0, 3.0, 2.5]
+
+    def test_invalid_format(self, client, upload_csv, export_csv):
+        """Test unknown formats are rejected and unknown datasets return 404."""
+        dataset_id = upload_csv(client, export_csv)['id']
+        assert client.get(f'/api/datasets/{dataset_id}/export?format=xlsx').status_code == 400
+        assert client.get('/api/datasets/999/export').status_code == 404
+
+
+class TestColumnarStorage:
+    """Test suite for typed columnar metadata storage."""
+
+    @pytest.fixture
+    def columnar_app(self, app, tmp_path):
+        pytest.importorskip('pyarrow')
+        app.config.update(METADATA_STORAGE='columnar', UPLOAD_FOLDER=str(tmp_path),
+                          INGEST_CHUNK_SIZE=4)
+        return app
+
+    def test_metadata_written_as_typed_parts(self, columnar_app, upload_csv, columnar_csv):
+        """Test records carry row numbers and metadata lands in Parquet with widened types."""
+        from app.services.columnar_store import ColumnarReader
+        data = upload_csv(columnar_app.test_client(), columnar_csv)
+        assert data['metadata_storage'] == 'columnar'
+
+        records = Record.query.filter_by(dataset_id=data['id']).order_by(Record.id).all()
+        assert [record.row_number for record in records] == list(range(10))
+        assert all(record.metadata_json is None for record in records)
+
+        reader = ColumnarReader(data['id'])
+        assert len(reader.manifest['parts']) == 3
+        # 'units' started out numeric and was widened once text appeared in a later chunk
+        assert reader.column_types == {'notes': 'string', 'units': 'string'}
+        assert reader.take(['units'], [0, 9]) == {0: {'units': '1'}, 9: {'units': 'many'}}
+
+    def test_records_and_export_read_parquet(self, columnar_app, upload_csv, columnar_csv):
+        """Test the records endpoint and export reassemble rows from the columnar parts."""
+        client = columnar_app.test_client()
+        dataset_id = upload_csv(client, columnar_csv)['id']
+
+        page = client.get(
+            f'/api/datasets/{dataset_id}/records?limit=3&sort=date&order=desc&columns=notes'
+        ).get_json()
+        assert [record['metadata_json'] for record in page['records']] == [
+            {'notes': 'note 10'}, {'notes': 'note 9'}, {'notes': 'note 8'}
+        ]
+
+        columnar_app.config['EXPORT_BATCH_SIZE'] = 3
+        response = client.get(f'/api/datasets/{dataset_id}/export?format=csv')
+        assert response.get_data(as_text=True) == columnar_csv
+
+    def test_delete_removes_parts(self, columnar_app, upload_csv, columnar_csv):
+        """Test deleting a columnar dataset removes its Parquet directory."""
+        from app.services.columnar_store import dataset_directory
+        client = columnar_app.test_client()
+        dataset_id = upload_csv(client, columnar_csv)['id']
+        directory = dataset_directory(dataset_id)
+        assert os.path.isdir(directory)
+
+        client.delete(f'/api/datasets/{dataset_id}')
+        assert not os.path.exists(directory)
+
+
+class TestAggregateEndpoint:
+    """Test suite for group-by aggregation over any column."""
+
+    def _aggregate(self, client, dataset_id, body):
+        return client.post(f'/api/datasets/{dataset_id}/aggregate', json=body)
+
+    def _check_results(self, client, dataset_id, engine):
+        response = self._aggregate(client, dataset_id, {
+            'group_by': ['notes'],
+            'measures': [{'op': 'sum', 'column': 'value'}, {'op': 'count'},
+                         {'op': 'distinct', 'column': 'category'},
+                         {'op': 'max', 'column': 'units'}],
+        })
+        assert response.status_code == 200
+        data = response.get_json()
+        assert data['engine'] == engine
+        assert data['measures'] == ['sum_value', 'count', 'distinct_category', 'max_units']
+        assert data['rows'] == [
+            {'notes': 'Promo', 'sum_value': 48.0, 'count': 8, 'distinct_category': 2,
+             'max_units': 3.0},
+            {'notes': 'Restock', 'sum_value': 30.0, 'count': 4, 'distinct_category': 2,
+             'max_units': 3.0},
+        ]
+
+        response = self._aggregate(client, dataset_id, {
+            'group_by': ['date', 'category'],
+            'granularity': 'month',
+            'measures': [{'op': 'avg', 'column': 'value'}],
+            'filters': [{'column': 'notes', 'op': 'eq', 'value': 'Promo'},
+                        {'column': 'value', 'op': 'gte', 'value': 7}],
+            'order_by': 'avg_value',
+            'limit': 2,
+        })
+        rows = response.get_json()['rows']
+        assert rows == [
+            {'date': '2024-03', 'category': 'B', 'avg_value': 11.0},
+            {'date': '2024-02', 'category': 'A', 'avg_value': 10.0},
+        ]
+
+    def test_sql_pushdown(self, client, upload_csv, aggregate_csv):
+        """Test metadata fields are grouped and filtered in SQL via JSON path extraction."""
+        dataset_id = upload_csv(client, aggregate_csv)['id']
+        self._check_results(client, dataset_id, 'sql')
+
+    def test_columnar_engine(self, app, client, tmp_path, upload_csv, aggregate_csv):
+        """Test columnar datasets aggregate in Arrow with the same results."""
+        pytest.importorskip('pyarrow')
+        app.config.update(METADATA_STORAGE='columnar', UPLOAD_FOLDER=str(tmp_path),
+                          INGEST_CHUNK_SIZE=5)
+        dataset_id = upload_csv(client, aggregate_csv)['id']
+        self._check_results(client, dataset_id, 'arrow')
+
+    def test_planner_rejects_high_cardinality(self, app, client, upload_csv, aggregate_csv):
+        """Test unbounded groupings over many distinct values are rejected before running."""
+        app.config['AGGREGATE_MAX_GROUPS'] = 5
+        dataset_id = upload_csv(client, aggregate_csv)['id']
+
+        response = self._aggregate(client, dataset_id, {'group_by': ['date']})
+        assert response.status_code == 400
+        assert 'groups' in response.get_json()['error']
+
+        limited = self._aggregate(client, dataset_id,
+                                  {'group_by': ['date'], 'order_by': 'count', 'limit': 3})
+        assert limited.status_code == 200
+        assert len(limited.get_json()['rows']) == 3
+        assert self._aggregate(client, dataset_id, {'group_by': ['notes']}).status_code == 200
+
+    def test_invalid_requests(self, client, upload_csv, aggregate_csv):
+        """Test unknown columns, ops and malformed filters are rejected with 400."""
+        dataset_id = upload_csv(client, aggregate_csv)['id']
+        for body in (
+            {'group_by': ['missing']},
+            {'measures': [{'op': 'median', 'column': 'value'}]},
+            {'measures': [{'op': 'sum', 'column': 'category'}]},
+            {'filters': [{'column': 'notes', 'op': 'like', 'value': 'P'}]},
+            {'filters': [{'column': 'date', 'op': 'gt', 'value': 'soon'}]},
+            {'group_by': ['notes'], 'order_by': 'units'},
+        ):
+            assert self._aggregate(client, dataset_id, body).status_code == 400
+        assert client.post('/api/datasets/999/aggregate', json={}).status_code == 404
+
+
+class TestDuckDBEngine:
+    """Test suite for the embedded DuckDB analytics engine."""
+
+    @pytest.fixture
+    def duckdb_app(self, app, tmp_path):
+        pytest.importorskip('duckdb')
+        pytest.importorskip('pyarrow')
+        app.config.update(ANALYTICS_ENGINE='duckdb', UPLOAD_FOLDER=str(tmp_path),
+                          INGEST_CHUNK_SIZE=25)
+        return app
+
+    def _read_all(self, client, dataset_id):
+        from app.services.cache_service import analytics_cache
+        analytics_cache.clear()
+        results = [
+            client.get(f'/api/datasets/{dataset_id}/summary').get_json(),
+            client.get(f'/api/datasets/{dataset_id}/chart-data?granularity=week').get_json(),
+            client.get(f'/api/datasets/{dataset_id}/dashboard?granularity=month').get_json(),
+        ]
+        results[1]['bar_chart'].sort(key=lambda row: row['category'])
+        results[2]['category_breakdown'].sort(key=lambda row: row['category'])
+        return results
+
+    def test_results_match_sql_engine(self, duckdb_app, upload_csv, replica_csv):
+        """Test summary, chart-data and dashboard agree between DuckDB and the SQL rollups."""
+        from app.services.duckdb_engine import replica_files
+        client = duckdb_app.test_client()
+        dataset_id = upload_csv(client, replica_csv)['id']
+        assert len(replica_files(dataset_id)) == 3
+
+        duckdb_results = self._read_all(client, dataset_id)
+        duckdb_app.config['ANALYTICS_ENGINE'] = 'sql'
+        sql_results = self._read_all(client, dataset_id)
+        assert duckdb_results == sql_results
+        assert duckdb_results[0]['total_records'] == 61
+
+    def test_aggregate_runs_on_replica(self, duckdb_app, upload_csv, replica_csv):
+        """Test aggregations over date, category and value scan the replica and match SQL."""
+        client = duckdb_app.test_client()
+        dataset_id = upload_csv(client, replica_csv)['id']
+        specs = [
+            {'group_by': ['category'], 'measures': [
+                {'op': 'sum', 'column': 'value'}, {'op': 'avg', 'column': 'value'},
+                {'op': 'min', 'column': 'value'}, {'op': 'max', 'column': 'value'},
+                {'op': 'count', 'column': 'value'}, {'op': 'count'},
+                {'op': 'distinct', 'column': 'date'}]},
+            {'group_by': ['date', 'category'], 'granularity': 'month',
+             'measures': [{'op': 'sum', 'column': 'value'}],
+             'filters': [{'column': 'value', 'op': 'gte', 'value': 20},
+                         {'column': 'category', 'op': 'in', 'value': ['A', 'B']}],
+             'order_by': 'sum_value', 'limit': 3},
+            {'measures': [{'op': 'count'}],
+             'filters': [{'column': 'date', 'op': 'lte', 'value': '2024-02-15'}]},
+        ]
+
+        def run(spec):
+            from app.services.cache_service import analytics_cache
+            analytics_cache.clear()
+            response = client.post(f'/api/datasets/{dataset_id}/aggregate', json=spec)
+            assert response.status_code == 200
+            return response.get_json()
+
+        duckdb_results = [run(spec) for spec in specs]
+        duckdb_app.config['ANALYTICS_ENGINE'] = 'sql'
+        sql_results = [run(spec) for spec in specs]
+        assert [len(result['rows']) for result in duckdb_results] == [3, 3, 1]
+        for duckdb_result, sql_result in zip(duckdb_results, sql_results):
+            assert (duckdb_result['engine'], sql_result['engine']) == ('duckdb', 'sql')
+            assert len(duckdb_result['rows']) == len(sql_result['rows'])
+            for duckdb_row, sql_row in zip(duckdb_result['rows'], sql_result['rows']):
+                assert duckdb_row == pytest.approx(sql_row)
+
+    def test_rebuild_swaps_replica_atomically(self, duckdb_app, monkeypatch, upload_csv,
+                                              replica_csv):
+        """Test a rebuild publishes its parts in one manifest update before removing old ones."""
+        from app.services.duckdb_engine import rebuild_replica, replica_files
+        client = duckdb_app.test_client()
+        dataset_id = upload_csv(client, replica_csv)['id']
+        expected = self._read_all(client, dataset_id)
+        old_parts = set(replica_files(dataset_id))
+
+        listed_during_removal = []
+        remove = os.remove
+
+        def recording_remove(path):
+            listed_during_removal.append(set(replica_files(dataset_id)))
+            remove(path)
+
+        monkeypatch.setattr(os, 'remove', recording_remove)
+        rebuild_replica(dataset_id, batch_size=20)
+        monkeypatch.undo()
+
+        new_parts = set(replica_files(dataset_id))
+        assert len(new_parts) == 4 and not new_parts & old_parts
+        assert listed_during_removal == [new_parts] * len(old_parts)
+        assert not any(os.path.exists(path) for path in old_parts)
+        assert self._read_all(client, dataset_id) == expected
+
+    def test_append_and_delete_maintain_replica(self, duckdb_app, upload_csv, replica_csv):
+        """Test appends add replica parts, failed appends leave none and deletes remove them."""
+        from app.services.duckdb_engine import replica_directory, replica_files
+        client = duckdb_app.test_client()
+        dataset_id = upload_csv(client, replica_csv)['id']
+
+        response = client.post(
+            f'/api/datasets/{dataset_id}/append',
+            data={'file': (io.BytesIO(b"date,category,value\n2024-06-01,D,10.00\n"), 'more.csv')},
+            content_type='multipart/form-data'
+        )
+        assert response.status_code == 200
+        assert len(replica_files(dataset_id)) == 4
+        summary = client.get(f'/api/datasets/{dataset_id}/summary').get_json()
+        assert summary['total_records'] == 62 and summary['category_count'] == 4
+
+        response = client.post(
+            f'/api/datasets/{dataset_id}/append',
+            data={'file': (io.BytesIO(b"date,category\n2024-06-01,D\n"), 'bad.csv')},
+            content_type='multipart/form-data'
+        )
+        assert response.status_code == 400
+        assert sorted(os.listdir(replica_directory(dataset_id))) == sorted(
+            [os.path.basename(path) for path in replica_files(dataset_id)] + ['manifest.json']
+        )
+
+        client.delete(f'/api/datasets/{dataset_id}')
+        assert not os.path.exists(replica_directory(dataset_id))
+
+
+class TestApproximateSummary:
+    """Test suite for sketch-based approximate analytics."""
+
+    def _csv(self, rows=2000, offset=0):
+        return "date,category,value,notes\n" + "".join(
+            f"2024-01-{1 + i % 28:02d},cat-{(i + offset) % 150},{i % 1000}.00,n{i}\n"
+            for i in range(rows)
+        )
+
+    def test_approx_summary_reports_quantiles_and_bounds(self, client, upload_csv):
+        """Test ?mode=approx adds p50/p90/p99 with error bounds that contain the exact answers."""
+        dataset_id = upload_csv(client, self._csv())['id']
+        exact = client.get(f'/api/datasets/{dataset_id}/summary').get_json()
+        approx = client.get(f'/api/datasets/{dataset_id}/summary?mode=approx').get_json()
+
+        assert approx['mode'] == 'approx'
+        assert approx['total_records'] == exact['total_records'] == 2000
+        assert approx['total_value'] == exact['total_value']
+        assert approx['min_value'] == exact['min_value']
+        assert approx['max_value'] == exact['max_value']
+        bounds = approx['error_bounds']['category_count']
+        assert bounds['low'] <= exact['category_count'] == 150 <= bounds['high']
+        for name, true_value in (('p50', 499.5), ('p90', 899.5), ('p99', 989.5)):
+            window = approx['error_bounds']['quantiles']['ranges'][name]
+            assert window['low'] - 1 <= true_value <= window['high'] + 1
+            assert abs(approx['quantiles'][name] - true_value) < 30
+        assert 'quantiles' not in exact
+        assert client.get(f'/api/datasets/{dataset_id}/summary?mode=fast').status_code == 400
+
+    def test_sample_preview(self, client, app, upload_csv):
+        """Test /sample serves reservoir rows including metadata columns."""
+        app.config['SKETCH_SAMPLE_SIZE'] = 50
+        dataset_id = upload_csv(client, self._csv())['id']
+        data = client.get(f'/api/datasets/{dataset_id}/sample?limit=10').get_json()
+
+        assert data['sampled_from'] == 2000
+        assert len(data['rows']) == 10
+        assert set(data['rows'][0]) == {'date', 'category', 'value', 'notes'}
+
+    def test_merged_summary_across_datasets(self, client, upload_csv):
+        """Test sketches of several datasets merge into one summary of their union."""
+        first = upload_csv(client, self._csv(rows=1000))['id']
+        second = upload_csv(client, self._csv(rows=1000, offset=100))['id']
+        data = client.get(f'/api/analytics/summary?ids={first},{second}').get_json()
+
+        assert data['dataset_ids'] == [first, second]
+        assert data['total_records'] == 2000
+        bounds = data['error_bounds']['category_count']
+        assert bounds['low'] <= 150 <= bounds['high']
+        assert client.get('/api/analytics/summary?ids=abc').status_code == 400
+        assert client.get(f'/api/analytics/summary?ids={first},999').status_code == 404
+
+
+class TestCompareEndpoint:
+    """Test suite for cross-dataset comparison."""
+
+    REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+    def _upload_sample(self, client, upload_csv, filename):
+        with open(os.path.join(self.REPO_ROOT, filename), 'rb') as fh:
+            return upload_csv(client, fh.read(), filename=filename, name=filename)['id']
+
+    def test_compare_aligns_series_with_chart_data(self, client, upload_csv):
+        """Test compare returns each dataset's chart-data series on one shared bucket axis."""
+        from app.services.rollup_service import RollupService
+        ids = [self._upload_sample(client, upload_csv, name)
+               for name in ('sales_electronics.csv', 'sales_fashion.csv', 'sales_groceries.csv')]
+        # The last dataset has no rollups and is answered from records
+        RollupService.delete(ids[-1])
+        db.session.commit()
+
+        response = client.get(
+            f"/api/analytics/compare?ids={','.join(map(str, ids))}&granularity=month"
+        )
+        assert response.status_code == 200
+        data = response.get_json()
+        assert [entry['dataset_id'] for entry in data['datasets']] == ids
+
+        for entry in data['datasets']:
+            chart = client.get(
+                f"/api/datasets/{entry['dataset_id']}/chart-data?granularity=month"
+            ).get_json()
+            assert len(entry['series']) == len(data['buckets'])
+            aligned = dict(zip(data['buckets'], entry['series']))
+            assert all(aligned[point['date']] == point['value'] for point in chart['line_chart'])
+            assert sorted((c['category'], c['value']) for c in chart['bar_chart']) == \
+                [(c['category'], c['value']) for c in entry['category_totals']]
+
+    def test_compare_validation(self, client, upload_csv):
+        """Test missing, malformed and unknown ids are rejected."""
+        dataset_id = self._upload_sample(client, upload_csv, 'sales_services.csv')
+        assert client.get('/api/analytics/compare').status_code == 400
+        response = client.get(f'/api/analytics/compare?ids={dataset_id}&granularity=hour')
+        assert response.status_code == 400
+        assert client.get(f'/api/analytics/compare?ids={dataset_id},999').status_code == 404
+
+
+class TestAppendEndpoint:
+    """Test suite for appending rows to an existing dataset."""
+
+    HEADER = "date,category,value,order_id\n"
+
+    def _rows(self, start, stop):
+        return "".join(
+            f"2024-{1 + i % 3:02d}-{1 + i % 28:02d},{'ABC'[i % 3]},{i}.25,o{i}\n"
+            for i in range(start, stop)
+        )
+
+    def _append(self, client, dataset_id, content):
+        return client.post(
+            f'/api/datasets/{dataset_id}/append',
+            data={'file': (io.BytesIO(content.encode('utf-8')), 'more.csv')},
+            content_type='multipart/form-data'
+        )
+
+    def test_append_updates_rollups_sketches_and_cache(self, client, upload_csv):
+        """Test appended rows reach row_count, merged rollups, sketches and cached analytics."""
+        from app.services.rollup_service import RollupService
+        dataset_id = upload_csv(client, self.HEADER + self._rows(0, 30))['id']
+        before = client.get(f'/api/datasets/{dataset_id}/summary').get_json()
+
+        response = self._append(client, dataset_id, self.HEADER + self._rows(30, 50))
+        assert response.status_code == 200
+        data = response.get_json()
+        assert data['row_count'] == 50
+        assert data['appended_rows'] == 20 and data['skipped_duplicates'] == 0
+
+        summary = client.get(f'/api/datasets/{dataset_id}/summary').get_json()
+        assert summary['total_records'] == 50
+        appended = sum(i + 0.25 for i in range(30, 50))
+        assert summary['total_value'] == pytest.approx(before['total_value'] + appended)
+        assert RollupService.verify(dataset_id) == []
+        approx = client.get(f'/api/datasets/{dataset_id}/summary?mode=approx').get_json()
+        assert approx['total_records'] == 50
+        assert approx['max_value'] == 49.25
+
+    def test_dedupe_key_skips_known_rows(self, client, upload_csv):
+        """Test re-appending overlapping rows only inserts the new ones."""
+        dataset = upload_csv(client, self.HEADER + self._rows(0, 10) + self._rows(5, 10),
+                             dedupe_key='order_id')
+        assert dataset['dedupe_key'] == ['order_id']
+        assert dataset['row_count'] == 10
+
+        data = self._append(client, dataset['id'], self.HEADER + self._rows(5, 15)).get_json()
+        assert (data['appended_rows'], data['skipped_duplicates'], data['row_count']) == (5, 5, 15)
+        data = self._append(client, dataset['id'], self.HEADER + self._rows(0, 15)).get_json()
+        assert (data['appended_rows'], data['skipped_duplicates'], data['row_count']) == (0, 15, 15)
+        assert Record.query.filter_by(dataset_id=dataset['id']).count() == 15
+
+    def test_append_validation(self, client, upload_csv):
+        """Test mismatched columns, unknown dedupe columns and missing files are rejected."""
+        dataset_id = upload_csv(client, self.HEADER + self._rows(0, 5))['id']
+        response = self._append(client, dataset_id, "date,category,value\n2024-01-01,A,1\n")
+        assert response.status_code == 400
+        assert 'do not match' in response.get_json()['error']
+        assert db.session.get(Dataset, dataset_id).row_count == 5
+
+        assert client.post(f'/api/datasets/{dataset_id}/append').status_code == 400
+        assert self._append(client, 999, self.HEADER).status_code == 404
+        response = client.post(
+            '/api/upload',
+            data={'file': (io.BytesIO((self.HEADER + self._rows(0, 5)).encode('utf-8')), 'o.csv'),
+                  'dedupe_key': 'order_id, sku'},
+            content_type='multipart/form-data'
+        )
+        assert response.status_code == 400
+        assert 'sku' in response.get_json()['error']
+
+    def test_append_to_columnar_dataset(self, app, tmp_path, upload_csv):
+        """Test appends add Parquet parts and a failed append leaves the committed files intact."""
+        pytest.importorskip('pyarrow')
+        from app.services.columnar_store import ColumnarReader, dataset_directory
+        app.config.update(METADATA_STORAGE='columnar', UPLOAD_FOLDER=str(tmp_path),
+                          INGEST_CHUNK_SIZE=4)
+        client = app.test_client()
+        dataset_id = upload_csv(client, self.HEADER + self._rows(0, 6))['id']
+
+        assert self._append(client, dataset_id, self.HEADER + self._rows(6, 10)).status_code == 200
+        reader = ColumnarReader(dataset_id)
+        assert reader.manifest['rows'] == 10
+        assert reader.take(['order_id'], [0, 9]) == {0: {'order_id': 'o0'}, 9: {'order_id': 'o9'}}
+        files = sorted(os.listdir(dataset_directory(dataset_id)))
+
+        # The second chunk has an unparseable value, so the whole append rolls back
+        response = self._append(client, dataset_id,
+                                self.HEADER + self._rows(10, 14) + "2024-01-01,A,abc,o99\n")
+        assert response.status_code == 400
+        assert sorted(os.listdir(dataset_directory(dataset_id))) == files
+        assert db.session.get(Dataset, dataset_id).row_count == 10
+        export = client.get(f'/api/datasets/{dataset_id}/export?format=csv').get_data(as_text=True)
+        assert export == self.HEADER + self._rows(0, 10)
+
+
+class TestMetricsEndpoint:
+    """Test suite for request, SQL and ingest metrics."""
+
+    def test_metrics_cover_requests_queries_and_ingest(self, client, sample_csv, upload_csv):
+        """Test /metrics reports route latency, per-request query counts and ingest phases."""
+        dataset_id = upload_csv(client, sample_csv)['id']
+        client.get(f'/api/datasets/{dataset_id}/summary')
+
+        response = client.get('/metrics')
+        assert response.status_code == 200
+        assert response.mimetype == 'text/plain'
+        text = response.get_data(as_text=True)
+        assert '# TYPE http_request_duration_seconds histogram' in text
+        assert ('http_request_duration_seconds_count{endpoint="/api/datasets/<int:id>/summary",'
+                'method="GET",status="200"} 1') in text
+        assert 'http_request_db_queries_count{endpoint="/api/upload"} 1' in text
+        assert 'ingest_rows_total{kind="upload"} 5' in text
+        for phase in ('parse', 'transform', 'insert', 'aggregate', 'commit'):
+            assert f'ingest_phase_seconds_count{{kind="upload",phase="{phase}"}} 1' in text
+        assert 'analytics_cache_misses_total 1' in text
+
+    def test_failed_queries_are_counted_and_not_leaked(self, app):
+        """Test a failing statement is counted and leaves no timing state on the connection."""
+        from sqlalchemy import text
+        from sqlalchemy.exc import OperationalError
+        from app.services.metrics_service import metrics
+        before = metrics.queries.series.get((), 0)
+        for _ in range(3):
+            with pytest.raises(OperationalError):
+                db.session.execute(text("SELECT * FROM missing_table"))
+            db.session.rollback()
+        db.session.execute(text("SELECT 1"))
+
+        assert metrics.queries.series[()] - before == 4
+        assert not any('started' in str(key) for key in db.session.connection().info)
+
+    def test_server_timing_is_opt_in(self, app, client, sample_csv):
+        """Test the Server-Timing header only appears when enabled."""
+        assert 'Server-Timing' not in client.get('/api/datasets').headers
+
+        app.config['SERVER_TIMING'] = True
+        assert client.get('/api/datasets').headers['Server-Timing'].startswith('app;dur=')
+        response = client.post('/api/upload', data={'file': sample_csv},
+                               content_type='multipart/form-data')
+        timing = response.headers['Server-Timing']
+        assert 'db;dur=' in timing and 'insert;dur=' in timing and 'commit;dur=' in timing
+
+    def test_server_timing_without_metrics(self, monkeypatch):
+        """Test SERVER_TIMING works on its own when METRICS_ENABLED is off."""
+        from app import create_app
+        from app.config import TestingConfig
+        from app.services.metrics_service import metrics
+        monkeypatch.setattr(TestingConfig, 'METRICS_ENABLED', False)
+        monkeypatch.setattr(TestingConfig, 'SERVER_TIMING', True)
+        app = create_app('testing')
+        with app.app_context():
+            db.create_all()
+            response = app.test_client().get('/api/datasets')
+            assert response.headers['Server-Timing'].startswith('app;dur=')
+            assert 'http_request_duration_seconds_count' not in metrics.render()
+            db.session.remove()
+            db.drop_all()
+
+
+class TestDatasetService:
+    """Test suite for the CSV ingestion pipeline."""
+
+    def test_parse_and_prepare_records_vectorized(self):
+        """Test the columnar transform produces plain row mappings."""
+        import pandas as pd
+        df = pd.DataFrame({
+            'date': ['2024-01-15', 'not a date', None],
+            'category': ['Electronics', 'Clothing', None],
+            'value': [1000, 500.5, 200],
+            'notes': ['a', 'b', 'c'],
+        })
+        records = DatasetService._parse_and_prepare_records(df)
+
+        assert len(records) == 3
+        assert all(isinstance(r, dict) for r in records)
+        assert str(records[0]['date']) == '2024-01-15'
+        assert records[1]['date'] is None
+        assert records[2]['date'] is None
+        assert records[2]['category'] == 'nan'
+        assert records[1]['value'] == 500.5
+        assert records[0]['metadata_json'] == {'notes': 'a'}
+
+    def test_parse_rejects_non_numeric_value(self):
+        """Test a non-numeric value column is reported as a validation error."""
+        import pandas as pd
+        df = pd.DataFrame({'category': ['A'], 'value': ['abc']})
+        with pytest.raises(ValueError):
+            DatasetService._parse_and_prepare_records(df)
+
+    def test_chunked_upload_counts_all_rows(self, app, client, sample_csv, upload_csv):
+        """Test uploads spanning several chunks persist every row."""
+        app.config['INGEST_CHUNK_SIZE'] = 2
+        data = upload_csv(client, sample_csv)
+        assert data['row_count'] == 5
+        assert data['column_names'] == ['date', 'category', 'value']
+        assert Record.query.filter_by(dataset_id=data['id']).count() == 5
+
+    def test_chunked_upload_failure_rolls_back(self, app, client):
+        """Test a bad row in a later chunk leaves no partial dataset behind."""
+        app.config['INGEST_CHUNK_SIZE'] = 2
+        csv_content = b"date,category,value\n2024-01-01,A,1\n2024-01-02,B,2\n2024-01-03,C,oops\n"
+        response = client.post(
+            '/api/upload',
+            data={'file': (io.BytesIO(csv_content), 'bad.csv'), 'name': 'Bad'},
+            content_type='multipart/form-data'
+        )
+        assert response.status_code == 400
+        assert Dataset.query.count() == 0
+        assert Record.query.count() == 0
+
+    def test_bad_values_reported_with_row_numbers(self, app, client):
+        """Test non-numeric values are reported by row before anything is inserted."""
+        app.config['INGEST_CHUNK_SIZE'] = 2
+        csv_content = (b"date,category,value\n2024-01-01,A,1\n2024-01-02,B,n/a?\n"
+                       b"2024-01-03,C,3\n2024-01-04,D,x\n")
+        response = client.post(
+            '/api/upload',
+            data={'file': (io.BytesIO(csv_content), 'bad.csv'), 'name': 'Bad'},
+            content_type='multipart/form-data'
+        )
+        assert response.status_code == 400
+        assert response.get_json()['error'] == "Non-numeric values in column 'value' at rows 2, 4."
+        assert Dataset.query.count() == 0
+
+    def test_profile_parses_repetitive_text_as_categorical(self):
+        """Test the sampled profile picks categoricals, integer downcasts and the date format."""
+        from app.services.csv_profile import CsvProfile
+        csv_content = "date,category,value,units,ref\n" + "".join(
+            f"2024-02-{1 + i % 28:02d},{'AB'[i % 2]},{i}.5,{i % 7},r{i}\n" for i in range(100)
+        )
+        stream = io.BytesIO(csv_content.encode('utf-8'))
+        profile = CsvProfile.sample(stream)
+        assert stream.tell() == 0
+        assert profile.categorical == ['category']
+        assert profile.integer == ['units']
+        assert profile.date_format == '%Y-%m-%d'
+
+        chunks = list(profile.iter_chunks(stream, chunk_size=40))
+        assert [len(chunk) for chunk in chunks] == [40, 40, 20]
+        assert str(chunks[0]['category'].dtype) == 'category'
+        assert chunks[0]['units'].dtype.itemsize == 1
+        records = DatasetService._parse_and_prepare_records(chunks[0],
+                                                            date_format=profile.date_format)
+        assert records[3] == {'date': records[3]['date'], 'category': 'B', 'value': 3.5,
+                              'metadata_json': {'units': 3, 'ref': 'r3'}}
+        assert str(records[3]['date']) == '2024-02-04'
+
+    def test_pyarrow_engine_matches_default_parse(self, app, client, upload_csv):
+        """Test the pyarrow CSV engine stores the same records as the pandas parser."""
+        pytest.importorskip('pyarrow')
+        csv_content = ("date,category,value,notes,units\n2024-01-01,A,1.5,x,1\n"
+                       "2024-01-02,B,,y,2\nbad,C,3,,many\n").encode('utf-8')
+        stored = {}
+        for engine in ('c', 'pyarrow'):
+            app.config['INGEST_CSV_ENGINE'] = engine
+            dataset_id = upload_csv(client, csv_content)['id']
+            records = Record.query.filter_by(dataset_id=dataset_id).order_by(Record.id).all()
+            stored[engine] = [(r.date, r.category, r.value, r.metadata_json) for r in records]
+        assert stored['pyarrow'] == stored['c']
+
+    def test_bulk_loader_selected_from_dialect(self, app):
+        """Test the bulk loader is resolved from the engine dialect."""
+        from app.services.bulk_loader import get_bulk_loader, SQLiteBulkLoader, BulkLoader
+        connection = db.session.connection()
+        assert isinstance(get_bulk_loader(connection), SQLiteBulkLoader)
+        assert type(get_bulk_loader(connection, 'core')) is BulkLoader
+        with pytest.raises(ValueError):
+            get_bulk_loader(connection, 'bogus')
+
+    def test_upload_with_core_loader(self, app, client, sample_csv, upload_csv):
+        """Test uploads persist through the plain Core executemany loader."""
+        app.config['BULK_LOAD_STRATEGY'] = 'core'
+        dataset_id = upload_csv(client, sample_csv)['id']
+        assert Record.query.filter_by(dataset_id=dataset_id).count() == 5
+
+
+class TestRollups:
+    """Test suite for precomputed per-dataset aggregates."""
+
+    def test_rollups_match_full_scan(self, client, sample_csv, upload_csv):
+        """Test rollups written during ingestion agree with a full scan."""
+        from app.services.rollup_service import RollupService
+        dataset_id = upload_csv(client, sample_csv)['id']
+        assert RollupService.has_rollups(dataset_id)
+        assert RollupService.verify(dataset_id) == []
+
+    def test_rollup_analytics_match_scan(self, client, sample_csv, upload_csv):
+        """Test summary and chart data read from rollups equal the full-scan results."""
+        from app.services.analytics_service import AnalyticsService
+        dataset_id = upload_csv(client, sample_csv)['id']
+
+        assert AnalyticsService.get_summary_statistics(dataset_id) == \
+            AnalyticsService._scan_summary_statistics(dataset_id)
+        assert AnalyticsService.get_chart_data(dataset_id) == \
+            AnalyticsService._scan_chart_data(dataset_id)
+
+    def test_verify_detects_drift(self, app, client, sample_csv, upload_csv):
+        """Test the consistency check reports rollups that no longer match the records."""
+        from app.models.rollup import CategoryRollup
+        from app.services.rollup_service import RollupService
+        dataset_id = upload_csv(client, sample_csv)['id']
+        CategoryRollup.query.filter_by(dataset_id=dataset_id, category='Clothing').update(
+            {'total_value': 1}
+        )
+        db.session.commit()
+
+        mismatches = RollupService.verify(dataset_id)
+        assert any('Clothing' in mismatch for mismatch in mismatches)
+
+        result = app.test_cli_runner().invoke(args=['rollups', 'verify', str(dataset_id)])
+        assert result.exit_code == 1
+
+        RollupService.rebuild(dataset_id)
+        assert RollupService.verify(dataset_id) == []
+
+    def test_delete_removes_rollups(self, client, sample_csv, upload_csv):
+        """Test deleting a dataset removes its rollups."""
+        from app.models.rollup import CategoryRollup, DailyRollup, CategoryMonthRollup
+        dataset_id = upload_csv(client, sample_csv)['id']
+        client.delete(f'/api/datasets/{dataset_id}')
+        for model in (CategoryRollup, DailyRollup, CategoryMonthRollup):
+            assert model.query.filter_by(dataset_id=dataset_id).count() == 0
+
+
+class TestSerialization:
+    """Test suite for the JSON provider, schema-free serializers and response compression."""
+
+    def _csv(self, rows=500):
+        return "date,category,value\n" + "".join(
+            f"2024-01-{1 + i % 28:02d},cat-{i % 7},{i}.25\n" for i in range(rows)
+        )
+
+    def test_fast_serializers_match_schemas(self, client, upload_csv):
+        """Test the schema-free dataset and summary serializers produce the marshmallow output."""
+        from app.schemas.dataset_schema import (DatasetSchema, DatasetSummarySchema, dump_dataset,
+                                                dump_summary)
+        from app.services.analytics_service import AnalyticsService
+        dataset_id = upload_csv(client, self._csv())['id']
+        dataset = DatasetService.get_dataset_by_id(dataset_id)
+        assert dump_dataset(dataset) == DatasetSchema().dump(dataset)
+        for summary in (AnalyticsService.get_summary_statistics(dataset_id),
+                        AnalyticsService.get_approximate_summary(dataset_id)):
+            assert dump_summary(summary) == DatasetSummarySchema().dump(summary)
+
+    def test_orjson_provider_types(self, app):
+        """Test the orjson provider writes ISO dates, Decimals as numbers and NaN as null."""
+        pytest.importorskip('orjson')
+        from datetime import date
+        from decimal import Decimal
+        assert app.json.dumps({'v': Decimal('1.50'), 'd': date(2024, 1, 2), 'n': float('nan')}) == \
+            '{"d":"2024-01-02","n":null,"v":1.5}'
+
+    def test_large_responses_are_compressed(self, app, client, upload_csv):
+        """Test JSON above COMPRESS_MIN_SIZE is gzip or brotli encoded and smaller JSON is not."""
+        import gzip
+        dataset_id = upload_csv(client, self._csv())['id']
+        url = f'/api/datasets/{dataset_id}/records?limit=500'
+        plain = client.get(url)
+        assert 'Content-Encoding' not in plain.headers
+
+        response = client.get(url, headers={'Accept-Encoding': 'gzip'})
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert 'Accept-Encoding' in response.headers['Vary']
+        assert len(response.data) < len(plain.data) / 4
+        assert gzip.decompress(response.data) == plain.data
+
+        small = client.get(f'/api/datasets/{dataset_id}', headers={'Accept-Encoding': 'gzip'})
+        assert 'Content-Encoding' not in small.headers
+
+        brotli = pytest.importorskip('brotli')
+        response = client.get(url, headers={'Accept-Encoding': 'gzip, br'})
+        assert response.headers['Content-Encoding'] == 'br'
+        assert brotli.decompress(response.data) == plain.data
+
+
+class TestDatabaseConfiguration:
+    """Test suite for engine options and SQLite connection tuning."""
+
+    @pytest.fixture
+    def file_app(self, tmp_path, monkeypatch):
+        from app import create_app
+        from app.config import TestingConfig, config
+
+        class FileConfig(TestingConfig):
+            SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'concurrency.db'}"
+
+        monkeypatch.setitem(config, 'file', FileConfig)
+        app = create_app('file')
+        app.config['UPLOAD_FOLDER'] = str(tmp_path)
+        with app.app_context():
+            db.create_all()
+            yield app
+            db.session.remove()
+            db.engine.dispose()
+
+    def test_engine_options_per_dialect(self, app):
+        """Test server databases get a pre-pinged, recycled pool and SQLite keeps the defaults."""
+        from app.database import engine_options
+        options = engine_options(
+            {**app.config, 'SQLALCHEMY_DATABASE_URI': 'postgresql://localhost/app'}
+        )
+        assert options['pool_pre_ping'] is True
+        assert options['pool_size'] == app.config['DB_POOL_SIZE']
+        assert options['pool_recycle'] == app.config['DB_POOL_RECYCLE']
+        assert engine_options(app.config) == {}
+
+    def test_sqlite_pragmas_applied_on_connect(self, file_app):
+        """Test every SQLite connection runs in WAL mode with a busy timeout and foreign keys."""
+        with db.engine.connect() as connection:
+            assert connection.exec_driver_sql('PRAGMA journal_mode').scalar() == 'wal'
+            busy_timeout = connection.exec_driver_sql('PRAGMA busy_timeout').scalar()
+            assert busy_timeout == file_app.config['SQLITE_BUSY_TIMEOUT']
+            assert connection.exec_driver_sql('PRAGMA foreign_keys').scalar() == 1
+            assert connection.exec_driver_sql('PRAGMA synchronous').scalar() == 1  # NORMAL
+
+    def test_parallel_uploads_and_reads(self, file_app):
+        """Test concurrent ingests and dashboard reads on one SQLite file finish without locking."""
+        import threading
+        csv_content = "date,category,value\n" + "".join(
+            f"2024-01-{1 + i % 28:02d},{'ABC'[i % 3]},{i}.50\n" for i in range(2000)
+        )
+        statuses = []
+        uploading = threading.Event()
+        uploading.set()
+
+        def upload(index):
+            response = file_app.test_client().post(
+                '/api/upload',
+                data={'file': (io.BytesIO(csv_content.encode('utf-8')), f'part{index}.csv'),
+                      'name': f'P{index}'},
+                content_type='multipart/form-data'
+            )
+            statuses.append(('upload', response.status_code))
+
+        def read():
+            client = file_app.test_client()
+            while uploading.is_set():
+                for path in ('/api/datasets', '/api/datasets/1/summary'):
+                    statuses.append(('read', client.get(path).status_code))
+
+        readers = [threading.Thread(target=read) for _ in range(2)]
+        uploaders = [threading.Thread(target=upload, args=(index,)) for index in range(4)]
+        for thread in readers + uploaders:
+            thread.start()
+        for thread in uploaders:
+            thread.join()
+        uploading.clear()
+        for thread in readers:
+            thread.join()
+
+        assert [status for kind, status in statuses if kind == 'upload'] == [201] * 4
+        assert all(status == 200 for kind, status in statuses if kind == 'read')
+        assert Dataset.query.count() == 4
+
 
 class TestModels:
     """Test suite for database models."""
@@ -0,0 +1,55 @@
+import numpy as np
+
+from app.services.sketches import HyperLogLog, KLLSketch, ReservoirSample
+
+
+def test_hyperloglog_within_error_bound_and_mergeable():
+    """HLL estimates stay within 3 standard errors and merging equals one big sketch."""
+    left, right, both = HyperLogLog(), HyperLogLog(), HyperLogLog()
+    first = np.array([f'cat-{i}' for i in range(60000)], dtype=object)
+    second = np.array([f'cat-{i}' for i in range(40000, 100000)], dtype=object)
+    left.add_many(first)
+    right.add_many(second)
+    both.add_many(np.concatenate([first, second]))
+
+    merged = HyperLogLog.from_state(left.to_state()).merge(right)
+    assert np.array_equal(merged.registers, both.registers)
+    assert abs(merged.estimate() - 100000) / 100000 < 3 * merged.relative_error
+
+    small = HyperLogLog()
+    small.add_many(np.array(['a', 'b', 'a', 'c'], dtype=object))
+    assert round(small.estimate()) == 3
+
+
+def test_kll_quantiles_within_rank_error():
+    """KLL quantiles land within the advertised rank error, also after a merge."""
+    rng = np.random.default_rng(7)
+    values = rng.lognormal(5, 1, 400000)
+    left, right = KLLSketch(seed=1), KLLSketch(seed=2)
+    for chunk in np.array_split(values[:200000], 4):
+        left.add_many(chunk)
+    right.add_many(values[200000:])
+    sketch = KLLSketch.from_state(left.to_state()).merge(right)
+
+    assert sketch.count == len(values)
+    assert sum(len(level) for level in sketch.levels) < 1000
+    ordered = np.sort(values)
+    for fraction, estimate in zip((0.5, 0.9, 0.99), sketch.quantiles([0.5, 0.9, 0.99])):
+        rank = np.searchsorted(ordered, estimate) / len(values)
+        assert abs(rank - fraction) <= sketch.rank_error
+    assert sketch.min == values.min() and sketch.max == values.max()
+
+
+def test_reservoir_sample_is_uniform():
+    """The reservoir keeps `size` items spread evenly over the stream."""
+    sample = ReservoirSample(500, seed=3)
+    for start in range(0, 100000, 10000):
+        sample.add_many(list(range(start, start + 10000)))
+
+    assert sample.seen == 100000
+    assert len(sample.items) == len(set(sample.items)) == 500
+    assert 40000 < np.mean(sample.items) < 60000
+
+    merged = ReservoirSample.from_state(sample.to_state()).merge(ReservoirSample.from_state(
+        {'size': 500, 'seen': 100000, 'items': list(range(100000, 100500))}))
+    assert merged.seen == 200000 and len(merged.items) == 500
@@ -374,10 +374,15 @@ const Dashboard = ({ onRefresh }) => {
     const fetchAnalytics = async (id) => {
         setLoading(true);
         try {
-            analyticsService.getSummary(id).then(res => setSummary(res.data)).catch(err => console.error('Summary fetch failed:', err));
-            analyticsService.getChartData(id).then(res => setChartData(res.data)).catch(err => console.error('Chart data fetch failed:', err));
+            const { data } = await analyticsService.getDashboard(id);
+            setSummary(data.summary);
+            setChartData({
+                bar_chart: data.category_breakdown,
+                pie_chart: data.category_breakdown,
+                line_chart: data.time_series,
+            });
         } catch (err) {
-            console.error('Error starting analytics fetch:', err);
+            console.error('Dashboard fetch failed:', err);
         } finally {
             setLoading(false);
         }
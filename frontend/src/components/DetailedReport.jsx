@@ -170,14 +170,18 @@ const DetailedReport = () => {
         setLoading(true);
         setError(null);
         try {
-            const [summaryRes, chartRes, listRes] = await Promise.all([
-                analyticsService.getSummary(id),
-                analyticsService.getChartData(id),
+            const [dashboardRes, listRes] = await Promise.all([
+                analyticsService.getDashboard(id),
                 datasetService.list()
             ]);
 
-            setSummary(summaryRes.data);
-            setChartData(chartRes.data);
+            const dashboard = dashboardRes.data;
+            setSummary(dashboard.summary);
+            setChartData({
+                bar_chart: dashboard.category_breakdown,
+                pie_chart: dashboard.category_breakdown,
+                line_chart: dashboard.time_series,
+            });
 
             const currentDataset = listRes.data.datasets.find(d => d.id === parseInt(id));
             if (currentDataset) setDatasetName(currentDataset.filename);
@@ -13,11 +13,31 @@ export const datasetService = {
             'Content-Type': 'multipart/form-data',
         },
     }),
+    uploadAsync: (formData) => api.post('/upload?mode=async', formData, {
+        headers: {
+            'Content-Type': 'multipart/form-data',
+        },
+    }),
+    getUploadJob: (jobId) => api.get(`/upload/jobs/${jobId}`),
+    append: (id, formData) => api.post(`/datasets/${id}/append`, formData, {
+        headers: {
+            'Content-Type': 'multipart/form-data',
+        },
+    }),
+    getRecords: (id, params = {}) => api.get(`/datasets/${id}/records`, { params }),
 };
 
 export const analyticsService = {
     getSummary: (datasetId) => api.get(`/datasets/${datasetId}/summary`),
-    getChartData: (datasetId) => api.get(`/datasets/${datasetId}/chart-data`),
+    getChartData: (datasetId, granularity = 'month', maxPoints) => api.get(`/datasets/${datasetId}/chart-data`, {
+        params: { granularity, max_points: maxPoints },
+    }),
+    getDashboard: (datasetId, granularity = 'month') => api.get(`/datasets/${datasetId}/dashboard`, {
+        params: { granularity },
+    }),
+    compareDatasets: (datasetIds, granularity = 'month') => api.get('/analytics/compare', {
+        params: { ids: datasetIds.join(','), granularity },
+    }),
 };
 
 export default api;